@@ -0,0 +1,176 @@
+import asyncio
+import hashlib
+import math
+import os
+import random
+from typing import AsyncIterator, Dict, NamedTuple, Optional, Tuple, Union
+
+import httpx
+from openai import AsyncOpenAI
+
+from .tokenizer import estimate_tokens
+
+
+BACKENDS = ("openai", "fake")
+
+
+class Completion(NamedTuple):
+    content: str
+    total_tokens: Optional[int] = None
+
+
+class BackendError(RuntimeError):
+    # Carries an HTTP-like status so LLMClient classifies it like an API error.
+    def __init__(self, message: str, status_code: int):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def classify_error(exc: Exception) -> Tuple[Optional[int], bool]:
+    # (HTTP status or None, whether it was a timeout) for API, httpx and backend errors alike.
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        response = getattr(exc, "response", None)
+        status = getattr(response, "status_code", None)
+    is_timeout = isinstance(exc, (httpx.TimeoutException, TimeoutError, asyncio.TimeoutError)) or "timeout" in str(exc).lower()
+    return status, is_timeout
+
+
+class OpenAIBackend:
+    def __init__(self, api_key: str, base_url: str = ""):
+        client_kwargs = {"api_key": api_key, "timeout": 1200.0}
+        if base_url:
+            client_kwargs["base_url"] = base_url
+        self._client = AsyncOpenAI(**client_kwargs)
+
+    async def complete(self, payload: Dict, timeout) -> Completion:
+        response = await self._client.chat.completions.create(**payload, timeout=timeout)
+        usage = getattr(response, "usage", None)
+        return Completion(response.choices[0].message.content, getattr(usage, "total_tokens", None))
+
+    async def stream(self, payload: Dict, timeout) -> AsyncIterator[Union[str, Completion]]:
+        # Text pieces, then a Completion("", total_tokens) from the usage-only final chunk.
+        response = await self._client.chat.completions.create(
+            **payload, stream=True, stream_options={"include_usage": True}, timeout=timeout
+        )
+        try:
+            async for chunk in response:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+                usage = getattr(chunk, "usage", None)
+                if usage is not None and getattr(usage, "total_tokens", None) is not None:
+                    yield Completion("", usage.total_tokens)
+        finally:
+            await response.close()
+
+
+_FAKE_WORDS = (
+    "модуль", "функция", "конфигурация", "сервис", "запрос", "ответ", "кэш", "индекс", "параметр",
+    "зависимость", "обработчик", "файл", "данные", "ошибка", "проверка", "событие", "очередь", "схема",
+)
+
+
+class FakeBackend:
+    # In-process stand-in for an OpenAI-compatible endpoint, for benchmarks and load tests:
+    # log-normal latency around `latency` seconds, plus `1 / tokens_per_second` per output token;
+    # random 5xx (`error_rate`) and 429 (`throttle_rate`) failures, and 429 whenever more than
+    # `capacity` requests are in flight; streamed answers stall halfway with `stall_rate`.
+    # The same prompt always gets the same answer, sized by the prompt.
+    def __init__(
+        self,
+        latency: float = 0.05,
+        sigma: float = 0.5,
+        tokens_per_second: float = 0.0,
+        error_rate: float = 0.0,
+        throttle_rate: float = 0.0,
+        capacity: int = 0,
+        stall_rate: float = 0.0,
+        seed: int = 0,
+    ):
+        self.latency = latency
+        self.sigma = sigma
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.capacity = capacity
+        self.stall_rate = stall_rate
+        self._rng = random.Random(seed)
+        self.in_flight = 0
+        self.requests = 0
+        self.failures = 0
+
+    def _answer(self, payload: Dict) -> str:
+        prompt = "\n".join(str(message.get("content", "")) for message in payload.get("messages", []))
+        digest = hashlib.sha256(prompt.encode("utf-8", errors="surrogatepass")).digest()
+        words = max(8, min(int(payload.get("max_tokens") or 1200), estimate_tokens(prompt, payload.get("model", ""))) // 8)
+        body = " ".join(_FAKE_WORDS[digest[idx % len(digest)] % len(_FAKE_WORDS)] for idx in range(words))
+        return f"## Резюме {digest[:4].hex()}\n\n{body}."
+
+    def _tokens(self, payload: Dict, text: str) -> int:
+        return estimate_tokens(text, payload.get("model", ""))
+
+    async def _admit(self):
+        # Draws this request's fate; rate-limited requests fail fast, before any output.
+        roll = self._rng.random()
+        delay = self.latency * math.exp(self._rng.gauss(0.0, self.sigma)) if self.latency > 0 else 0.0
+        if self.capacity and self.in_flight > self.capacity or roll < self.throttle_rate:
+            self.failures += 1
+            await asyncio.sleep(delay / 10)
+            raise BackendError("fake backend: rate limited", 429)
+        return roll - self.throttle_rate, delay
+
+    def _fail(self) -> None:
+        self.failures += 1
+        raise BackendError("fake backend: internal error", 500)
+
+    async def complete(self, payload: Dict, timeout) -> Completion:
+        self.requests += 1
+        self.in_flight += 1
+        try:
+            roll, delay = await self._admit()
+            content = self._answer(payload)
+            output_tokens = self._tokens(payload, content)
+            if self.tokens_per_second > 0:
+                delay += output_tokens / self.tokens_per_second
+            await asyncio.sleep(delay)
+            if roll < self.error_rate:
+                self._fail()
+            input_tokens = sum(self._tokens(payload, str(m.get("content", ""))) for m in payload.get("messages", []))
+            return Completion(content, input_tokens + output_tokens)
+        finally:
+            self.in_flight -= 1
+
+    async def stream(self, payload: Dict, timeout) -> AsyncIterator[Union[str, Completion]]:
+        self.requests += 1
+        self.in_flight += 1
+        try:
+            roll, delay = await self._admit()
+            await asyncio.sleep(delay)
+            if roll < self.error_rate:
+                self._fail()
+            stalls = roll < self.error_rate + self.stall_rate
+            content = self._answer(payload)
+            words = content.split(" ")
+            for idx, word in enumerate(words):
+                if stalls and idx == len(words) // 2:
+                    await asyncio.sleep(3600)
+                if self.tokens_per_second > 0:
+                    await asyncio.sleep(self._tokens(payload, word) / self.tokens_per_second)
+                yield word if idx == len(words) - 1 else word + " "
+            input_tokens = sum(self._tokens(payload, str(m.get("content", ""))) for m in payload.get("messages", []))
+            yield Completion("", input_tokens + self._tokens(payload, content))
+        finally:
+            self.in_flight -= 1
+
+
+def fake_backend_from_env() -> FakeBackend:
+    return FakeBackend(
+        latency=float(os.getenv("AI_DOCS_FAKE_LATENCY", "0.05")),
+        sigma=float(os.getenv("AI_DOCS_FAKE_LATENCY_SIGMA", "0.5")),
+        tokens_per_second=float(os.getenv("AI_DOCS_FAKE_TPS", "0")),
+        error_rate=float(os.getenv("AI_DOCS_FAKE_ERROR_RATE", "0")),
+        throttle_rate=float(os.getenv("AI_DOCS_FAKE_THROTTLE_RATE", "0")),
+        capacity=int(os.getenv("AI_DOCS_FAKE_CAPACITY", "0")),
+        stall_rate=float(os.getenv("AI_DOCS_FAKE_STALL_RATE", "0")),
+        seed=int(os.getenv("AI_DOCS_FAKE_SEED", "0")),
+    )
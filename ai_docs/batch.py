@@ -0,0 +1,203 @@
+import asyncio
+import json
+import os
+import tempfile
+import uuid
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from .backends import FakeBackend
+from .generator_summarize import SUMMARY_KINDS, SummaryStream
+
+
+BATCH_SERVICES = ("openai", "local")
+BATCH_ENDPOINT = "/v1/chat/completions"
+FAILED_STATES = {"failed", "expired", "cancelled", "cancelling"}
+
+# Answer for a request still waiting in the batch; anything built from it is discarded.
+_PENDING = "⟨batch-pending⟩"
+
+
+def parse_batch_output(lines: Iterable[str]) -> Dict[str, str]:
+    # OpenAI batch output format: one {"custom_id", "response": {"status_code", "body"}} per line.
+    results: Dict[str, str] = {}
+    for line in lines:
+        if not line.strip():
+            continue
+        item = json.loads(line)
+        response = item.get("response") or {}
+        if response.get("status_code") != 200:
+            continue
+        choices = (response.get("body") or {}).get("choices") or []
+        if choices and choices[0].get("message", {}).get("content") is not None:
+            results[item["custom_id"]] = choices[0]["message"]["content"]
+    return results
+
+
+class LocalBatchService:
+    # File-based stand-in for a provider batch endpoint: jobs live under `root/<job id>/`, and a
+    # job completes on the `polls_until_done`-th status check by answering every line with `responder`.
+    def __init__(
+        self,
+        root: Path,
+        responder: Optional[Callable[[Dict], Awaitable[str]]] = None,
+        polls_until_done: int = 1,
+        poll_interval: float = 0.0,
+    ):
+        self.root = root
+        self.poll_interval = poll_interval
+        self.responder = responder or self._fake_answer
+        self.polls_until_done = max(1, polls_until_done)
+        self._polls: Dict[str, int] = {}
+
+    @staticmethod
+    async def _fake_answer(body: Dict) -> str:
+        return (await FakeBackend(latency=0).complete(body, None)).content
+
+    async def submit(self, path: Path) -> str:
+        job_id = f"batch_{uuid.uuid4().hex[:12]}"
+        job_dir = self.root / job_id
+        job_dir.mkdir(parents=True, exist_ok=True)
+        (job_dir / "input.jsonl").write_text(path.read_text(encoding="utf-8"), encoding="utf-8")
+        (job_dir / "status").write_text("in_progress", encoding="utf-8")
+        return job_id
+
+    async def status(self, job_id: str) -> str:
+        job_dir = self.root / job_id
+        status = (job_dir / "status").read_text(encoding="utf-8").strip()
+        if status != "in_progress":
+            return status
+        self._polls[job_id] = self._polls.get(job_id, 0) + 1
+        if self._polls[job_id] < self.polls_until_done:
+            return status
+        lines = []
+        for line in (job_dir / "input.jsonl").read_text(encoding="utf-8").splitlines():
+            request = json.loads(line)
+            try:
+                content = await self.responder(request["body"])
+            except Exception as exc:
+                response = {"status_code": 500, "body": {"error": {"message": str(exc)}}}
+            else:
+                body = {"choices": [{"index": 0, "message": {"role": "assistant", "content": content}}]}
+                response = {"status_code": 200, "body": body}
+            lines.append(json.dumps({"custom_id": request["custom_id"], "response": response}, ensure_ascii=False))
+        (job_dir / "output.jsonl").write_text("\n".join(lines) + "\n", encoding="utf-8")
+        (job_dir / "status").write_text("completed", encoding="utf-8")
+        return "completed"
+
+    async def results(self, job_id: str) -> Dict[str, str]:
+        output = self.root / job_id / "output.jsonl"
+        return parse_batch_output(output.read_text(encoding="utf-8").splitlines())
+
+
+class OpenAIBatchService:
+    def __init__(self, api_key: str, base_url: str = "", poll_interval: float = 30.0):
+        from openai import AsyncOpenAI
+
+        self.poll_interval = poll_interval
+        client_kwargs = {"api_key": api_key}
+        if base_url:
+            client_kwargs["base_url"] = base_url
+        self._client = AsyncOpenAI(**client_kwargs)
+
+    async def submit(self, path: Path) -> str:
+        with path.open("rb") as handle:
+            uploaded = await self._client.files.create(file=handle, purpose="batch")
+        batch = await self._client.batches.create(input_file_id=uploaded.id, endpoint=BATCH_ENDPOINT, completion_window="24h")
+        return batch.id
+
+    async def status(self, job_id: str) -> str:
+        return (await self._client.batches.retrieve(job_id)).status
+
+    async def results(self, job_id: str) -> Dict[str, str]:
+        batch = await self._client.batches.retrieve(job_id)
+        if not batch.output_file_id:
+            return {}
+        content = await self._client.files.content(batch.output_file_id)
+        return parse_batch_output(content.text.splitlines())
+
+
+def batch_service_from_env(cache_dir: Path):
+    default = "local" if os.getenv("AI_DOCS_LLM_BACKEND", "openai").strip().lower() == "fake" else "openai"
+    name = os.getenv("AI_DOCS_BATCH_SERVICE", default).strip().lower()
+    if name not in BATCH_SERVICES:
+        raise RuntimeError(f"Unknown AI_DOCS_BATCH_SERVICE: {name} (expected one of {', '.join(BATCH_SERVICES)})")
+    if name == "local":
+        return LocalBatchService(cache_dir / "batch" / "jobs")
+    poll_interval = float(os.getenv("AI_DOCS_BATCH_POLL_INTERVAL", "30"))
+    return OpenAIBatchService(os.getenv("OPENAI_API_KEY", ""), os.getenv("OPENAI_BASE_URL", "").strip(), poll_interval)
+
+
+class PromptCollector:
+    # Stands in for the LLM during a dry run of the summarize stage: cached answers are returned,
+    # every other request is recorded for the batch and answered with a placeholder. Requests built
+    # from a placeholder depend on an answer that does not exist yet and wait for the next round.
+    def __init__(self, llm, llm_cache: Dict[str, str], skip: Optional[Set[str]] = None):
+        self.llm = llm
+        self.model = llm.model
+        self.llm_cache = llm_cache
+        # Keys that already failed in an earlier batch: left to the live pass, not resubmitted.
+        self.skip = skip or set()
+        self.requests: Dict[str, Dict] = {}
+
+    async def chat(self, messages: List[Dict[str, str]], cache: Optional[Dict[str, str]] = None) -> str:
+        payload, key = self.llm.payload_key(messages)
+        if key in self.llm_cache:
+            return self.llm_cache[key]
+        if key not in self.skip and not any(_PENDING in message.get("content", "") for message in messages):
+            self.requests[key] = payload
+        return _PENDING
+
+
+async def _run_job(service, requests: Dict[str, Dict], work_dir: Path, round_idx: int) -> Dict[str, str]:
+    path = work_dir / f"round-{round_idx}.jsonl"
+    with path.open("w", encoding="utf-8") as handle:
+        for key, payload in requests.items():
+            handle.write(json.dumps({"custom_id": key, "method": "POST", "url": BATCH_ENDPOINT, "body": payload}, ensure_ascii=False) + "\n")
+    job_id = await service.submit(path)
+    print(f"[ai-docs] batch: round {round_idx} submitted {len(requests)} requests (job {job_id})")
+    while True:
+        status = await service.status(job_id)
+        if status == "completed":
+            break
+        if status in FAILED_STATES:
+            raise RuntimeError(f"Batch job {job_id} ended with status {status}")
+        await asyncio.sleep(service.poll_interval)
+    return await service.results(job_id)
+
+
+async def prefill_summary_cache(
+    service,
+    llm,
+    llm_cache: Dict[str, str],
+    jobs: List[Tuple[str, Dict, Optional[Tuple[str, ...]]]],
+    work_dir: Path,
+    threads: int,
+    token_budget: int = 0,
+    max_rounds: int = 4,
+) -> int:
+    # Fills llm_cache with every summarize-stage answer through the batch service, so the live
+    # summarize pass afterwards is served from the cache. A file's request chain (chunks, then
+    # merge, then normalization) needs one round per step. Returns the number of cached answers.
+    work_dir.mkdir(parents=True, exist_ok=True)
+    filled = 0
+    failed: Set[str] = set()
+    for round_idx in range(1, max_rounds + 1):
+        collector = PromptCollector(llm, llm_cache, failed)
+        with tempfile.TemporaryDirectory(dir=work_dir) as scratch:
+            dirs = tuple(Path(scratch) / kind for kind in SUMMARY_KINDS)
+            stream = SummaryStream(dirs, collector, llm_cache, threads, lambda: None, [], token_budget=token_budget, report=False)
+            for path, meta, kinds in jobs:
+                stream.submit(path, dict(meta), kinds)
+            await stream.drain()
+        if not collector.requests:
+            break
+        results = await _run_job(service, collector.requests, work_dir, round_idx)
+        llm_cache.update(results)
+        filled += len(results)
+        missing = len(collector.requests) - len(results)
+        failed.update(key for key in collector.requests if key not in results)
+        print(f"[ai-docs] batch: round {round_idx} cached {len(results)} answers" + (f", {missing} failed (will be requested live)" if missing else ""))
+        if not results:
+            break
+    return filled
@@ -1,10 +1,18 @@
 import json
 from pathlib import Path
-from typing import Dict, Tuple
+from typing import Dict, Set, Tuple
 
 from .utils import ensure_dir
 
 
+def is_changed(prev: Dict, meta: Dict) -> bool:
+    # Git blob ids are compared when both sides have one; otherwise the content hash is used,
+    # so toggling --git-index between runs does not mark every file as modified.
+    if prev.get("blob") and meta.get("blob"):
+        return prev["blob"] != meta["blob"]
+    return prev.get("hash") != meta.get("hash")
+
+
 class CacheManager:
     def __init__(self, cache_dir: Path):
         self.cache_dir = cache_dir
@@ -51,7 +59,7 @@ class CacheManager:
             if path not in prev:
                 added[path] = meta
                 continue
-            if prev[path].get("hash") != meta.get("hash"):
+            if is_changed(prev[path], meta):
                 modified[path] = meta
             else:
                 unchanged[path] = meta
@@ -61,3 +69,23 @@ class CacheManager:
                 deleted[path] = meta
 
         return added, modified, deleted, unchanged
+
+    def diff_paths(self, current_files: Dict[str, Dict], changed_paths: Set[str]) -> Tuple[Dict, Dict, Dict, Dict]:
+        # Only paths reported as changed are compared; everything else is known to be unchanged.
+        prev = self.load_index().get("files", {})
+        added = {}
+        modified = {}
+        deleted = {path: meta for path, meta in prev.items() if path not in current_files}
+        unchanged = {}
+
+        for path, meta in current_files.items():
+            if path not in changed_paths:
+                unchanged[path] = meta
+            elif path not in prev:
+                added[path] = meta
+            elif is_changed(prev[path], meta):
+                modified[path] = meta
+            else:
+                unchanged[path] = meta
+
+        return added, modified, deleted, unchanged
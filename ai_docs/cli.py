@@ -3,12 +3,15 @@ import os
 from pathlib import Path
 from typing import Optional, Set
 
-import shutil
-
+from .batch import batch_service_from_env
+from .cache import CacheManager
 from .generator import generate_docs
+from .limiter import RateLimiter
 from .llm import from_env
-from .scanner import scan_source
-from .utils import is_url
+from .outline import DEFAULT_FILE_TOKEN_BUDGET
+from .pool import EndpointPool
+from .scanner import OVERSIZED_MODES, repo_name_from_url, scan_source
+from .utils import is_url, peak_rss_mb
 from dotenv import load_dotenv
 
 
@@ -21,10 +24,55 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument("--language", default="ru", help="Language for generated docs (ru|en)")
     parser.add_argument("--include", nargs="*", help="Include patterns (glob)")
     parser.add_argument("--exclude", nargs="*", help="Exclude patterns (glob)")
-    parser.add_argument("--max-size", type=int, default=200_000, help="Max file size in bytes")
+    parser.add_argument("--max-size", type=int, default=200_000, help="Size in bytes above which files are outlined or skipped (see --oversized); 0 = no limit")
     parser.add_argument("--cache-dir", default=".ai_docs_cache", help="Cache directory")
     parser.add_argument("--no-cache", action="store_true", help="Disable LLM cache")
-    parser.add_argument("--threads", type=int, default=None, help="Number of parallel LLM workers")
+    parser.add_argument("--git-index", action="store_true", help="Use git index blob IDs to detect changes in git working trees")
+    parser.add_argument(
+        "--since",
+        nargs="?",
+        const="",
+        metavar="REV",
+        help="Only rescan files changed since REV (default: the commit recorded by the previous run)",
+    )
+    parser.add_argument("--rescan", action="store_true", help="Re-read every file instead of trusting stored file fingerprints")
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Start summarizing changed files while the scan is still running",
+    )
+    parser.add_argument(
+        "--oversized",
+        choices=OVERSIZED_MODES,
+        default=None,
+        help="Files above --max-size: summarize from a structural outline (default, up to 32 MiB) or skip them",
+    )
+    parser.add_argument(
+        "--file-token-budget",
+        type=int,
+        default=None,
+        help="Max input tokens per file summary; larger files are summarized from an outline plus sampled bodies",
+    )
+    parser.add_argument("--threads", type=int, default=None, help="Initial number of parallel LLM requests (adapted at runtime)")
+    parser.add_argument(
+        "--max-concurrency",
+        type=int,
+        default=None,
+        help="Upper bound for in-flight LLM requests; the limit adapts between AI_DOCS_MIN_CONCURRENCY and this value",
+    )
+    parser.add_argument(
+        "--stream-llm",
+        action="store_true",
+        help="Stream LLM completions: detect stalled responses early and report time to first token (AI_DOCS_LLM_STREAM)",
+    )
+    parser.add_argument("--rpm", type=int, default=None, help="Client-side requests-per-minute quota (AI_DOCS_RPM)")
+    parser.add_argument("--tpm", type=int, default=None, help="Client-side tokens-per-minute quota (AI_DOCS_TPM)")
+    parser.add_argument(
+        "--batch",
+        action="store_true",
+        help="Submit file summaries as an offline batch job and wait for it before building sections (AI_DOCS_BATCH)",
+    )
+    parser.add_argument("--scan-workers", type=int, default=None, help="Number of threads reading files during the scan")
     parser.add_argument("--local-site", action="store_true", help="Generate MkDocs config for local run")
     parser.add_argument("--force", action="store_true", help="Overwrite README.md if it already exists")
     parser.add_argument(
@@ -54,21 +102,65 @@ def main() -> None:
     include: Optional[Set[str]] = set(args.include) if args.include else None
     exclude: Optional[Set[str]] = set(args.exclude) if args.exclude else None
 
-    scan_result = scan_source(args.source, include=include, exclude=exclude, max_size=args.max_size)
-    root = scan_result.root
-    repo_name = scan_result.repo_name
-    print(f"[ai-docs] scan complete: {len(scan_result.files)} files")
+    env_scan_workers = int(os.getenv("AI_DOCS_SCAN_WORKERS", "1"))
+    scan_workers = args.scan_workers if args.scan_workers is not None else env_scan_workers
+    oversized = args.oversized or os.getenv("AI_DOCS_OVERSIZED", "outline").strip().lower()
+    env_token_budget = int(os.getenv("AI_DOCS_FILE_TOKEN_BUDGET", str(DEFAULT_FILE_TOKEN_BUDGET)))
+    file_token_budget = args.file_token_budget if args.file_token_budget is not None else env_token_budget
 
+    if is_url(args.source):
+        repo_name = repo_name_from_url(args.source)
+    else:
+        repo_name = Path(args.source).expanduser().resolve().name
     output_root = resolve_output(args.source, args.output, repo_name)
+    cache_dir = output_root / args.cache_dir
+    previous_index = None
+    if not args.rescan and cache_dir.exists():
+        previous_index = CacheManager(cache_dir).load_index()
+
+    scan_result = scan_source(
+        args.source,
+        include=include,
+        exclude=exclude,
+        max_size=args.max_size,
+        workers=max(1, scan_workers),
+        previous_index=previous_index,
+        git_index=args.git_index,
+        since=args.since,
+        stream=args.stream,
+        oversized=oversized,
+    )
+    if isinstance(scan_result.files, list):
+        reused = sum(1 for f in scan_result.files if f.reused)
+        print(f"[ai-docs] scan complete: {len(scan_result.files)} files ({reused} unchanged by fingerprint)")
     output_root.mkdir(parents=True, exist_ok=True)
 
     llm = from_env()
     print(f"[ai-docs] llm: model={llm.model} context={llm.context_limit} max_tokens={llm.max_tokens}")
+    if isinstance(llm.backend, EndpointPool):
+        print(f"[ai-docs] llm endpoints: {len(llm.backend.endpoints)} ({llm.backend.strategy})")
 
     env_threads = int(os.getenv("AI_DOCS_THREADS", "1"))
     env_local_site = os.getenv("AI_DOCS_LOCAL_SITE", "false").strip().lower() in {"1", "true", "yes", "y"}
-    threads = args.threads if args.threads is not None else env_threads
+    threads = max(1, args.threads if args.threads is not None else env_threads)
     local_site = args.local_site or env_local_site
+    # --threads is the starting point; the client then adapts the limit to the provider's latency and 429s.
+    max_concurrency = args.max_concurrency if args.max_concurrency is not None else max(threads, llm.limiter.max_limit)
+    llm.limiter.configure(initial=threads, max_limit=max_concurrency)
+    if args.stream_llm:
+        llm.stream = True
+    if args.rpm is not None or args.tpm is not None:
+        rate = llm.rate_limiter
+        rpm = args.rpm if args.rpm is not None else (rate.rpm if rate else 0)
+        tpm = args.tpm if args.tpm is not None else (rate.tpm if rate else 0)
+        llm.rate_limiter = RateLimiter(rpm=rpm, tpm=tpm) if rpm or tpm else None
+    if llm.rate_limiter is not None:
+        print(f"[ai-docs] llm quota: rpm={llm.rate_limiter.rpm or '-'} tpm={llm.rate_limiter.tpm or '-'}")
+    env_batch = os.getenv("AI_DOCS_BATCH", "false").strip().lower() in {"1", "true", "yes", "y"}
+    batch = batch_service_from_env(cache_dir) if args.batch or env_batch else None
+    if batch is not None:
+        print(f"[ai-docs] batch: file summaries via {type(batch).__name__}")
+    print(f"[ai-docs] llm concurrency: start={llm.limiter.current} range={llm.limiter.min_limit}..{llm.limiter.max_limit}")
 
     print(f"[ai-docs] generate: readme={args.readme or not args.mkdocs} mkdocs={args.mkdocs or not args.readme}")
     if args.regen:
@@ -76,19 +168,49 @@ def main() -> None:
     generate_docs(
         files=scan_result.files,
         output_root=output_root,
-        cache_dir=output_root / args.cache_dir,
+        cache_dir=cache_dir,
         llm=llm,
         language=args.language,
         write_readme_flag=(args.readme or not args.mkdocs),
         write_mkdocs=(args.mkdocs or not args.readme),
         use_cache=not args.no_cache,
-        threads=max(1, threads),
+        threads=max(threads, llm.limiter.max_limit),
         local_site=local_site,
         force=args.force,
+        git_head=scan_result.git_head,
+        changed_paths=scan_result.changed_paths,
+        renames=scan_result.renames,
+        domain_rules=scan_result.domain_rules,
+        file_token_budget=file_token_budget,
+        batch=batch,
     )
 
-    if is_url(args.source):
-        shutil.rmtree(scan_result.root, ignore_errors=True)
+    scan_result.release()
+
+    stats = llm.limiter.stats()
+    if stats["requests"]:
+        print(
+            f"[ai-docs] llm requests: {stats['requests']} coalesced={llm.coalesced} final limit={stats['limit']} throttled={stats['throttled']} "
+            f"p50={stats['p50'] or 0:.1f}s p95={stats['p95'] or 0:.1f}s"
+        )
+    if llm.stream and llm.ttft:
+        streamed = llm.stream_stats()
+        print(
+            f"[ai-docs] llm stream: ttft p50={streamed['ttft_p50']:.1f}s p95={streamed['ttft_p95']:.1f}s "
+            f"~{streamed['tokens_per_second'] or 0:.0f} tok/s stalls={streamed['stalls']} early stops={streamed['early_stops']}"
+        )
+    if isinstance(llm.backend, EndpointPool):
+        endpoints = ", ".join(
+            f"{item['name']}={item['requests']} (failed {item['failures']}, ejected {item['ejections']}x, ~{item['latency'] or 0:.1f}s)"
+            for item in llm.backend.stats()
+        )
+        print(f"[ai-docs] llm endpoints: {endpoints}; failovers={llm.backend.failovers}")
+    if llm.rate_limiter is not None and llm.rate_limiter.waited:
+        print(f"[ai-docs] llm quota: waited {llm.rate_limiter.waited:.1f}s for RPM/TPM budget")
+
+    peak = peak_rss_mb()
+    if peak is not None:
+        print(f"[ai-docs] peak memory: {peak:.1f} MB")
 
 
 if __name__ == "__main__":
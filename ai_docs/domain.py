@@ -1,5 +1,7 @@
-from pathlib import Path
-from typing import Set
+import hashlib
+import json
+from pathlib import Path, PurePosixPath
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
 
 
 CODE_EXTENSION_DESCRIPTIONS = {
@@ -135,57 +137,195 @@ def classify_type(path: Path) -> str:
     return "other"
 
 
-def detect_domains(path: Path, content_snippet: str) -> Set[str]:
-    domains: Set[str] = set()
-    posix_path = path.as_posix()
-    name = path.name
-    suffix = path.suffix.lower()
-    content = content_snippet or ""
-
-    if name in DOCKER_FILENAMES or name.startswith("Dockerfile"):
-        domains.add("docker")
-
-    if "docker" in posix_path and (suffix in {".yml", ".yaml"} or name.startswith("Dockerfile")):
-        domains.add("docker")
-
-    if name in CI_FILENAMES or name in CI_FILENAMES_EXTRA or any(marker in posix_path for marker in CI_PATH_MARKERS):
-        domains.add("ci")
-
-    if name in HELM_FILENAMES or "charts/" in posix_path or "/templates/" in posix_path:
-        domains.add("helm")
+YAML_SUFFIXES = {".yml", ".yaml"}
+
+# Declarative form of the domain heuristics. Every field present in a rule must match for the
+# rule to fire: names/name_prefixes test the file name, suffixes the lower-cased extension,
+# path/content are substrings of the POSIX path / content snippet (any of them), and
+# content_all requires every listed substring. `.ai-docs.yaml` can append rules (`domains:`).
+RULE_FIELDS = ("names", "name_prefixes", "suffixes", "path", "content", "content_all")
+
+DOMAIN_RULES: List[Tuple[str, Dict[str, Set[str]]]] = [
+    ("docker", {"names": DOCKER_FILENAMES}),
+    ("docker", {"name_prefixes": {"Dockerfile"}}),
+    ("docker", {"path": {"docker"}, "suffixes": YAML_SUFFIXES}),
+    ("ci", {"names": CI_FILENAMES | CI_FILENAMES_EXTRA}),
+    ("ci", {"path": CI_PATH_MARKERS}),
+    ("helm", {"names": HELM_FILENAMES}),
+    ("helm", {"path": {"charts/", "/templates/"}}),
+    ("terraform", {"suffixes": TERRAFORM_EXTENSIONS}),
+    ("terraform", {"path": {"terraform"}}),
+    ("ansible", {"path": {"ansible", "/roles/", "/tasks/"}}),
+    ("kubernetes", {"names": K8S_FILENAMES}),
+    ("kubernetes", {"path": {"k8s", "kubernetes", "ingress"}}),
+    ("kubernetes", {"suffixes": YAML_SUFFIXES, "content_all": {"apiVersion", "kind"}}),
+    ("kubernetes", {"suffixes": YAML_SUFFIXES, "content": {"kind: Ingress", "kind: Gateway"}}),
+    ("observability", {"names": OBSERVABILITY_FILENAMES}),
+    ("observability", {"path": OBSERVABILITY_PATH_MARKERS}),
+    ("service_mesh", {"path": SERVICE_MESH_MARKERS}),
+    (
+        "service_mesh",
+        {
+            "suffixes": YAML_SUFFIXES,
+            "content": {"kind: Ingress", "kind: Gateway", "VirtualService", "DestinationRule", "ServiceEntry"},
+        },
+    ),
+    ("data_storage", {"path": DATA_STORAGE_MARKERS}),
+]
+
+
+_FIELD_BITS = {field: 1 << RULE_FIELDS.index(field) for field in RULE_FIELDS}
+_MEMO_LIMIT = 65536
+
+
+class DomainClassifier:
+    # Rules are compiled once into lookup tables. Path markers without "/" cannot span the
+    # directory/name boundary, so their hits are memoized per directory and per file name;
+    # repositories have far fewer of those than files, and most lookups become dict hits.
+    def __init__(self, rules: List[Tuple[str, Dict[str, Set[str]]]]):
+        compiled = [(domain, {field: frozenset(values) for field, values in fields.items() if values}) for domain, fields in rules]
+        self.rules = [(domain, fields) for domain, fields in compiled if fields]
+        canonical = [[domain, {field: sorted(values) for field, values in sorted(fields.items())}] for domain, fields in self.rules]
+        self.signature = hashlib.sha256(json.dumps(canonical, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+        self._domains = [domain for domain, _ in self.rules]
+        self._masks = [sum(_FIELD_BITS[field] for field in fields) for _, fields in self.rules]
+        self._names: Dict[str, List[int]] = {}
+        self._suffixes: Dict[str, List[int]] = {}
+        self._prefixes: List[Tuple[str, int]] = []
+        segment_markers: Dict[str, List[int]] = {}
+        slash_markers: Dict[str, List[int]] = {}
+        content_markers: Dict[str, List[int]] = {}
+        self._content_all: List[Tuple[FrozenSet[str], int]] = []
+        content_suffixes: Set[str] = set()
+        content_anywhere = False
+        for rid, (_, fields) in enumerate(self.rules):
+            for value in fields.get("names", ()):
+                self._names.setdefault(value, []).append(rid)
+            for value in fields.get("suffixes", ()):
+                self._suffixes.setdefault(value, []).append(rid)
+            for value in fields.get("name_prefixes", ()):
+                self._prefixes.append((value, rid))
+            for value in fields.get("path", ()):
+                (slash_markers if "/" in value else segment_markers).setdefault(value, []).append(rid)
+            for value in fields.get("content", ()):
+                content_markers.setdefault(value, []).append(rid)
+            if "content_all" in fields:
+                self._content_all.append((fields["content_all"], rid))
+            if "content" in fields or "content_all" in fields:
+                if "suffixes" in fields:
+                    content_suffixes.update(fields["suffixes"])
+                else:
+                    content_anywhere = True
+
+        self._segment_markers = list(segment_markers.items())
+        self._slash_markers = list(slash_markers.items())
+        self._content_markers = list(content_markers.items())
+        self._content_all_markers = sorted(set().union(*(markers for markers, _ in self._content_all)))
+        self._prefix_tuple = tuple(prefix for prefix, _ in self._prefixes)
+        # The snippet is only searched when some content rule can still fire for the extension.
+        self._content_suffixes: Optional[FrozenSet[str]] = None if content_anywhere else frozenset(content_suffixes)
+        self._dir_memo: Dict[str, FrozenSet[int]] = {}
+        self._name_memo: Dict[str, Tuple[Dict[int, int], str]] = {}
+
+    def _segment_hits(self, text: str) -> FrozenSet[int]:
+        return frozenset(rid for marker, rids in self._segment_markers if marker in text for rid in rids)
+
+    def _dir_info(self, directory: str) -> FrozenSet[int]:
+        hits = self._dir_memo.get(directory)
+        if hits is None:
+            if len(self._dir_memo) >= _MEMO_LIMIT:
+                self._dir_memo.clear()
+            hits = self._dir_memo[directory] = self._segment_hits(directory)
+        return hits
+
+    def _name_info(self, name: str) -> Tuple[Dict[int, int], str]:
+        info = self._name_memo.get(name)
+        if info is not None:
+            return info
+        state: Dict[int, int] = {}
+        suffix = PurePosixPath(name).suffix.lower()
+        for rid in self._names.get(name, ()):
+            state[rid] = state.get(rid, 0) | _FIELD_BITS["names"]
+        for rid in self._suffixes.get(suffix, ()):
+            state[rid] = state.get(rid, 0) | _FIELD_BITS["suffixes"]
+        if self._prefix_tuple and name.startswith(self._prefix_tuple):
+            for prefix, rid in self._prefixes:
+                if name.startswith(prefix):
+                    state[rid] = state.get(rid, 0) | _FIELD_BITS["name_prefixes"]
+        for rid in self._segment_hits(name):
+            state[rid] = state.get(rid, 0) | _FIELD_BITS["path"]
+        if len(self._name_memo) >= _MEMO_LIMIT:
+            self._name_memo.clear()
+        info = self._name_memo[name] = (state, suffix)
+        return info
+
+    def classify(self, path: Path, content_snippet: str) -> Set[str]:
+        posix_path = path.as_posix()
+        directory, _, name = posix_path.rpartition("/")
+        name_state, suffix = self._name_info(name)
+        state = dict(name_state)
+        path_bit = _FIELD_BITS["path"]
+        for rid in self._dir_info(directory):
+            state[rid] = state.get(rid, 0) | path_bit
+        for marker, rids in self._slash_markers:
+            if marker in posix_path:
+                for rid in rids:
+                    state[rid] = state.get(rid, 0) | path_bit
+
+        if content_snippet and (self._content_suffixes is None or suffix in self._content_suffixes):
+            content_bit = _FIELD_BITS["content"]
+            for marker, rids in self._content_markers:
+                if marker in content_snippet:
+                    for rid in rids:
+                        state[rid] = state.get(rid, 0) | content_bit
+            if self._content_all:
+                found = {marker for marker in self._content_all_markers if marker in content_snippet}
+                for markers, rid in self._content_all:
+                    if markers <= found:
+                        state[rid] = state.get(rid, 0) | _FIELD_BITS["content_all"]
+
+        return {self._domains[rid] for rid, bits in state.items() if bits == self._masks[rid]}
+
+
+def rules_from_config(raw: object) -> List[Tuple[str, Dict[str, Set[str]]]]:
+    # `.ai-docs.yaml`: domains: {<domain>: <rule> | [<rule>, ...]}, rule fields as in DOMAIN_RULES.
+    rules: List[Tuple[str, Dict[str, Set[str]]]] = []
+    if not isinstance(raw, dict):
+        return rules
+    for domain, entries in raw.items():
+        domain = str(domain).strip()
+        if not domain:
+            continue
+        for entry in entries if isinstance(entries, list) else [entries]:
+            if not isinstance(entry, dict):
+                continue
+            fields: Dict[str, Set[str]] = {}
+            for field in RULE_FIELDS:
+                values = entry.get(field)
+                if values is None:
+                    continue
+                values = [str(item) for item in (values if isinstance(values, list) else [values]) if str(item)]
+                if field == "suffixes":
+                    values = [item.lower() if item.startswith(".") else f".{item.lower()}" for item in values]
+                if values:
+                    fields[field] = set(values)
+            if fields:
+                rules.append((domain, fields))
+    return rules
+
+
+DEFAULT_CLASSIFIER = DomainClassifier(DOMAIN_RULES)
+
+
+def build_classifier(extra_rules: Optional[List[Tuple[str, Dict[str, Set[str]]]]] = None) -> DomainClassifier:
+    if not extra_rules:
+        return DEFAULT_CLASSIFIER
+    return DomainClassifier(DOMAIN_RULES + list(extra_rules))
 
-    if suffix in TERRAFORM_EXTENSIONS or "terraform" in posix_path:
-        domains.add("terraform")
 
-    if "ansible" in posix_path or "/roles/" in posix_path or "/tasks/" in posix_path:
-        domains.add("ansible")
-
-    if name in K8S_FILENAMES or "k8s" in posix_path or "kubernetes" in posix_path:
-        domains.add("kubernetes")
-
-    if suffix in {".yml", ".yaml"}:
-        if "apiVersion" in content and "kind" in content:
-            domains.add("kubernetes")
-
-    if name in OBSERVABILITY_FILENAMES or any(marker in posix_path for marker in OBSERVABILITY_PATH_MARKERS):
-        domains.add("observability")
-
-    if any(marker in posix_path for marker in SERVICE_MESH_MARKERS):
-        domains.add("service_mesh")
-        if "ingress" in posix_path:
-            domains.add("kubernetes")
-
-    if suffix in {".yml", ".yaml"}:
-        if "kind: Ingress" in content or "kind: Gateway" in content:
-            domains.add("service_mesh")
-            domains.add("kubernetes")
-        if "VirtualService" in content or "DestinationRule" in content or "ServiceEntry" in content:
-            domains.add("service_mesh")
-
-    if any(marker in posix_path for marker in DATA_STORAGE_MARKERS):
-        domains.add("data_storage")
-
-    return domains
+def detect_domains(path: Path, content_snippet: str) -> Set[str]:
+    return DEFAULT_CLASSIFIER.classify(path, content_snippet or "")
 
 
 def is_infra(domains: Set[str]) -> bool:
@@ -1,9 +1,11 @@
 import asyncio
 import os
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, Iterable, List, Optional, Set
 
+from .batch import prefill_summary_cache
 from .generator_cache import (
+    apply_renames,
     build_file_map,
     carry_unchanged_summaries,
     cleanup_deleted_summaries,
@@ -12,22 +14,18 @@ from .generator_cache import (
     ensure_summary_dirs,
     init_cache,
     save_cache_snapshot,
+    stream_diff,
 )
 from .generator_output import build_mkdocs, write_docs, write_readme
 from .generator_sections import build_sections, generate_readme
 from .generator_shared import DOMAIN_TITLES, SECTION_TITLES
-from .generator_summarize import (
-    summarize_changed_configs,
-    summarize_changed_files,
-    summarize_changed_modules,
-    summarize_missing,
-    summarize_missing_configs,
-    summarize_missing_modules,
-)
+from .generator_summarize import SUMMARY_KINDS, SummaryStream
+from .outline import DEFAULT_FILE_TOKEN_BUDGET
+from .records import FileRecord
 
 
 async def _generate_docs_async(
-    files: List[Dict],
+    files: Iterable[FileRecord],
     output_root: Path,
     cache_dir: Path,
     llm,
@@ -38,6 +36,12 @@ async def _generate_docs_async(
     threads: int = 1,
     local_site: bool = False,
     force: bool = False,
+    git_head: Optional[str] = None,
+    changed_paths: Optional[Set[str]] = None,
+    renames: Optional[Dict[str, str]] = None,
+    domain_rules: Optional[str] = None,
+    file_token_budget: int = DEFAULT_FILE_TOKEN_BUDGET,
+    batch=None,
 ) -> None:
     regen_raw = os.getenv("AI_DOCS_REGEN", "")
     force_sections = {item.strip().lower() for item in regen_raw.split(",") if item.strip()}
@@ -45,24 +49,72 @@ async def _generate_docs_async(
         print(f"[ai-docs] regen sections: {', '.join(sorted(force_sections))}")
 
     cache, llm_cache, index_data, prev_files = init_cache(cache_dir, use_cache)
+    if batch is not None and llm_cache is None:
+        # Batch answers reach the summarize stage through llm_cache, even with the disk cache off.
+        llm_cache = {}
     errors: List[str] = []
 
-    file_map = build_file_map(files)
-    added, modified, deleted, unchanged = diff_files(cache, file_map)
-    print(f"[ai-docs] diff: added={len(added)} modified={len(modified)} deleted={len(deleted)} unchanged={len(unchanged)}")
-
+    # A non-list `files` is a lazy scan (scan_source(stream=True)): diffing and summarization
+    # start with the first yielded file instead of after the whole tree has been read.
+    scanning = not isinstance(files, list)
+    if batch is not None and scanning:
+        # The batch needs every prompt up front, so there is nothing to overlap with the scan.
+        files = list(files)
+        scanning = False
+    file_map: Dict[str, Dict] = {} if scanning else build_file_map(files)
     summaries_dir, module_summaries_dir, config_summaries_dir = ensure_summary_dirs(cache_dir)
 
     def save_cb() -> None:
-        save_cache_snapshot(cache, file_map, index_data, llm_cache, use_cache)
-
-    to_summarize = list({**added, **modified}.items())
-    if to_summarize:
-        print(f"[ai-docs] summarize: {len(to_summarize)} changed files (threads={threads})")
-    await summarize_changed_files(to_summarize, summaries_dir, llm, llm_cache, threads, save_cb, errors)
-    await summarize_changed_modules(to_summarize, module_summaries_dir, llm, llm_cache, threads, save_cb, errors)
-    await summarize_changed_configs(to_summarize, config_summaries_dir, llm, llm_cache, threads, save_cb, errors)
-    if to_summarize:
+        # Mid-scan snapshots keep not-yet-seen entries so an interrupted run loses nothing.
+        snapshot_map = {**prev_files, **file_map} if scanning else file_map
+        save_cache_snapshot(cache, snapshot_map, index_data, llm_cache, use_cache)
+
+    summary_stream = SummaryStream(
+        (summaries_dir, module_summaries_dir, config_summaries_dir),
+        llm,
+        llm_cache,
+        threads,
+        save_cb,
+        errors,
+        token_budget=file_token_budget,
+    )
+    if scanning:
+        print(f"[ai-docs] summarize: streaming changed files as they are scanned (threads={threads})")
+        added, modified, deleted, unchanged = await stream_diff(files, prev_files, file_map, summary_stream.submit)
+        print(f"[ai-docs] diff: added={len(added)} modified={len(modified)} deleted={len(deleted)} unchanged={len(unchanged)}")
+        scanning = False
+    else:
+        added, modified, deleted, unchanged = diff_files(cache, file_map, changed_paths)
+        if renames:
+            moved = apply_renames(
+                renames,
+                added,
+                deleted,
+                unchanged,
+                prev_files,
+                (summaries_dir, module_summaries_dir, config_summaries_dir),
+            )
+            if moved:
+                print(f"[ai-docs] renames: moved summaries for {moved} files")
+        print(f"[ai-docs] diff: added={len(added)} modified={len(modified)} deleted={len(deleted)} unchanged={len(unchanged)}")
+
+        to_summarize = list({**added, **modified}.items())
+        if batch is not None:
+            missing = carry_unchanged_summaries(unchanged, prev_files)
+            jobs = [(path, meta, None) for path, meta in to_summarize]
+            jobs += [(path, meta, (kind,)) for kind, items in zip(SUMMARY_KINDS, missing) for path, meta in items]
+            if jobs:
+                print(f"[ai-docs] batch: collecting summarize requests for {len(jobs)} files")
+                filled = await prefill_summary_cache(
+                    batch, llm, llm_cache, jobs, cache_dir / "batch", threads, token_budget=file_token_budget
+                )
+                print(f"[ai-docs] batch: {filled} answers cached, summarizing from cache")
+        if to_summarize:
+            print(f"[ai-docs] summarize: {len(to_summarize)} changed files (threads={threads})")
+        for path, meta in to_summarize:
+            summary_stream.submit(path, meta)
+    await summary_stream.drain()
+    if summary_stream.files:
         save_cb()
 
     missing_summaries, missing_module_summaries, missing_config_summaries = carry_unchanged_summaries(
@@ -70,15 +122,26 @@ async def _generate_docs_async(
     )
     if missing_summaries:
         print(f"[ai-docs] summarize: {len(missing_summaries)} missing summaries")
-    await summarize_missing(missing_summaries, summaries_dir, llm, llm_cache, threads, save_cb, errors)
     if missing_module_summaries:
         print(f"[ai-docs] summarize modules: {len(missing_module_summaries)} missing module summaries")
-    await summarize_missing_modules(missing_module_summaries, module_summaries_dir, llm, llm_cache, threads, save_cb, errors)
     if missing_config_summaries:
         print(f"[ai-docs] summarize configs: {len(missing_config_summaries)} missing config summaries")
-    await summarize_missing_configs(missing_config_summaries, config_summaries_dir, llm, llm_cache, threads, save_cb, errors)
+    for kind, missing in zip(SUMMARY_KINDS, (missing_summaries, missing_module_summaries, missing_config_summaries)):
+        for path, meta in missing:
+            summary_stream.submit(path, meta, (kind,))
+    await summary_stream.drain()
     if missing_summaries or missing_module_summaries or missing_config_summaries:
         save_cb()
+    if summary_stream.noise:
+        kinds = ", ".join(f"{kind}={count}" for kind, count in sorted(summary_stream.noise.items()))
+        print(f"[ai-docs] noise: {sum(summary_stream.noise.values())} summaries without LLM ({kinds}), ~{summary_stream.tokens_avoided} input tokens avoided")
+    if summary_stream.outlined:
+        print(f"[ai-docs] outline: {summary_stream.outlined} summaries built from outlines of large files (budget {file_token_budget} tokens/file)")
+    if summary_stream.duplicates:
+        print(
+            f"[ai-docs] dedup: {summary_stream.duplicates} summaries copied from identical files "
+            f"({summary_stream.calls_saved} LLM calls saved)"
+        )
 
     cleanup_orphan_summaries(file_map, summaries_dir, module_summaries_dir, config_summaries_dir)
     if deleted:
@@ -129,6 +192,10 @@ async def _generate_docs_async(
     )
 
     index_data["sections"] = {"regenerated": regenerated_sections}
+    if git_head:
+        index_data["git"] = {"head": git_head}
+    if domain_rules:
+        index_data["domain_rules"] = domain_rules
     save_cache_snapshot(cache, file_map, index_data, llm_cache, use_cache)
 
     if errors:
@@ -138,7 +205,7 @@ async def _generate_docs_async(
 
 
 def generate_docs(
-    files: List[Dict],
+    files: Iterable[FileRecord],
     output_root: Path,
     cache_dir: Path,
     llm,
@@ -149,6 +216,12 @@ def generate_docs(
     threads: int = 1,
     local_site: bool = False,
     force: bool = False,
+    git_head: Optional[str] = None,
+    changed_paths: Optional[Set[str]] = None,
+    renames: Optional[Dict[str, str]] = None,
+    domain_rules: Optional[str] = None,
+    file_token_budget: int = DEFAULT_FILE_TOKEN_BUDGET,
+    batch=None,
 ) -> None:
     return asyncio.run(
         _generate_docs_async(
@@ -163,6 +236,12 @@ def generate_docs(
             threads=threads,
             local_site=local_site,
             force=force,
+            git_head=git_head,
+            changed_paths=changed_paths,
+            renames=renames,
+            domain_rules=domain_rules,
+            file_token_budget=file_token_budget,
+            batch=batch,
         )
     )
 
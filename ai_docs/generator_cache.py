@@ -1,9 +1,11 @@
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
 
-from .cache import CacheManager
+from .cache import CacheManager, is_changed
 from .generator_shared import is_test_path
-from .utils import ensure_dir, sha256_text
+from .records import FileRecord
+from .summary import summary_file_path
+from .utils import ensure_dir, iterate_in_thread
 
 
 def init_cache(cache_dir: Path, use_cache: bool):
@@ -14,23 +16,74 @@ def init_cache(cache_dir: Path, use_cache: bool):
     return cache, llm_cache, index_data, prev_files
 
 
-def build_file_map(files: List[Dict]) -> Dict[str, Dict]:
-    file_map: Dict[str, Dict] = {}
-    for f in files:
-        file_map[f["path"]] = {
-            "hash": sha256_text(f["content"]),
-            "size": f["size"],
-            "type": f["type"],
-            "domains": f["domains"],
-            "content": f["content"],
-        }
-    return file_map
+TRANSIENT_KEYS = {"content", "abs_path"}
 
 
-def diff_files(cache: CacheManager, file_map: Dict[str, Dict]):
+def build_file_map(files: List[FileRecord]) -> Dict[str, Dict]:
+    return {f.path: f.meta() for f in files}
+
+
+def diff_files(cache: CacheManager, file_map: Dict[str, Dict], changed_paths: Optional[Set[str]] = None):
+    if changed_paths is not None:
+        return cache.diff_paths(file_map, changed_paths)
     return cache.diff_files(file_map)
 
 
+async def stream_diff(
+    files: Iterable[FileRecord],
+    prev_files: Dict[str, Dict],
+    file_map: Dict[str, Dict],
+    on_changed: Callable[[str, Dict], None],
+):
+    # Diffs files while the scanner is still producing them; changed ones are handed to
+    # on_changed immediately so summarization overlaps with the rest of the scan.
+    added: Dict[str, Dict] = {}
+    modified: Dict[str, Dict] = {}
+    unchanged: Dict[str, Dict] = {}
+    async for f in iterate_in_thread(files):
+        path = f.path
+        meta = f.meta()
+        file_map[path] = meta
+        prev = prev_files.get(path)
+        if prev is None:
+            added[path] = meta
+        elif is_changed(prev, meta):
+            modified[path] = meta
+        else:
+            unchanged[path] = meta
+            continue
+        on_changed(path, meta)
+    deleted = {path: meta for path, meta in prev_files.items() if path not in file_map}
+    return added, modified, deleted, unchanged
+
+
+def apply_renames(
+    renames: Dict[str, str],
+    added: Dict[str, Dict],
+    deleted: Dict[str, Dict],
+    unchanged: Dict[str, Dict],
+    prev_files: Dict[str, Dict],
+    summary_dirs: Tuple[Path, Path, Path],
+) -> int:
+    moved = 0
+    keys = ("summary_path", "module_summary_path", "config_summary_path")
+    for new_path, old_path in renames.items():
+        if new_path not in added or old_path not in deleted:
+            continue
+        prev = dict(deleted.pop(old_path))
+        for key, summary_dir in zip(keys, summary_dirs):
+            src = prev.pop(key, None)
+            if not src or not Path(src).exists():
+                continue
+            dst = summary_file_path(summary_dir, new_path)
+            Path(src).replace(dst)
+            prev[key] = str(dst)
+        prev_files[new_path] = prev
+        unchanged[new_path] = added.pop(new_path)
+        moved += 1
+    return moved
+
+
 def ensure_summary_dirs(cache_dir: Path):
     summaries_dir = cache_dir / "intermediate" / "files"
     module_summaries_dir = cache_dir / "intermediate" / "modules"
@@ -49,9 +102,12 @@ def save_cache_snapshot(
     use_cache: bool,
 ) -> None:
     snapshot = {
-        "files": {path: {k: v for k, v in meta.items() if k != "content"} for path, meta in file_map.items()},
+        "files": {path: {k: v for k, v in meta.items() if k not in TRANSIENT_KEYS} for path, meta in file_map.items()},
         "sections": index_data.get("sections", {}),
+        "git": index_data.get("git", {}),
     }
+    if index_data.get("domain_rules"):
+        snapshot["domain_rules"] = index_data["domain_rules"]
     cache.save_index(snapshot)
     if use_cache and llm_cache is not None:
         cache.save_llm_cache(llm_cache)
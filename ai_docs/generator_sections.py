@@ -14,7 +14,7 @@ from .generator_shared import (
     strip_duplicate_heading,
     is_test_path,
 )
-from .tokenizer import count_tokens, chunk_text
+from .tokenizer import count_tokens, count_tokens_batch, chunk_text, fits_within
 from .utils import read_text_file
 
 
@@ -55,7 +55,7 @@ async def generate_readme(llm, llm_cache: Dict[str, str], project_name: str, ove
 
 
 def truncate_context(context: str, model: str, max_tokens: int) -> str:
-    if count_tokens(context, model) <= max_tokens:
+    if fits_within(context, model, max_tokens):
         return context
     chunks = chunk_text(context, model=model, max_tokens=max_tokens)
     return chunks[0]
@@ -83,6 +83,36 @@ async def summarize_chunk(
     return (await llm.chat(messages, cache=llm_cache)).strip()
 
 
+_SEPARATOR = "\n\n"
+
+
+def _joined_tokens(counts: List[int], separator_tokens: int) -> int:
+    return sum(counts) + separator_tokens * max(0, len(counts) - 1)
+
+
+def _pack_items(items: List[str], counts: List[int], max_tokens: int, separator_tokens: int, model: str) -> List[str]:
+    # Greedy packing on item boundaries; only an item that alone exceeds the budget is split.
+    chunks: List[str] = []
+    current: List[str] = []
+    current_tokens = 0
+    for item, tokens in zip(items, counts):
+        if tokens > max_tokens:
+            if current:
+                chunks.append(_SEPARATOR.join(current))
+                current, current_tokens = [], 0
+            chunks.extend(chunk_text(item, model=model, max_tokens=max_tokens))
+            continue
+        added = tokens + (separator_tokens if current else 0)
+        if current and current_tokens + added > max_tokens:
+            chunks.append(_SEPARATOR.join(current))
+            current, current_tokens, added = [], 0, tokens
+        current.append(item)
+        current_tokens += added
+    if current:
+        chunks.append(_SEPARATOR.join(current))
+    return chunks
+
+
 async def build_hierarchical_context(
     llm,
     llm_cache: Dict[str, str],
@@ -95,18 +125,21 @@ async def build_hierarchical_context(
     items = [t.strip() for t in texts if t and t.strip()]
     if not items:
         return ""
-    joined = "\n\n".join(items)
-    if count_tokens(joined, llm.model) <= max_tokens:
+    joined = _SEPARATOR.join(items)
+    if fits_within(joined, llm.model, max_tokens):
         return joined
+    # Each item is tokenized once; joined sizes are derived from per-item counts plus separators.
+    separator_tokens = count_tokens(_SEPARATOR, llm.model)
+    counts = count_tokens_batch(items, llm.model)
 
     current = items
     max_rounds = 6
     for round_idx in range(1, max_rounds + 1):
-        joined = "\n\n".join(current)
-        if count_tokens(joined, llm.model) <= max_tokens:
-            return joined
+        total = _joined_tokens(counts, separator_tokens)
+        if total <= max_tokens:
+            return _SEPARATOR.join(current)
 
-        chunks = chunk_text(joined, model=llm.model, max_tokens=max_tokens)
+        chunks = _pack_items(current, counts, max_tokens, separator_tokens, llm.model)
         summaries: List[str] = []
         for idx, chunk in enumerate(chunks, 1):
             print(f"[ai-docs] summarize chunk {label}: {round_idx}.{idx}/{len(chunks)}")
@@ -115,14 +148,14 @@ async def build_hierarchical_context(
                 summaries.append(summary)
 
         if not summaries:
-            return truncate_context(joined, llm.model, max_tokens)
+            return truncate_context(_SEPARATOR.join(current), llm.model, max_tokens)
 
-        new_joined = "\n\n".join(summaries)
-        if count_tokens(new_joined, llm.model) >= count_tokens(joined, llm.model) and len(summaries) == 1:
-            return truncate_context(new_joined, llm.model, max_tokens)
-        current = summaries
+        summary_counts = count_tokens_batch(summaries, llm.model)
+        if len(summaries) == 1 and summary_counts[0] >= total:
+            return truncate_context(summaries[0], llm.model, max_tokens)
+        current, counts = summaries, summary_counts
 
-    return truncate_context("\n\n".join(current), llm.model, max_tokens)
+    return truncate_context(_SEPARATOR.join(current), llm.model, max_tokens)
 
 
 async def build_sections(
@@ -237,7 +270,8 @@ async def build_sections(
     module_pages: Dict[str, str] = {}
     configs_written: Dict[str, str] = {}
     section_tasks: List[asyncio.Task] = []
-    section_sem = asyncio.Semaphore(min(threads, 4) if threads > 1 else 1)
+    # Sized like SummaryStream: the shared LLM limiter, not this stage, decides real concurrency.
+    section_sem = asyncio.Semaphore(max(1, threads))
 
     def submit_section(out_path: str, title: str, context: str) -> None:
         async def run_section() -> None:
@@ -37,22 +37,35 @@ def is_test_path(path: str) -> bool:
     return name.startswith("test_") or name.endswith("_test.py")
 
 
+def file_content(meta: Dict) -> str:
+    content = meta.get("content")
+    if content is None:
+        abs_path = meta.get("abs_path")
+        content = read_text_file(Path(abs_path)) if abs_path else ""
+        meta["content"] = content
+    return content
+
+
+def release_content(meta: Dict) -> None:
+    meta.pop("content", None)
+
+
 def collect_dependencies(files: Dict[str, Dict]) -> List[str]:
     deps: List[str] = []
     for path, meta in files.items():
         if path.endswith("pyproject.toml"):
             try:
-                data = tomli.loads(meta["content"])
+                data = tomli.loads(file_content(meta))
                 deps_map = data.get("tool", {}).get("poetry", {}).get("dependencies", {})
                 deps.extend([f"{k} {v}" for k, v in deps_map.items()])
             except Exception:
                 continue
         if path.endswith("requirements.txt"):
-            lines = [line.strip() for line in meta["content"].splitlines() if line.strip() and not line.strip().startswith("#")]
+            lines = [line.strip() for line in file_content(meta).splitlines() if line.strip() and not line.strip().startswith("#")]
             deps.extend(lines)
         if path.endswith("package.json"):
             try:
-                data = json.loads(meta["content"])
+                data = json.loads(file_content(meta))
                 for section in ("dependencies", "devDependencies"):
                     for k, v in data.get(section, {}).items():
                         deps.append(f"{k} {v}")
@@ -67,7 +80,7 @@ def collect_test_info(files: Dict[str, Dict]) -> Tuple[List[str], List[str]]:
     for path, meta in files.items():
         if path.endswith("pyproject.toml"):
             try:
-                data = tomli.loads(meta["content"])
+                data = tomli.loads(file_content(meta))
                 scripts = data.get("tool", {}).get("poetry", {}).get("scripts", {})
                 if scripts:
                     commands.append("poetry run pytest")
@@ -79,7 +92,7 @@ def collect_test_info(files: Dict[str, Dict]) -> Tuple[List[str], List[str]]:
             commands.append("tox")
         if path.endswith("package.json"):
             try:
-                data = json.loads(meta.get("content", ""))
+                data = json.loads(file_content(meta))
                 scripts = data.get("scripts", {})
                 if "test" in scripts:
                     commands.append("npm test")
@@ -1,239 +1,208 @@
 import asyncio
-from pathlib import Path
-from typing import Dict, List, Tuple
+from collections import Counter
+from pathlib import Path, PurePosixPath
+from typing import Dict, Iterable, List, Optional, Set, Tuple
 import time
 
+from .noise import detect_noise, noise_summary
+from .outline import condense
 from .summary import summarize_file, write_summary
-from .generator_shared import is_test_path
-
-
-async def summarize_changed_files(
-    to_summarize: List[Tuple[str, Dict]],
-    summaries_dir: Path,
-    llm,
-    llm_cache: Dict[str, str],
-    threads: int,
-    save_cb,
-    errors: List[str],
-) -> None:
-    if not to_summarize:
-        return
-    total = len(to_summarize)
-    done = 0
-    start = time.time()
-    log_every = 5
-    sem = asyncio.Semaphore(max(1, threads))
-    lock = asyncio.Lock()
-
-    async def run_one(path: str, meta: Dict) -> None:
-        nonlocal done
-        async with sem:
-            try:
-                summary = await summarize_file(meta["content"], meta["type"], meta["domains"], llm, llm_cache, llm.model, False)
-                summary_path = write_summary(summaries_dir, path, summary)
-                meta["summary_path"] = str(summary_path)
-                save_cb()
-                async with lock:
-                    done += 1
-                    if done % log_every == 0 or done == total:
-                        elapsed = int(time.time() - start)
-                        print(f"[ai-docs] summarize progress: {done}/{total} ({elapsed}s)")
-            except Exception as exc:
-                errors.append(f"summarize: {path} -> {exc}")
-
-    await asyncio.gather(*(run_one(path, meta) for path, meta in to_summarize))
-
-
-async def summarize_changed_modules(
-    to_summarize: List[Tuple[str, Dict]],
-    module_summaries_dir: Path,
-    llm,
-    llm_cache: Dict[str, str],
-    threads: int,
-    save_cb,
-    errors: List[str],
-) -> None:
-    module_candidates = [
-        (path, meta)
-        for path, meta in to_summarize
-        if meta.get("type") == "code" and not is_test_path(path)
-    ]
-    if not module_candidates:
-        return
-    total = len(module_candidates)
-    done = 0
-    start = time.time()
-    log_every = 5
-    sem = asyncio.Semaphore(max(1, threads))
-    lock = asyncio.Lock()
-
-    async def run_one(path: str, meta: Dict) -> None:
-        nonlocal done
-        async with sem:
-            try:
-                summary = await summarize_file(meta["content"], meta["type"], meta["domains"], llm, llm_cache, llm.model, True)
-                summary_path = write_summary(module_summaries_dir, path, summary)
-                meta["module_summary_path"] = str(summary_path)
-                save_cb()
-                async with lock:
-                    done += 1
-                    if done % log_every == 0 or done == total:
-                        elapsed = int(time.time() - start)
-                        print(f"[ai-docs] summarize modules progress: {done}/{total} ({elapsed}s)")
-            except Exception as exc:
-                errors.append(f"summarize module: {path} -> {exc}")
-
-    await asyncio.gather(*(run_one(path, meta) for path, meta in module_candidates))
-
-
-async def summarize_changed_configs(
-    to_summarize: List[Tuple[str, Dict]],
-    config_summaries_dir: Path,
-    llm,
-    llm_cache: Dict[str, str],
-    threads: int,
-    save_cb,
-    errors: List[str],
-) -> None:
-    config_candidates = [
-        (path, meta)
-        for path, meta in to_summarize
-        if meta.get("type") == "config"
-    ]
-    if not config_candidates:
-        return
-    total = len(config_candidates)
-    done = 0
-    start = time.time()
-    log_every = 5
-    sem = asyncio.Semaphore(max(1, threads))
-    lock = asyncio.Lock()
-
-    async def run_one(path: str, meta: Dict) -> None:
-        nonlocal done
-        async with sem:
-            try:
-                summary = await summarize_file(meta["content"], meta["type"], meta["domains"], llm, llm_cache, llm.model, True)
-                summary_path = write_summary(config_summaries_dir, path, summary)
-                meta["config_summary_path"] = str(summary_path)
-                save_cb()
-                async with lock:
-                    done += 1
-                    if done % log_every == 0 or done == total:
-                        elapsed = int(time.time() - start)
-                        print(f"[ai-docs] summarize configs progress: {done}/{total} ({elapsed}s)")
-            except Exception as exc:
-                errors.append(f"summarize config: {path} -> {exc}")
-
-    await asyncio.gather(*(run_one(path, meta) for path, meta in config_candidates))
-
-
-async def summarize_missing(
-    missing_summaries: List[Tuple[str, Dict]],
-    summaries_dir: Path,
-    llm,
-    llm_cache: Dict[str, str],
-    threads: int,
-    save_cb,
-    errors: List[str],
-) -> None:
-    total = len(missing_summaries)
-    done = 0
-    start = time.time()
-    log_every = 5
-    if not missing_summaries:
-        return
-    sem = asyncio.Semaphore(max(1, threads))
-    lock = asyncio.Lock()
-
-    async def run_one(path: str, meta: Dict) -> None:
-        nonlocal done
-        async with sem:
-            try:
-                summary = await summarize_file(meta["content"], meta["type"], meta["domains"], llm, llm_cache, llm.model, False)
-                summary_path = write_summary(summaries_dir, path, summary)
-                meta["summary_path"] = str(summary_path)
-                save_cb()
-                async with lock:
-                    done += 1
-                    if done % log_every == 0 or done == total:
-                        elapsed = int(time.time() - start)
-                        print(f"[ai-docs] summarize progress: {done}/{total} ({elapsed}s)")
-            except Exception as exc:
-                errors.append(f"summarize: {path} -> {exc}")
-
-    await asyncio.gather(*(run_one(path, meta) for path, meta in missing_summaries))
-
-
-async def summarize_missing_modules(
-    missing_module_summaries: List[Tuple[str, Dict]],
-    module_summaries_dir: Path,
-    llm,
-    llm_cache: Dict[str, str],
-    threads: int,
-    save_cb,
-    errors: List[str],
-) -> None:
-    total = len(missing_module_summaries)
-    done = 0
-    start = time.time()
-    log_every = 5
-    if not missing_module_summaries:
-        return
-    sem = asyncio.Semaphore(max(1, threads))
-    lock = asyncio.Lock()
-
-    async def run_one(path: str, meta: Dict) -> None:
-        nonlocal done
-        async with sem:
-            try:
-                summary = await summarize_file(meta["content"], meta["type"], meta["domains"], llm, llm_cache, llm.model, True)
-                summary_path = write_summary(module_summaries_dir, path, summary)
-                meta["module_summary_path"] = str(summary_path)
-                save_cb()
-                async with lock:
-                    done += 1
-                    if done % log_every == 0 or done == total:
-                        elapsed = int(time.time() - start)
-                        print(f"[ai-docs] summarize modules progress: {done}/{total} ({elapsed}s)")
-            except Exception as exc:
-                errors.append(f"summarize module: {path} -> {exc}")
-
-    await asyncio.gather(*(run_one(path, meta) for path, meta in missing_module_summaries))
-
-
-async def summarize_missing_configs(
-    missing_config_summaries: List[Tuple[str, Dict]],
-    config_summaries_dir: Path,
-    llm,
-    llm_cache: Dict[str, str],
-    threads: int,
-    save_cb,
-    errors: List[str],
-) -> None:
-    total = len(missing_config_summaries)
-    done = 0
-    start = time.time()
-    log_every = 5
-    if not missing_config_summaries:
-        return
-    sem = asyncio.Semaphore(max(1, threads))
-    lock = asyncio.Lock()
-
-    async def run_one(path: str, meta: Dict) -> None:
-        nonlocal done
-        async with sem:
-            try:
-                summary = await summarize_file(meta["content"], meta["type"], meta["domains"], llm, llm_cache, llm.model, True)
-                summary_path = write_summary(config_summaries_dir, path, summary)
-                meta["config_summary_path"] = str(summary_path)
-                save_cb()
-                async with lock:
-                    done += 1
-                    if done % log_every == 0 or done == total:
-                        elapsed = int(time.time() - start)
-                        print(f"[ai-docs] summarize configs progress: {done}/{total} ({elapsed}s)")
-            except Exception as exc:
-                errors.append(f"summarize config: {path} -> {exc}")
-
-    await asyncio.gather(*(run_one(path, meta) for path, meta in missing_config_summaries))
+from .generator_shared import file_content, is_test_path, release_content
+from .tokenizer import estimate_tokens
+
+
+SUMMARY_KINDS = ("file", "module", "config")
+
+# kind -> (meta key, detailed prompt, error label)
+_KIND_SETTINGS = {
+    "file": ("summary_path", False, "summarize"),
+    "module": ("module_summary_path", True, "summarize module"),
+    "config": ("config_summary_path", True, "summarize config"),
+}
+
+
+def needs_summary(kind: str, path: str, meta: Dict) -> bool:
+    if kind == "module":
+        return meta.get("type") == "code" and not is_test_path(path)
+    if kind == "config":
+        return meta.get("type") == "config"
+    return True
+
+
+class _CallCounter:
+    def __init__(self, llm):
+        self.llm = llm
+        self.calls = 0
+
+    async def chat(self, messages: List[Dict[str, str]], cache: Optional[Dict[str, str]] = None) -> str:
+        self.calls += 1
+        return await self.llm.chat(messages, cache=cache)
+
+
+class SummaryStream:
+    # Accepts files one at a time (possibly while the scanner is still yielding them) and
+    # summarizes them in the background; drain() waits for everything submitted so far.
+    # A file body is read only once a summary slot is free and dropped as soon as its last prompt
+    # is built; files with identical content share one summarization. Files above token_budget are
+    # summarized from an outline plus sampled bodies, so no file costs more than the budget in input tokens.
+    def __init__(
+        self,
+        summary_dirs: Tuple[Path, Path, Path],
+        llm,
+        llm_cache: Dict[str, str],
+        threads: int,
+        save_cb,
+        errors: List[str],
+        token_budget: int = 0,
+        report: bool = True,
+    ):
+        self.summary_dirs = dict(zip(SUMMARY_KINDS, summary_dirs))
+        self.llm = llm
+        self.llm_cache = llm_cache
+        self.save_cb = save_cb
+        self.errors = errors
+        self.token_budget = token_budget
+        self.report = report
+        self.sem = asyncio.Semaphore(max(1, threads))
+        self.tasks: List[asyncio.Future] = []
+        self.pending: Dict[str, Set[str]] = {}
+        self.shared: Dict[Tuple, asyncio.Future] = {}
+        self.finished: Dict[Tuple, Tuple[str, int, Optional[Tuple[str, str]]]] = {}
+        self.duplicates = 0
+        self.calls_saved = 0
+        self.noise: Counter = Counter()
+        self.tokens_avoided = 0
+        self.outlined = 0
+        self.files = 0
+        self.done = 0
+        self.reported = 0
+        self.start = time.time()
+
+    def submit(self, path: str, meta: Dict, kinds: Optional[Iterable[str]] = None) -> None:
+        kinds = [kind for kind in (kinds or SUMMARY_KINDS) if needs_summary(kind, path, meta)]
+        if not kinds:
+            return
+        self.files += 1
+        self.pending.setdefault(path, set()).update(kinds)
+        for kind in kinds:
+            self.tasks.append(asyncio.ensure_future(self._run(kind, path, meta)))
+
+    def _summary_key(self, kind: str, path: str, meta: Dict) -> Tuple:
+        # Everything the LLM summary depends on, from metadata alone: identical keys produce
+        # identical prompts. condense() picks the outline format by extension and noise detection
+        # looks at the file name, so the suffix and the name-only noise verdict are part of it.
+        suffix = PurePosixPath(path).suffix.lower()
+        return kind, meta.get("hash"), meta.get("type"), tuple(meta.get("domains", [])), suffix, detect_noise(path, "")
+
+    def _release(self, path: str, kind: str, meta: Dict) -> None:
+        # The body is dropped once every summary kind of the file has built its prompt.
+        kinds = self.pending.get(path)
+        if kinds is None:
+            return
+        kinds.discard(kind)
+        if not kinds:
+            del self.pending[path]
+            release_content(meta)
+
+    def _prepare(self, path: str, meta: Dict) -> Tuple[Optional[Tuple[str, str]], str, bool, int]:
+        # Runs on a worker thread: reads the body, detects noise and builds the prompt text.
+        content = file_content(meta)
+        try:
+            noise = detect_noise(path, content)
+        except Exception:
+            noise = None
+        if noise is not None:
+            # Lockfiles, generated and minified files get a deterministic summary instead of N chunk calls.
+            return noise, noise_summary(path, content, *noise), False, estimate_tokens(content, self.llm.model)
+        content, outlined = condense(path, content, self.llm.model, self.token_budget)
+        return None, content, outlined, 0
+
+    async def _read(self, kind: str, path: str, meta: Dict) -> Tuple[Optional[Tuple[str, str]], str]:
+        # Called with a slot of `sem` held, so at most `threads` bodies are in memory at once.
+        loop = asyncio.get_running_loop()
+        try:
+            noise, text, outlined, avoided = await loop.run_in_executor(None, self._prepare, path, meta)
+        finally:
+            self._release(path, kind, meta)
+        if noise is not None:
+            self.noise[noise[0]] += 1
+            self.tokens_avoided += avoided
+        if outlined:
+            self.outlined += 1
+        return noise, text
+
+    async def _summarize(self, kind: str, path: str, meta: Dict, result: "asyncio.Future") -> None:
+        _, detailed, _ = _KIND_SETTINGS[kind]
+        counter = _CallCounter(self.llm)
+        try:
+            async with self.sem:
+                noise, content = await self._read(kind, path, meta)
+                if noise is not None:
+                    summary = content
+                else:
+                    summary = await summarize_file(
+                        content, meta["type"], meta["domains"], counter, self.llm_cache, self.llm.model, detailed
+                    )
+        except Exception as exc:
+            result.set_exception(exc)
+        else:
+            result.set_result((summary, counter.calls, noise))
+
+    async def _shared_result(self, kind: str, path: str, meta: Dict, summary_key: Tuple) -> Tuple[str, int, Optional[Tuple[str, str]], bool]:
+        # Returns (summary, calls, noise, duplicate). Only in-flight summaries are kept as futures;
+        # finished ones are remembered by the path of their summary file.
+        finished = self.finished.get(summary_key)
+        if finished is not None:
+            source, calls, noise = finished
+            summary = Path(source).read_text(encoding="utf-8") if noise is None else ""
+            return summary, calls, noise, True
+        result = self.shared.get(summary_key)
+        if result is not None:
+            summary, calls, noise = await result
+            return summary, calls, noise, True
+        result = asyncio.get_running_loop().create_future()
+        self.shared[summary_key] = result
+        try:
+            await self._summarize(kind, path, meta, result)
+        finally:
+            # Followers already waiting hold the future; later duplicates use `finished`.
+            del self.shared[summary_key]
+        summary, calls, noise = result.result()
+        return summary, calls, noise, False
+
+    async def _run(self, kind: str, path: str, meta: Dict) -> None:
+        key, _, error_label = _KIND_SETTINGS[kind]
+        summary_key = self._summary_key(kind, path, meta)
+        try:
+            summary, calls, noise, duplicate = await self._shared_result(kind, path, meta, summary_key)
+            if duplicate and noise is not None:
+                # Noise summaries name the file: each copy builds its own, still without LLM calls.
+                async with self.sem:
+                    _, summary = await self._read(kind, path, meta)
+            # Byte-identical files get their own copy of the summary without another request.
+            summary_path = write_summary(self.summary_dirs[kind], path, summary)
+            meta[key] = str(summary_path)
+            self.save_cb()
+            if duplicate and noise is None:
+                self.duplicates += 1
+                self.calls_saved += calls
+            elif not duplicate:
+                self.finished[summary_key] = (str(summary_path), calls, noise)
+        except Exception as exc:
+            self.errors.append(f"{error_label}: {path} -> {exc}")
+        self._release(path, kind, meta)
+        self.done += 1
+        if self.done % 5 == 0:
+            self._report()
+
+    def _report(self) -> None:
+        self.reported = self.done
+        if not self.report:
+            return
+        elapsed = int(time.time() - self.start)
+        print(f"[ai-docs] summarize progress: {self.done}/{len(self.tasks)} ({elapsed}s)")
+
+    async def drain(self) -> None:
+        await asyncio.gather(*self.tasks)
+        if self.done != self.reported:
+            self._report()
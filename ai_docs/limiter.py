@@ -0,0 +1,177 @@
+import asyncio
+import time
+from collections import deque
+from typing import Deque, Dict, Optional
+
+
+# Outcomes reported by the client for each finished request.
+OK = "ok"
+OVERLOAD = "overload"  # 429, 408 or timeout: the provider is saturated
+ERROR = "error"  # other failures (5xx, connection errors)
+REJECTED = "rejected"  # 4xx for the request itself: says nothing about capacity
+
+_LATENCY_WINDOW = 200
+_OUTCOME_WINDOW = 50
+_HEALTHY_LATENCY_FACTOR = 2.0
+_MAX_ERROR_RATE = 0.2
+_DECREASE_FACTOR = 0.5
+
+
+def percentile(values, fraction: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class AdaptiveLimiter:
+    # AIMD limit on in-flight LLM requests: while latency stays near the observed median and
+    # errors are rare, each success adds 1/limit (about +1 per round of requests); a 429, a
+    # timeout or an error burst halves the limit once per round, within [min_limit, max_limit].
+    def __init__(self, initial: int = 1, min_limit: int = 1, max_limit: int = 16):
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.limit = float(min(max(initial, self.min_limit), self.max_limit))
+        self.in_flight = 0
+        self.requests = 0
+        self.throttled = 0
+        self.latencies: Deque[float] = deque(maxlen=_LATENCY_WINDOW)
+        self.outcomes: Deque[bool] = deque(maxlen=_OUTCOME_WINDOW)
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._started = 0
+        self._last_cut = 0
+
+    def configure(self, initial: Optional[int] = None, min_limit: Optional[int] = None, max_limit: Optional[int] = None) -> None:
+        if min_limit is not None:
+            self.min_limit = max(1, min_limit)
+        if max_limit is not None:
+            self.max_limit = max(self.min_limit, max_limit)
+        start = self.limit if initial is None else initial
+        self.limit = float(min(max(start, self.min_limit), self.max_limit))
+
+    @property
+    def current(self) -> int:
+        return int(self.limit)
+
+    async def acquire(self) -> int:
+        # Returns a ticket; only requests started after the last cut may trigger another one.
+        while self.in_flight >= self.current:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                # Woken, then cancelled before it could run: hand the freed slot to the next waiter.
+                if waiter.done() and not waiter.cancelled():
+                    self._wake()
+                raise
+            finally:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+        self.in_flight += 1
+        self._started += 1
+        self.requests += 1
+        return self._started
+
+    def release(self, ticket: int, latency: float, outcome: str = OK) -> None:
+        saturated = self.in_flight >= self.current
+        self.in_flight -= 1
+        if outcome == REJECTED:
+            self._wake()
+            return
+        self.outcomes.append(outcome == OK)
+        if outcome == OK:
+            healthy = self._healthy(latency)
+            self.latencies.append(latency)
+            error_rate = self.outcomes.count(False) / len(self.outcomes)
+            if healthy and saturated and error_rate <= _MAX_ERROR_RATE:
+                self.limit = min(float(self.max_limit), self.limit + 1.0 / self.limit)
+        elif outcome == OVERLOAD or self.outcomes.count(False) / len(self.outcomes) > _MAX_ERROR_RATE:
+            if outcome == OVERLOAD:
+                self.throttled += 1
+            if ticket > self._last_cut:
+                self._last_cut = self._started
+                self.limit = max(float(self.min_limit), self.limit * _DECREASE_FACTOR)
+        self._wake()
+
+    def _healthy(self, latency: float) -> bool:
+        if len(self.latencies) < 10:
+            return True
+        return latency <= _HEALTHY_LATENCY_FACTOR * percentile(self.latencies, 0.5)
+
+    def _wake(self) -> None:
+        free = self.current - self.in_flight
+        while free > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+    def stats(self) -> Dict[str, Optional[float]]:
+        return {
+            "limit": self.current,
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "throttled": self.throttled,
+            "p50": percentile(self.latencies, 0.5),
+            "p95": percentile(self.latencies, 0.95),
+        }
+
+
+class RateLimiter:
+    # Client-side RPM/TPM quota as two continuously refilled token buckets. Each request reserves
+    # one request and its estimated tokens before it is sent (waiting in FIFO order when a bucket
+    # is short); reconcile() returns the difference once the actual usage is known.
+    def __init__(self, rpm: int = 0, tpm: int = 0, clock=time.monotonic, sleep=asyncio.sleep):
+        self.rpm = max(0, rpm)
+        self.tpm = max(0, tpm)
+        self.requests = float(self.rpm)
+        self.tokens = float(self.tpm)
+        self.waited = 0.0
+        self._clock = clock
+        self._sleep = sleep
+        self._updated = clock()
+        self._lock: Optional[asyncio.Lock] = None
+
+    def _refill(self) -> None:
+        now = self._clock()
+        elapsed = now - self._updated
+        self._updated = now
+        if self.rpm:
+            self.requests = min(float(self.rpm), self.requests + elapsed * self.rpm / 60)
+        if self.tpm:
+            self.tokens = min(float(self.tpm), self.tokens + elapsed * self.tpm / 60)
+
+    def _delay(self, tokens: int) -> float:
+        delay = 0.0
+        if self.rpm and self.requests < 1:
+            delay = max(delay, (1 - self.requests) * 60 / self.rpm)
+        if self.tpm and self.tokens < tokens:
+            delay = max(delay, (tokens - self.tokens) * 60 / self.tpm)
+        return delay
+
+    async def reserve(self, tokens: int) -> int:
+        # A request larger than the whole per-minute budget waits for a full bucket instead of forever.
+        if self.tpm:
+            tokens = min(tokens, self.tpm)
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            while True:
+                self._refill()
+                delay = self._delay(tokens)
+                if delay <= 0:
+                    break
+                self.waited += delay
+                await self._sleep(delay)
+            if self.rpm:
+                self.requests -= 1
+            if self.tpm:
+                self.tokens -= tokens
+        return tokens
+
+    def reconcile(self, reserved: int, used: int) -> None:
+        # Unused reservation goes back to the bucket; an overrun becomes debt for the next requests.
+        if self.tpm:
+            self._refill()
+            self.tokens = min(float(self.tpm), self.tokens + reserved - used)
@@ -1,14 +1,33 @@
 import asyncio
 import json
 import os
-from typing import Dict, List, Optional
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
 
 import httpx
 import random
-from openai import AsyncOpenAI
 
+from . import limiter as limits
+from .backends import BACKENDS, Completion, OpenAIBackend, classify_error, fake_backend_from_env
+from .limiter import AdaptiveLimiter, RateLimiter, percentile
+from .pool import pool_from_spec
 from .utils import sha256_text
-from .tokenizer import count_tokens
+from .tokenizer import estimate_tokens
+
+
+_STREAM_WINDOW = 200
+
+
+class StreamStalled(TimeoutError):
+    pass
+
+
+def _cancelling() -> bool:
+    # Whether the current task itself has a pending cancellation (Task.cancelling is 3.11+).
+    task = asyncio.current_task()
+    cancelling = getattr(task, "cancelling", None)
+    return bool(cancelling and cancelling())
 
 
 class LLMClient:
@@ -20,6 +39,12 @@ class LLMClient:
         temperature: float = 0.2,
         max_tokens: int = 1200,
         context_limit: int = 8192,
+        limiter: Optional[AdaptiveLimiter] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        backend=None,
+        stream: bool = False,
+        stall_timeout: float = 30.0,
+        stop_after_chars: int = 0,
     ):
         self.api_key = api_key
         self.base_url = base_url.rstrip("/")
@@ -28,18 +53,29 @@ class LLMClient:
         self.max_tokens = max_tokens
         self.context_limit = context_limit
         self._cache_lock = asyncio.Lock()
-        client_kwargs = {"api_key": self.api_key, "timeout": 1200.0}
-        if self.base_url:
-            client_kwargs["base_url"] = self.base_url
-        self._client = AsyncOpenAI(**client_kwargs)
+        # Shared by every pipeline stage: the number of in-flight requests adapts to the provider.
+        self.limiter = limiter or AdaptiveLimiter()
+        # Optional RPM/TPM quota, reserved before each request so runs stay under the provider limits.
+        self.rate_limiter = rate_limiter
+        # Identical payloads already being requested: later callers await the first caller's result.
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.coalesced = 0
+        # Streaming: tokens are consumed as they arrive, so a stalled response is abandoned after
+        # stall_timeout without output instead of the full read timeout; stop_after_chars ends
+        # runaway answers early. Time to first token and output rate are recorded per request.
+        self.stream = stream
+        self.stall_timeout = stall_timeout
+        self.stop_after_chars = stop_after_chars
+        self.ttft: Deque[float] = deque(maxlen=_STREAM_WINDOW)
+        self.output_rates: Deque[float] = deque(maxlen=_STREAM_WINDOW)
+        self.stalls = 0
+        self.early_stops = 0
+        # Anything with `async complete(payload, timeout) -> Completion`; see backends.py.
+        self.backend = backend or OpenAIBackend(self.api_key, self.base_url)
 
     def _estimate_input_tokens(self, messages: List[Dict[str, str]]) -> int:
-        total = 0
-        for msg in messages:
-            content = msg.get("content", "")
-            total += count_tokens(content, self.model)
-            total += 4
-        return total
+        # Only sizes the read timeout, so an estimate is enough.
+        return sum(estimate_tokens(msg.get("content", ""), self.model) + 4 for msg in messages)
 
     def _compute_read_timeout(self, input_tokens: int) -> float:
         t_min = 1000
@@ -53,22 +89,136 @@ class LLMClient:
         ratio = (input_tokens - t_min) / (t_max - t_min)
         return timeout_min + ratio * (timeout_max - timeout_min)
 
+    async def _consume_stream(self, payload: Dict, timeout: httpx.Timeout) -> Completion:
+        # The first token may take as long as the read timeout (prefill); later gaps only stall_timeout.
+        started = time.monotonic()
+        first_token = None
+        parts: List[str] = []
+        size = 0
+        total_tokens = None
+        pieces = self.backend.stream(payload, timeout)
+        wait = timeout.read
+        try:
+            while True:
+                try:
+                    piece = await asyncio.wait_for(pieces.__anext__(), wait)
+                except StopAsyncIteration:
+                    break
+                except asyncio.TimeoutError:
+                    self.stalls += 1
+                    phase = "first token" if first_token is None else "next token"
+                    raise StreamStalled(f"stream stalled: no {phase} for {wait:.0f}s (timeout)") from None
+                if isinstance(piece, Completion):
+                    # Usage reported after the last token; reconciles the TPM reservation.
+                    total_tokens = piece.total_tokens
+                    continue
+                if first_token is None:
+                    first_token = time.monotonic()
+                    self.ttft.append(first_token - started)
+                    wait = self.stall_timeout
+                parts.append(piece)
+                size += len(piece)
+                if self.stop_after_chars and size >= self.stop_after_chars:
+                    self.early_stops += 1
+                    break
+        finally:
+            await pieces.aclose()
+        content = "".join(parts)
+        if first_token is not None:
+            elapsed = time.monotonic() - first_token
+            if elapsed > 0:
+                self.output_rates.append(estimate_tokens(content, self.model) / elapsed)
+        return Completion(content, total_tokens)
+
+    def stream_stats(self) -> Dict[str, Optional[float]]:
+        return {
+            "ttft_p50": percentile(self.ttft, 0.5),
+            "ttft_p95": percentile(self.ttft, 0.95),
+            "tokens_per_second": percentile(self.output_rates, 0.5),
+            "stalls": self.stalls,
+            "early_stops": self.early_stops,
+        }
+
+    async def _request(self, payload: Dict, timeout: httpx.Timeout, input_tokens: int):
+        reserved = 0
+        if self.rate_limiter is not None:
+            reserved = await self.rate_limiter.reserve(input_tokens + self.max_tokens)
+        ticket = await self.limiter.acquire()
+        started = time.monotonic()
+        outcome = limits.ERROR
+        used = input_tokens
+        try:
+            if self.stream:
+                completion = await self._consume_stream(payload, timeout)
+            else:
+                completion = await self.backend.complete(payload, timeout)
+            outcome = limits.OK
+            used = completion.total_tokens or reserved
+            return completion
+        except Exception as exc:
+            status, is_timeout = classify_error(exc)
+            if status in {408, 429} or is_timeout:
+                outcome = limits.OVERLOAD
+            elif status is not None and status < 500:
+                outcome = limits.REJECTED
+            raise
+        finally:
+            self.limiter.release(ticket, time.monotonic() - started, outcome)
+            if self.rate_limiter is not None:
+                self.rate_limiter.reconcile(reserved, used)
+
     def _cache_key(self, payload: Dict) -> str:
         return sha256_text(json.dumps(payload, sort_keys=True))
 
-    async def chat(self, messages: List[Dict[str, str]], cache: Optional[Dict[str, str]] = None) -> str:
+    def payload_key(self, messages: List[Dict[str, str]]) -> Tuple[Dict, str]:
+        # The request body and the llm_cache key it is stored under.
         payload = {
             "model": self.model,
             "messages": messages,
             "temperature": self.temperature,
             "max_tokens": self.max_tokens,
         }
-        key = self._cache_key(payload)
-        if cache is not None:
+        return payload, self._cache_key(payload)
+
+    async def chat(self, messages: List[Dict[str, str]], cache: Optional[Dict[str, str]] = None) -> str:
+        payload, key = self.payload_key(messages)
+        while True:
             async with self._cache_lock:
-                if key in cache:
+                if cache is not None and key in cache:
                     return cache[key]
+                leader = self._inflight.get(key)
+                if leader is None:
+                    flight = self._inflight[key] = asyncio.get_running_loop().create_future()
+                    break
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(leader)
+            except asyncio.CancelledError:
+                # Only the leader was cancelled: look again, this caller may become the new leader.
+                if not leader.cancelled() or _cancelling():
+                    raise
+                self.coalesced -= 1
 
+        try:
+            content = await self._complete(payload, messages)
+            # Cached before the flight ends, so no later caller can miss both.
+            if cache is not None:
+                async with self._cache_lock:
+                    cache[key] = content
+        except Exception as exc:
+            flight.set_exception(exc)
+            # Followers re-raise it; without any, this marks the exception as retrieved.
+            flight.exception()
+            raise
+        else:
+            flight.set_result(content)
+        finally:
+            self._inflight.pop(key, None)
+            if not flight.done():
+                flight.cancel()
+        return content
+
+    async def _complete(self, payload: Dict, messages: List[Dict[str, str]]) -> str:
         input_tokens = self._estimate_input_tokens(messages)
         read_timeout = self._compute_read_timeout(input_tokens)
         max_read_timeout = 1200.0
@@ -78,17 +228,12 @@ class LLMClient:
         for attempt in range(1, max_retries + 1):
             try:
                 timeout = httpx.Timeout(read=read_timeout, connect=7.0, write=30.0, pool=read_timeout)
-                response = await self._client.chat.completions.create(**payload, timeout=timeout)
-                content = response.choices[0].message.content
+                completion = await self._request(payload, timeout, input_tokens)
+                content = completion.content
                 break
             except Exception as exc:
                 last_exc = exc
-                status = getattr(exc, "status_code", None)
-                if status is None:
-                    response = getattr(exc, "response", None)
-                    status = getattr(response, "status_code", None)
-                message = str(exc).lower()
-                is_timeout = isinstance(exc, httpx.TimeoutException) or "timeout" in message
+                status, is_timeout = classify_error(exc)
                 retryable = status in {408, 429} or (status is not None and 500 <= status < 600) or is_timeout
                 if not retryable or attempt >= max_retries:
                     raise RuntimeError(f"LLM request failed: {exc}") from exc
@@ -99,21 +244,42 @@ class LLMClient:
                 backoff = min(backoff * 2, 60.0)
         else:
             raise RuntimeError(f"LLM request failed: {last_exc}") from last_exc
-        if cache is not None:
-            async with self._cache_lock:
-                cache[key] = content
         return content
 
 
 def from_env() -> LLMClient:
-    api_key = os.getenv("OPENAI_API_KEY")
+    backend_name = os.getenv("AI_DOCS_LLM_BACKEND", "openai").strip().lower()
+    if backend_name not in BACKENDS:
+        raise RuntimeError(f"Unknown AI_DOCS_LLM_BACKEND: {backend_name} (expected one of {', '.join(BACKENDS)})")
+    # The fake backend answers in-process: no key, no network, no spent tokens.
+    backend = fake_backend_from_env() if backend_name == "fake" else None
+    api_key = os.getenv("OPENAI_API_KEY") or ("fake" if backend else "")
     if not api_key:
         raise RuntimeError("OPENAI_API_KEY is not set")
     base_url = os.getenv("OPENAI_BASE_URL", "").strip()
+    # Several endpoints: "url|weight|max_in_flight,..." balanced by one pool (fake: one stub per entry).
+    endpoints = os.getenv("OPENAI_BASE_URLS", "").strip()
+    if endpoints:
+        fake = backend_name == "fake"
+        backend = pool_from_spec(
+            endpoints,
+            (lambda url: fake_backend_from_env()) if fake else (lambda url: OpenAIBackend(api_key, url)),
+            strategy=os.getenv("AI_DOCS_LB_STRATEGY", "least").strip().lower(),
+            eject_after=int(os.getenv("AI_DOCS_EJECT_AFTER", "3")),
+            eject_seconds=float(os.getenv("AI_DOCS_EJECT_SECONDS", "30")),
+        )
     model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
     temperature = float(os.getenv("OPENAI_TEMPERATURE", "0.2"))
     max_tokens = int(os.getenv("OPENAI_MAX_TOKENS", "1200"))
     context_limit = int(os.getenv("OPENAI_CONTEXT_TOKENS", "8192"))
+    limiter = AdaptiveLimiter(
+        initial=int(os.getenv("AI_DOCS_THREADS", "1")),
+        min_limit=int(os.getenv("AI_DOCS_MIN_CONCURRENCY", "1")),
+        # Room for every endpoint's cap, so throughput grows with the pool.
+        max_limit=max(int(os.getenv("AI_DOCS_MAX_CONCURRENCY", "16")), getattr(backend, "capacity", 0)),
+    )
+    rpm = int(os.getenv("AI_DOCS_RPM", "0"))
+    tpm = int(os.getenv("AI_DOCS_TPM", "0"))
     return LLMClient(
         api_key=api_key,
         base_url=base_url,
@@ -121,4 +287,10 @@ def from_env() -> LLMClient:
         temperature=temperature,
         max_tokens=max_tokens,
         context_limit=context_limit,
+        limiter=limiter,
+        rate_limiter=RateLimiter(rpm=rpm, tpm=tpm) if rpm or tpm else None,
+        backend=backend,
+        stream=os.getenv("AI_DOCS_LLM_STREAM", "false").strip().lower() in {"1", "true", "yes", "y"},
+        stall_timeout=float(os.getenv("AI_DOCS_STREAM_STALL_TIMEOUT", "30")),
+        stop_after_chars=int(os.getenv("AI_DOCS_STREAM_MAX_CHARS", "0")),
     )
@@ -0,0 +1,106 @@
+import hashlib
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Optional
+
+from .utils import ensure_dir, safe_slug
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+def default_mirror_dir() -> Path:
+    raw = os.getenv("AI_DOCS_MIRROR_DIR", "").strip()
+    if raw:
+        return Path(raw).expanduser()
+    return Path.home() / ".cache" / "ai-docs" / "mirrors"
+
+
+@contextmanager
+def _file_lock(path: Path) -> Iterator[None]:
+    ensure_dir(path.parent)
+    with open(path, "a+b") as handle:
+        if fcntl is not None:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+        else:
+            while True:
+                try:
+                    msvcrt.locking(handle.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    time.sleep(0.5)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+            else:
+                handle.seek(0)
+                msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _run_git(*args: str) -> None:
+    subprocess.run(["git", *args], check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+
+class MirrorStore:
+    def __init__(self, base_dir: Optional[Path] = None):
+        self.base_dir = base_dir or default_mirror_dir()
+
+    def mirror_path(self, repo_url: str) -> Path:
+        digest = hashlib.sha256(repo_url.encode("utf-8")).hexdigest()[:16]
+        name = safe_slug(repo_url.rstrip("/").split("/")[-1].replace(".git", "")) or "repo"
+        return self.base_dir / f"{name}-{digest}.git"
+
+    def _lock_path(self, mirror: Path) -> Path:
+        return mirror.with_name(mirror.name + ".lock")
+
+    def _update(self, repo_url: str, mirror: Path) -> None:
+        if (mirror / "HEAD").exists():
+            try:
+                _run_git("--git-dir", str(mirror), "fetch", "--prune", "--quiet", "origin")
+            except subprocess.CalledProcessError as exc:
+                stderr = exc.stderr.decode("utf-8", errors="ignore").strip()
+                print(f"[ai-docs] warning: mirror fetch failed, using cached copy: {stderr}")
+            return
+        ensure_dir(self.base_dir)
+        staging = Path(tempfile.mkdtemp(prefix=mirror.name + ".", dir=self.base_dir))
+        try:
+            _run_git("clone", "--mirror", "--quiet", repo_url, str(staging))
+            os.replace(staging, mirror)
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+    def checkout(self, repo_url: str) -> Path:
+        mirror = self.mirror_path(repo_url)
+        worktree = Path(tempfile.mkdtemp(prefix="ai_docs_"))
+        try:
+            with _file_lock(self._lock_path(mirror)):
+                self._update(repo_url, mirror)
+                _run_git("--git-dir", str(mirror), "worktree", "prune")
+                _run_git("--git-dir", str(mirror), "worktree", "add", "--detach", "--force", str(worktree), "HEAD")
+        except subprocess.CalledProcessError as exc:
+            shutil.rmtree(worktree, ignore_errors=True)
+            stderr = exc.stderr.decode("utf-8", errors="ignore").strip()
+            raise RuntimeError(f"Failed to clone repo: {stderr or exc}")
+        except Exception as exc:
+            shutil.rmtree(worktree, ignore_errors=True)
+            raise RuntimeError(f"Failed to clone repo: {exc}")
+        return worktree
+
+    def release(self, repo_url: str, worktree: Path) -> None:
+        shutil.rmtree(worktree, ignore_errors=True)
+        mirror = self.mirror_path(repo_url)
+        with _file_lock(self._lock_path(mirror)):
+            try:
+                _run_git("--git-dir", str(mirror), "worktree", "prune")
+            except (OSError, subprocess.CalledProcessError):
+                pass
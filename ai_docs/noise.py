@@ -0,0 +1,163 @@
+import json
+import math
+import re
+from collections import Counter
+from pathlib import PurePosixPath
+from typing import Callable, Dict, Optional, Tuple
+
+
+# lockfile name -> package manager
+LOCKFILE_MANAGERS = {
+    "package-lock.json": "npm",
+    "npm-shrinkwrap.json": "npm",
+    "yarn.lock": "yarn",
+    "pnpm-lock.yaml": "pnpm",
+    "bun.lock": "bun",
+    "poetry.lock": "poetry",
+    "Pipfile.lock": "pipenv",
+    "uv.lock": "uv",
+    "pdm.lock": "pdm",
+    "Cargo.lock": "cargo",
+    "composer.lock": "composer",
+    "Gemfile.lock": "bundler",
+    "go.sum": "go modules",
+    "mix.lock": "mix",
+    "packages.lock.json": "nuget",
+    "Podfile.lock": "cocoapods",
+}
+
+GENERATED_SUFFIXES = ("_pb2.py", "_pb2_grpc.py", "_pb2.pyi", ".pb.go", ".pb.cc", ".pb.h", ".pb.ts", "_pb.js", "_grpc_pb.js", ".g.dart", ".designer.cs")
+GENERATED_MARKERS = re.compile(
+    r"Code generated .{0,80}?DO NOT EDIT|DO NOT EDIT|@generated|<auto-generated|"
+    r"Generated by the protocol buffer compiler|This file was automatically generated|THIS FILE IS GENERATED"
+)
+MINIFIABLE_SUFFIXES = {".js", ".mjs", ".cjs", ".css", ".json", ".svg", ".html", ".htm"}
+
+_HEADER_CHARS = 2000
+_SAMPLE_CHARS = 20000
+# Minified bundles and encoded blobs: very long lines, little whitespace, near-random characters.
+_MINIFIED_MEAN_LINE = 300
+_MINIFIED_MAX_LINE = 2000
+_ENCODED_ENTROPY = 5.2
+_ENCODED_MIN_CHARS = 4000
+
+
+def _entropy(text: str) -> float:
+    counts = Counter(text)
+    total = len(text)
+    return -sum(count / total * math.log2(count / total) for count in counts.values())
+
+
+def detect_noise(path: str, content: str) -> Optional[Tuple[str, str]]:
+    # Returns (kind, reason) for lockfiles, generated and minified/encoded files, else None.
+    name = PurePosixPath(path).name
+    suffix = PurePosixPath(name).suffix.lower()
+    if name in LOCKFILE_MANAGERS:
+        return "lockfile", LOCKFILE_MANAGERS[name]
+    for generated_suffix in GENERATED_SUFFIXES:
+        if name.endswith(generated_suffix):
+            return "generated", f"суффикс {generated_suffix}"
+    match = GENERATED_MARKERS.search(content[:_HEADER_CHARS])
+    if match:
+        return "generated", f"маркер «{match.group(0)}»"
+    if ".min." in name and suffix in MINIFIABLE_SUFFIXES:
+        return "minified", "имя *.min.*"
+
+    sample = content[:_SAMPLE_CHARS]
+    if len(sample) < _ENCODED_MIN_CHARS:
+        return None
+    lines = sample.splitlines() or [sample]
+    longest = max(len(line) for line in lines)
+    mean = len(sample) / len(lines)
+    if suffix in MINIFIABLE_SUFFIXES and (mean > _MINIFIED_MEAN_LINE or longest > _MINIFIED_MAX_LINE):
+        return "minified", f"средняя длина строки {int(mean)} символов"
+    whitespace = (len(sample) - len("".join(sample.split()))) / len(sample)
+    if whitespace < 0.02 and _entropy(sample) > _ENCODED_ENTROPY:
+        return "minified", "закодированные данные без пробелов"
+    return None
+
+
+def _count_json_packages(content: str, *keys: str) -> Optional[int]:
+    try:
+        data = json.loads(content)
+    except ValueError:
+        return None
+    if not isinstance(data, dict):
+        return None
+    total = 0
+    for key in keys:
+        value = data.get(key)
+        if isinstance(value, (dict, list)):
+            total += len([item for item in value if item != ""])
+    return total
+
+
+def _npm_packages(content: str) -> Optional[int]:
+    count = _count_json_packages(content, "packages")
+    return count if count else _count_json_packages(content, "dependencies")
+
+
+def _toml_packages(content: str) -> int:
+    return content.count("[[package]]")
+
+
+def _yarn_packages(content: str) -> int:
+    return sum(1 for line in content.splitlines() if line and not line[0].isspace() and not line.startswith("#") and line.rstrip().endswith(":"))
+
+
+def _pnpm_packages(content: str) -> int:
+    count = 0
+    in_packages = False
+    for line in content.splitlines():
+        if line and not line[0].isspace():
+            in_packages = line.rstrip() == "packages:"
+        elif in_packages and line.startswith("  ") and not line.startswith("   ") and line.rstrip().endswith(":"):
+            count += 1
+    return count
+
+
+def _gemfile_packages(content: str) -> int:
+    return sum(1 for line in content.splitlines() if line.startswith("    ") and not line.startswith("     "))
+
+
+def _go_sum_packages(content: str) -> int:
+    return len({line.split()[0] for line in content.splitlines() if line.strip()})
+
+
+_PACKAGE_COUNTERS: Dict[str, Callable[[str], Optional[int]]] = {
+    "package-lock.json": _npm_packages,
+    "npm-shrinkwrap.json": _npm_packages,
+    "yarn.lock": _yarn_packages,
+    "pnpm-lock.yaml": _pnpm_packages,
+    "poetry.lock": _toml_packages,
+    "uv.lock": _toml_packages,
+    "pdm.lock": _toml_packages,
+    "Cargo.lock": _toml_packages,
+    "Pipfile.lock": lambda content: _count_json_packages(content, "default", "develop"),
+    "composer.lock": lambda content: _count_json_packages(content, "packages", "packages-dev"),
+    "Gemfile.lock": _gemfile_packages,
+    "go.sum": _go_sum_packages,
+}
+
+
+def noise_summary(path: str, content: str, kind: str, reason: str) -> str:
+    name = PurePosixPath(path).name
+    lines = content.count("\n") + (1 if content and not content.endswith("\n") else 0)
+    size = len(content.encode("utf-8"))
+    if kind == "lockfile":
+        counter = _PACKAGE_COUNTERS.get(name)
+        packages = counter(content) if counter else None
+        pinned = f"зафиксировано пакетов: {packages}" if packages is not None else f"{lines} строк"
+        return (
+            f"Файл блокировки зависимостей `{name}` ({reason}): {pinned}. "
+            "Создаётся менеджером пакетов и фиксирует точные версии зависимостей; вручную не редактируется."
+        )
+    if kind == "generated":
+        return (
+            f"Сгенерированный файл `{name}` ({reason}), {lines} строк. "
+            "Содержимое создаётся генератором кода из исходного описания; изменения вносятся в источник, а не в этот файл."
+        )
+    return (
+        f"Минифицированный или закодированный файл `{name}` ({reason}), {size} байт. "
+        "Является артефактом сборки; исходный код следует искать в несжатых файлах проекта."
+    )
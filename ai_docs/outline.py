@@ -0,0 +1,136 @@
+import json
+import re
+from pathlib import PurePosixPath
+from typing import List, Tuple
+
+from .tokenizer import count_tokens, estimate_tokens, fits_within, truncate_tokens
+
+
+DEFAULT_FILE_TOKEN_BUDGET = 8000
+
+_CODE_DECL = re.compile(
+    r"^\s*(?:@[\w.]+|(?:export|default|public|private|protected|internal|static|abstract|final|async|override|"
+    r"pub(?:\([^)]*\))?)\s+)*(?:def|class|func|function|fn|impl|interface|struct|enum|trait|type|module|"
+    r"namespace|package|object|record|procedure|macro_rules!)\b"
+)
+_TOP_LEVEL_BINDING = re.compile(r"^(?:export\s+)?(?:const|let|var)\s+\w+")
+_CALLABLE_DECL = re.compile(r"^\s{0,4}[\w<>\[\],.*&:~ ]+\([^;]*\)\s*(?:\{|:|=>|->.*)?\s*$")
+_CONTROL = re.compile(r"^\s*(?:if|for|while|switch|return|catch|else|elif|with|try|do|case)\b")
+_SQL_DECL = re.compile(r"^\s*(?:CREATE|ALTER)\s+\w+", re.IGNORECASE)
+_HCL_BLOCK = re.compile(r"^(?:resource|data|module|variable|output|provider|locals|terraform)\b")
+_YAML_KEY = re.compile(r"^\s{0,2}[\w\"'.\-/$]+\s*:")
+_INI_LINE = re.compile(r"^\s*\[[^\]]+\]|^[\w.\-]+\s*=")
+_MD_HEADING = re.compile(r"^#{1,6}\s")
+_RST_UNDERLINE = re.compile(r"^([=\-~^\"'`#*+])\1{2,}\s*$")
+
+_MAX_OUTLINE_LINE = 160
+_SAMPLES = 4
+
+
+def _numbered(lines: List[str], indices: List[int]) -> List[str]:
+    return [f"{idx + 1}: {lines[idx].strip()[:_MAX_OUTLINE_LINE]}" for idx in indices]
+
+
+def _code_outline(lines: List[str]) -> List[int]:
+    picked = []
+    for idx, line in enumerate(lines):
+        if not line.strip() or _CONTROL.match(line):
+            continue
+        if _CODE_DECL.match(line) or _TOP_LEVEL_BINDING.match(line) or _SQL_DECL.match(line) or _HCL_BLOCK.match(line):
+            picked.append(idx)
+        elif _CALLABLE_DECL.match(line) and not line.rstrip().endswith(";"):
+            picked.append(idx)
+    return picked
+
+
+def _json_outline(content: str) -> List[str]:
+    try:
+        data = json.loads(content)
+    except ValueError:
+        return []
+
+    def describe(value: object) -> str:
+        if isinstance(value, dict):
+            return f"{{{len(value)} ключей}}"
+        if isinstance(value, list):
+            return f"[{len(value)} элементов]"
+        return json.dumps(value, ensure_ascii=False)[:60]
+
+    if not isinstance(data, dict):
+        return [describe(data)]
+    entries = []
+    for key, value in data.items():
+        entries.append(f"{key}: {describe(value)}")
+        if isinstance(value, dict):
+            entries.extend(f"  {key}.{sub}: {describe(sub_value)}" for sub, sub_value in list(value.items())[:20])
+    return entries
+
+
+def build_outline(path: str, content: str) -> List[str]:
+    # Compact structure of a file: signatures, top-level keys or section headings, with line numbers.
+    suffix = PurePosixPath(path).suffix.lower()
+    lines = content.splitlines()
+    if suffix == ".json":
+        entries = _json_outline(content)
+        if entries:
+            return entries
+        return _numbered(lines, [idx for idx, line in enumerate(lines) if re.match(r'^\s{0,4}"[^"]+"\s*:', line)])
+    if suffix in {".yml", ".yaml"}:
+        return _numbered(lines, [idx for idx, line in enumerate(lines) if _YAML_KEY.match(line) and not line.lstrip().startswith("-")])
+    if suffix in {".toml", ".ini", ".cfg", ".conf", ".properties", ".env"}:
+        return _numbered(lines, [idx for idx, line in enumerate(lines) if _INI_LINE.match(line)])
+    if suffix in {".md", ".markdown"}:
+        return _numbered(lines, [idx for idx, line in enumerate(lines) if _MD_HEADING.match(line)])
+    if suffix in {".rst", ".adoc", ".txt"}:
+        headings = [idx - 1 for idx, line in enumerate(lines) if idx and _RST_UNDERLINE.match(line) and lines[idx - 1].strip()]
+        return _numbered(lines, headings)
+    return _numbered(lines, _code_outline(lines))
+
+
+def _truncate_lines(text: str, model: str, max_tokens: int) -> str:
+    # Token truncation that ends on a whole line whenever at least one line fits.
+    cut = truncate_tokens(text, model, max_tokens)
+    if cut != text and "\n" in cut:
+        cut = cut.rsplit("\n", 1)[0]
+    return cut
+
+
+def _sample_windows(lines: List[str], model: str, budget: int) -> List[str]:
+    # Evenly spaced excerpts (head, middle parts, tail) that together fit the budget.
+    if budget <= 0 or not lines:
+        return []
+    step = max(1, len(lines) // _SAMPLES)
+    samples = []
+    for start in range(0, len(lines), step)[:_SAMPLES]:
+        label = f"--- строки {start + 1}-{start + step} ---"
+        window_budget = budget // _SAMPLES - count_tokens(label, model) - 2
+        if window_budget <= 0:
+            break
+        text = _truncate_lines("\n".join(lines[start:start + step]), model, window_budget)
+        shown = text.count("\n") + 1
+        samples.append(f"--- строки {start + 1}-{start + shown} ---\n{text}")
+    return samples
+
+
+def condense(path: str, content: str, model: str, budget: int) -> Tuple[str, bool]:
+    # Returns the content itself when it fits the per-file token budget, otherwise an outline plus
+    # sampled bodies bounded by the budget, so summarizing costs the same for any file size.
+    if budget <= 0 or fits_within(content, model, budget):
+        return content, False
+    total = estimate_tokens(content, model)
+    lines = content.splitlines()
+    header = (
+        f"[Файл слишком большой для полного анализа: {len(lines)} строк, ~{total} токенов. "
+        "Ниже структура файла и выборочные фрагменты.]"
+    )
+    parts = [header]
+    outline = _truncate_lines("\n".join(build_outline(path, content)), model, budget // 2)
+    if outline:
+        parts.append("## Структура\n" + outline)
+    samples_heading = "## Фрагменты\n"
+    # Separators and headings are counted too; the result stays within the budget.
+    remaining = budget - count_tokens("\n\n".join(parts + [samples_heading]), model) - 2 * _SAMPLES
+    samples = _sample_windows(lines, model, remaining)
+    if samples:
+        parts.append(samples_heading + "\n".join(samples))
+    return "\n\n".join(parts), True
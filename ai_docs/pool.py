@@ -0,0 +1,230 @@
+import asyncio
+import time
+from collections import deque
+from typing import AsyncIterator, Deque, Dict, List, Optional, Sequence, Tuple
+
+from .backends import Completion, classify_error
+
+
+STRATEGIES = ("least", "ewma")
+_EWMA_ALPHA = 0.3
+
+
+def parse_endpoints(spec: str) -> List[Tuple[str, float, int]]:
+    # "url[|weight[|max in flight]],..." -> [(url, weight, cap)]; cap 0 means uncapped.
+    endpoints: List[Tuple[str, float, int]] = []
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        parts = [part.strip() for part in item.split("|")]
+        try:
+            weight = float(parts[1]) if len(parts) > 1 and parts[1] else 1.0
+            cap = int(parts[2]) if len(parts) > 2 and parts[2] else 0
+        except ValueError:
+            raise RuntimeError(f"Invalid endpoint spec: {item} (expected url|weight|max_in_flight)") from None
+        if weight <= 0:
+            raise RuntimeError(f"Endpoint weight must be positive: {item}")
+        endpoints.append((parts[0].rstrip("/"), weight, max(0, cap)))
+    return endpoints
+
+
+def _should_fail_over(status: Optional[int], is_timeout: bool) -> bool:
+    # Anything but a 4xx about the request itself may go better on another endpoint.
+    return is_timeout or status is None or status in {408, 429} or status >= 500
+
+
+def _counts_against(status: Optional[int], is_timeout: bool) -> bool:
+    # 429 means busy, not broken: it moves traffic away through in_flight/latency, not ejection.
+    return is_timeout or status is None or status >= 500
+
+
+class Endpoint:
+    def __init__(self, name: str, backend, weight: float = 1.0, max_in_flight: int = 0):
+        self.name = name
+        self.backend = backend
+        self.weight = weight
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+        self.requests = 0
+        self.failures = 0
+        self.ejections = 0
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+        self.latency: Optional[float] = None
+
+    def ejected(self, now: float) -> bool:
+        return now < self.ejected_until
+
+    def has_capacity(self) -> bool:
+        return not self.max_in_flight or self.in_flight < self.max_in_flight
+
+
+class EndpointPool:
+    # Backend spreading requests over several OpenAI-compatible endpoints. Each request goes to
+    # the free endpoint with the fewest outstanding requests per unit of weight ("least"), or with
+    # the lowest outstanding x latency EWMA ("ewma"); endpoints at their in-flight cap are skipped.
+    # A failed attempt fails over to an endpoint not yet tried for that request, and `eject_after`
+    # consecutive 5xx, timeouts or connection errors take an endpoint out for `eject_seconds`.
+    # When every endpoint is ejected, all of them are used again rather than failing outright.
+    def __init__(
+        self,
+        endpoints: Sequence[Endpoint],
+        strategy: str = "least",
+        eject_after: int = 3,
+        eject_seconds: float = 30.0,
+        clock=time.monotonic,
+    ):
+        if not endpoints:
+            raise RuntimeError("Endpoint pool needs at least one endpoint")
+        if strategy not in STRATEGIES:
+            raise RuntimeError(f"Unknown balancing strategy: {strategy} (expected one of {', '.join(STRATEGIES)})")
+        self.endpoints = list(endpoints)
+        self.strategy = strategy
+        self.eject_after = max(1, eject_after)
+        self.eject_seconds = eject_seconds
+        self.failovers = 0
+        self._clock = clock
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    @property
+    def capacity(self) -> int:
+        # Total in-flight cap, or 0 when any endpoint is uncapped.
+        if any(not endpoint.max_in_flight for endpoint in self.endpoints):
+            return 0
+        return sum(endpoint.max_in_flight for endpoint in self.endpoints)
+
+    def _score(self, endpoint: Endpoint, default_latency: float) -> Tuple[float, float, float]:
+        # Ties go to the endpoint that has served less of its weighted share so far.
+        load = (endpoint.in_flight + 1) / endpoint.weight
+        latency = endpoint.latency if endpoint.latency is not None else default_latency
+        share = endpoint.requests / endpoint.weight
+        if self.strategy == "ewma":
+            return load * latency, load, share
+        return load, latency, share
+
+    def _pick(self, tried: List[Endpoint]) -> Optional[Endpoint]:
+        now = self._clock()
+        untried = [endpoint for endpoint in self.endpoints if endpoint not in tried] or self.endpoints
+        candidates = [endpoint for endpoint in untried if not endpoint.ejected(now)] or untried
+        free = [endpoint for endpoint in candidates if endpoint.has_capacity()]
+        if not free:
+            return None
+        # Unmeasured endpoints look as fast as the fastest measured one, so they get traffic too.
+        known = [endpoint.latency for endpoint in self.endpoints if endpoint.latency is not None]
+        default_latency = min(known) if known else 1.0
+        return min(free, key=lambda endpoint: self._score(endpoint, default_latency))
+
+    async def _acquire(self, tried: List[Endpoint]) -> Endpoint:
+        while True:
+            endpoint = self._pick(tried)
+            if endpoint is not None:
+                break
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            finally:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+        endpoint.in_flight += 1
+        endpoint.requests += 1
+        return endpoint
+
+    def _free(self, endpoint: Endpoint) -> None:
+        endpoint.in_flight -= 1
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+
+    def _release(self, endpoint: Endpoint, started: float, exc: Optional[BaseException] = None) -> None:
+        if exc is None:
+            latency = self._clock() - started
+            endpoint.latency = latency if endpoint.latency is None else endpoint.latency + _EWMA_ALPHA * (latency - endpoint.latency)
+            endpoint.consecutive_failures = 0
+        elif not isinstance(exc, Exception) or _counts_against(*classify_error(exc)):
+            endpoint.failures += 1
+            endpoint.consecutive_failures += 1
+            if endpoint.consecutive_failures >= self.eject_after:
+                # Back on probation: the first failure after the timeout ejects it again.
+                endpoint.consecutive_failures = self.eject_after - 1
+                endpoint.ejections += 1
+                endpoint.ejected_until = self._clock() + self.eject_seconds
+                print(f"[ai-docs] llm endpoint {endpoint.name} ejected for {self.eject_seconds:.0f}s after repeated failures")
+        self._free(endpoint)
+
+    def _fail_over(self, exc: Exception, tried: List[Endpoint]) -> bool:
+        if len(tried) >= len(self.endpoints) or not _should_fail_over(*classify_error(exc)):
+            return False
+        self.failovers += 1
+        return True
+
+    async def complete(self, payload: Dict, timeout) -> Completion:
+        tried: List[Endpoint] = []
+        while True:
+            endpoint = await self._acquire(tried)
+            tried.append(endpoint)
+            started = self._clock()
+            try:
+                completion = await endpoint.backend.complete(payload, timeout)
+            except Exception as exc:
+                self._release(endpoint, started, exc)
+                if self._fail_over(exc, tried):
+                    continue
+                raise
+            except BaseException:
+                # Cancelled by the caller: the slot is freed, the endpoint is not blamed.
+                self._free(endpoint)
+                raise
+            self._release(endpoint, started)
+            return completion
+
+    async def stream(self, payload: Dict, timeout) -> AsyncIterator[str]:
+        # Fails over only before the first piece; after that the caller already has partial output.
+        tried: List[Endpoint] = []
+        while True:
+            endpoint = await self._acquire(tried)
+            tried.append(endpoint)
+            started = self._clock()
+            pieces = endpoint.backend.stream(payload, timeout)
+            yielded = False
+            try:
+                async for piece in pieces:
+                    yielded = True
+                    yield piece
+            except GeneratorExit:
+                # The caller stopped reading (early stop): a healthy response.
+                self._release(endpoint, started)
+                raise
+            except asyncio.CancelledError as exc:
+                # The client gave up on a stalled stream: counts like a timeout.
+                self._release(endpoint, started, exc)
+                raise
+            except Exception as exc:
+                self._release(endpoint, started, exc)
+                if not yielded and self._fail_over(exc, tried):
+                    continue
+                raise
+            finally:
+                await pieces.aclose()
+            self._release(endpoint, started)
+            return
+
+    def stats(self) -> List[Dict[str, Optional[float]]]:
+        return [
+            {
+                "name": endpoint.name,
+                "requests": endpoint.requests,
+                "failures": endpoint.failures,
+                "ejections": endpoint.ejections,
+                "latency": endpoint.latency,
+            }
+            for endpoint in self.endpoints
+        ]
+
+
+def pool_from_spec(spec: str, make_backend, strategy: str = "least", eject_after: int = 3, eject_seconds: float = 30.0) -> EndpointPool:
+    # make_backend(url) builds the transport for one endpoint.
+    endpoints = [Endpoint(url, make_backend(url), weight, cap) for url, weight, cap in parse_endpoints(spec)]
+    return EndpointPool(endpoints, strategy=strategy, eject_after=eject_after, eject_seconds=eject_seconds)
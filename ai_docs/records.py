@@ -0,0 +1,50 @@
+from pathlib import Path
+from typing import Dict, List, Optional
+
+
+class FileRecord:
+    # One scanned file. The body is not kept, so a large scan only holds metadata in memory;
+    # generator_shared.file_content() reads it from `abs_path` when a summary needs it.
+    __slots__ = ("path", "abs_path", "size", "hash", "type", "domains", "mtime_ns", "inode", "blob", "reused")
+
+    def __init__(
+        self,
+        path: str,
+        abs_path: Path,
+        size: Optional[int],
+        hash: str,
+        type: str,
+        domains: List[str],
+        mtime_ns: Optional[int] = None,
+        inode: Optional[int] = None,
+        blob: Optional[str] = None,
+        reused: bool = False,
+    ):
+        self.path = path
+        self.abs_path = abs_path
+        self.size = size
+        self.hash = hash
+        self.type = type
+        self.domains = domains
+        self.mtime_ns = mtime_ns
+        self.inode = inode
+        self.blob = blob
+        # True when the entry was carried over from the previous index without reading the file.
+        self.reused = reused
+
+    def meta(self) -> Dict:
+        entry = {
+            "hash": self.hash,
+            "size": self.size,
+            "type": self.type,
+            "domains": self.domains,
+            "abs_path": self.abs_path,
+            "mtime_ns": self.mtime_ns,
+            "inode": self.inode,
+        }
+        if self.blob:
+            entry["blob"] = self.blob
+        return entry
+
+    def __repr__(self) -> str:
+        return f"FileRecord({self.path!r}, hash={self.hash[:12]!r}, type={self.type!r})"
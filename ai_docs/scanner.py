@@ -1,9 +1,13 @@
 import os
-import shutil
+import re
+import stat
 import subprocess
-import tempfile
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
-from typing import Dict, List, Optional, Set, Tuple
+from typing import Callable, Deque, Dict, Iterable, Iterator, List, Optional, Set, Tuple
 
 import pathspec
 import yaml
@@ -12,11 +16,16 @@ from .domain import (
     CODE_EXTENSION_DESCRIPTIONS,
     CONFIG_EXTENSION_DESCRIPTIONS,
     DOC_EXTENSION_DESCRIPTIONS,
+    DEFAULT_CLASSIFIER,
+    DomainClassifier,
+    build_classifier,
     classify_type,
-    detect_domains,
+    rules_from_config,
     is_infra,
 )
-from .utils import is_binary_file, is_url, read_text_file, to_posix
+from .mirror import MirrorStore
+from .records import FileRecord
+from .utils import decode_text, git_blob_sha, is_url, open_source, read_text_file, sha256_text
 
 
 FIXED_INCLUDE_PATTERNS = {
@@ -45,11 +54,34 @@ DEFAULT_EXCLUDE_PATTERNS = {
 
 
 class ScanResult:
-    def __init__(self, root: Path, files: List[Dict], source: str, repo_name: str):
+    def __init__(
+        self,
+        root: Path,
+        files: Iterable[FileRecord],
+        source: str,
+        repo_name: str,
+        git_head: Optional[str] = None,
+        changed_paths: Optional[Set[str]] = None,
+        renames: Optional[Dict[str, str]] = None,
+        release: Optional[Callable[[], None]] = None,
+        domain_rules: Optional[str] = None,
+    ):
         self.root = root
         self.files = files
         self.source = source
         self.repo_name = repo_name
+        self.git_head = git_head
+        # Set only by the commit-range scan: paths that may differ from the previous index.
+        self.changed_paths = changed_paths
+        self.renames = renames or {}
+        self._release = release
+        # Signature of the domain rules used for this scan, recorded in the index.
+        self.domain_rules = domain_rules
+
+    def release(self) -> None:
+        if self._release is not None:
+            self._release()
+            self._release = None
 
 
 def _normalize_extensions(raw: object, defaults: Dict[str, str]) -> Dict[str, str]:
@@ -99,15 +131,15 @@ def _load_extension_config(root: Path) -> Dict[str, object]:
             yaml.safe_dump(payload, allow_unicode=True, sort_keys=False),
             encoding="utf-8",
         )
-        return {**{key: value.copy() for key, value in defaults.items()}, "exclude": set()}
+        return {**{key: value.copy() for key, value in defaults.items()}, "exclude": set(), "domain_rules": []}
 
     try:
         raw = yaml.safe_load(config_path.read_text(encoding="utf-8", errors="ignore")) or {}
     except yaml.YAMLError:
-        return {**{key: value.copy() for key, value in defaults.items()}, "exclude": set()}
+        return {**{key: value.copy() for key, value in defaults.items()}, "exclude": set(), "domain_rules": []}
 
     if not isinstance(raw, dict):
-        return {**{key: value.copy() for key, value in defaults.items()}, "exclude": set()}
+        return {**{key: value.copy() for key, value in defaults.items()}, "exclude": set(), "domain_rules": []}
 
     code_raw = raw.get("code_extensions") or {}
     doc_raw = raw.get("doc_extensions") or {}
@@ -119,6 +151,7 @@ def _load_extension_config(root: Path) -> Dict[str, object]:
         "doc_extensions": _normalize_extensions(doc_raw, defaults["doc_extensions"]),
         "config_extensions": _normalize_extensions(config_raw, defaults["config_extensions"]),
         "exclude": _normalize_excludes(exclude_raw),
+        "domain_rules": rules_from_config(raw.get("domains")),
     }
 
 
@@ -129,110 +162,627 @@ def _build_default_include_patterns(extension_config: Dict[str, object]) -> Set[
     return {f"*{ext}" for ext in extensions} | FIXED_INCLUDE_PATTERNS
 
 
-def _load_ignore_specs(root: Path) -> List[pathspec.PathSpec]:
-    specs: List[pathspec.PathSpec] = []
-    for name in (".gitignore", ".build_ignore"):
-        ignore_file = root / name
-        if not ignore_file.exists():
-            continue
-        patterns = ignore_file.read_text(encoding="utf-8", errors="ignore").splitlines()
-        specs.append(pathspec.PathSpec.from_lines("gitignore", patterns))
-    return specs
+IGNORE_FILENAMES = (".gitignore", ".build_ignore")
+
+# What happens to files above max_size: summarized from an outline, or skipped entirely.
+OVERSIZED_MODES = ("outline", "skip")
+# Even outlined files are decoded in full to be hashed; anything above this is never read.
+OUTLINE_HARD_MAX_SIZE = 32 * 1024 * 1024
+
+_RACY_WINDOW_NS = 2_000_000_000
+# Leading characters of a file searched by content-based domain rules.
+_SNIPPET_CHARS = 4000
+
+
+def _spec_verdict(spec: pathspec.PathSpec, rel_path: str) -> Optional[bool]:
+    for pattern in reversed(spec.patterns):
+        if pattern.include is not None and pattern.match_file(rel_path) is not None:
+            return pattern.include
+    return None
 
 
-def _should_include(rel_path: str, include: Optional[Set[str]], exclude: Optional[Set[str]], ignore_specs: List[pathspec.PathSpec]) -> bool:
-    for spec in ignore_specs:
-        if spec.match_file(rel_path):
+class IgnoreTree:
+    def __init__(self, root: Path):
+        self.root = root
+        self._specs: Dict[str, List[pathspec.PathSpec]] = {}
+        self._chains: Dict[str, List[Tuple[str, pathspec.PathSpec]]] = {}
+
+    def _load(self, rel_dir: str) -> List[pathspec.PathSpec]:
+        specs = self._specs.get(rel_dir)
+        if specs is None:
+            specs = []
+            directory = self.root / rel_dir if rel_dir else self.root
+            for name in IGNORE_FILENAMES:
+                ignore_file = directory / name
+                if not ignore_file.is_file():
+                    continue
+                patterns = read_text_file(ignore_file).splitlines()
+                specs.append(pathspec.PathSpec.from_lines("gitignore", patterns))
+            self._specs[rel_dir] = specs
+        return specs
+
+    def chain(self, rel_dir: str) -> List[Tuple[str, pathspec.PathSpec]]:
+        chain = self._chains.get(rel_dir)
+        if chain is None:
+            chain = list(self.chain(rel_dir.rpartition("/")[0])) if rel_dir else []
+            prefix = f"{rel_dir}/" if rel_dir else ""
+            chain.extend((prefix, spec) for spec in self._load(rel_dir))
+            self._chains[rel_dir] = chain
+        return chain
+
+    def is_ignored(self, rel_path: str, is_dir: bool = False) -> bool:
+        # Deeper ignore files override shallower ones; within a file the last matching pattern wins.
+        target = f"{rel_path}/" if is_dir else rel_path
+        ignored = False
+        for prefix, spec in self.chain(rel_path.rpartition("/")[0]):
+            verdict = _spec_verdict(spec, target[len(prefix):])
+            if verdict is not None:
+                ignored = verdict
+        return ignored
+
+
+_GLOB_CHARS = frozenset("*?[]!\\")
+_NAMED_GROUP_RE = re.compile(r"\(\?P<\w+>")
+# Stand-in child name used to ask whether a pattern matches every entry below a directory.
+_DIR_PROBE = "\x00\x00\x00"
+
+
+def _has_glob(value: str) -> bool:
+    return any(c in _GLOB_CHARS for c in value)
+
+
+def _combine_patterns(patterns: List[str]) -> Optional["re.Pattern[str]"]:
+    if not patterns:
+        return None
+    spec = pathspec.PathSpec.from_lines("gitignore", patterns)
+    regexes = [_NAMED_GROUP_RE.sub("(?:", p.regex.pattern) for p in spec.patterns if p.include]
+    if not regexes:
+        return None
+    return re.compile("|".join(f"(?:{r})" for r in regexes))
+
+
+class _PatternSet:
+    def __init__(self, patterns: Iterable[str]):
+        self.names: Set[str] = set()
+        self.suffixes: Set[str] = set()
+        self.long_suffixes: Tuple[str, ...] = ()
+        self.prefixes: Tuple[str, ...] = ()
+        long_suffixes: List[str] = []
+        prefixes: List[str] = []
+        general: List[str] = []
+        for raw in sorted(patterns or ()):
+            pattern = raw.strip()
+            # A lone negation or comment never matched anything when patterns were checked one by one.
+            if not pattern or pattern.startswith(("#", "!")):
+                continue
+            if "/" in pattern:
+                general.append(pattern)
+            elif not _has_glob(pattern):
+                self.names.add(pattern)
+            elif pattern.startswith("*") and not _has_glob(pattern[1:]):
+                suffix = pattern[1:]
+                if suffix.startswith(".") and suffix.count(".") == 1:
+                    self.suffixes.add(suffix)
+                else:
+                    long_suffixes.append(suffix)
+            elif pattern.endswith("*") and not _has_glob(pattern[:-1]):
+                prefixes.append(pattern[:-1])
+            else:
+                general.append(pattern)
+        self.long_suffixes = tuple(long_suffixes)
+        self.prefixes = tuple(prefixes)
+        self.regex = _combine_patterns(general)
+
+    def matches(self, rel_path: str) -> bool:
+        names = self.names
+        suffixes = self.suffixes
+        for part in rel_path.split("/"):
+            if part in names:
+                return True
+            if suffixes:
+                dot = part.rfind(".")
+                if dot >= 0 and part[dot:] in suffixes:
+                    return True
+            if self.long_suffixes and part.endswith(self.long_suffixes):
+                return True
+            if self.prefixes and part.startswith(self.prefixes):
+                return True
+        if self.regex is not None:
+            return self.regex.match(rel_path) is not None
+        return False
+
+    def matches_dir(self, rel_dir: str) -> bool:
+        return self.matches(f"{rel_dir}/{_DIR_PROBE}")
+
+
+class PathMatcher:
+    def __init__(self, include: Optional[Set[str]], exclude: Optional[Set[str]], ignore: Optional[IgnoreTree] = None):
+        self.ignore = ignore
+        self.exclude = _PatternSet(exclude or ())
+        self.include = _PatternSet(include) if include else None
+        self._allowed_dirs: Dict[str, bool] = {"": True}
+
+    def should_descend(self, rel_dir: str) -> bool:
+        if self.ignore is not None and self.ignore.is_ignored(rel_dir, is_dir=True):
             return False
-    if exclude:
-        for pattern in exclude:
-            if pathspec.PathSpec.from_lines("gitignore", [pattern]).match_file(rel_path):
-                return False
-    if not include:
-        return True
-    for pattern in include:
-        if pathspec.PathSpec.from_lines("gitignore", [pattern]).match_file(rel_path):
-            return True
-    return False
+        return not self.exclude.matches_dir(rel_dir)
+
+    def allows(self, rel_path: str) -> bool:
+        return self._dir_allowed(rel_path.rpartition("/")[0]) and self.should_include(rel_path)
+
+    def _dir_allowed(self, rel_dir: str) -> bool:
+        allowed = self._allowed_dirs.get(rel_dir)
+        if allowed is None:
+            parent, _, name = rel_dir.rpartition("/")
+            allowed = self._dir_allowed(parent) and name != ".git" and self.should_descend(rel_dir)
+            self._allowed_dirs[rel_dir] = allowed
+        return allowed
 
+    def should_include(self, rel_path: str) -> bool:
+        if self.ignore is not None and self.ignore.is_ignored(rel_path):
+            return False
+        if self.exclude.matches(rel_path):
+            return False
+        if self.include is None:
+            return True
+        return self.include.matches(rel_path)
 
-def _scan_directory(root: Path, include: Optional[Set[str]], exclude: Optional[Set[str]], max_size: int) -> List[Dict]:
-    files: List[Dict] = []
-    ignore_specs = _load_ignore_specs(root)
 
+def _walk_candidates(root: Path, matcher: PathMatcher) -> Iterator[Tuple[Path, str]]:
+    root_str = str(root)
     for dirpath, dirnames, filenames in os.walk(root):
-        # Avoid .git directory traversal
-        dirnames[:] = [d for d in dirnames if d != ".git"]
-        for filename in filenames:
-            abs_path = Path(dirpath) / filename
-            rel_path = abs_path.relative_to(root)
-            rel_path_str = to_posix(rel_path)
-
-            if not _should_include(rel_path_str, include, exclude, ignore_specs):
-                continue
+        rel_dir = dirpath[len(root_str):].lstrip(os.sep).replace(os.sep, "/")
+        prefix = f"{rel_dir}/" if rel_dir else ""
+        # Prune .git and excluded/ignored directories before descending into them
+        dirnames[:] = sorted(d for d in dirnames if d != ".git" and matcher.should_descend(prefix + d))
+        for filename in sorted(filenames):
+            rel_path_str = prefix + filename
+            if matcher.should_include(rel_path_str):
+                yield Path(dirpath) / filename, rel_path_str
+
+
+def _fingerprint_matches(previous: Optional[Dict], st: os.stat_result) -> bool:
+    if not previous or not previous.get("hash") or previous.get("mtime_ns") is None:
+        return False
+    return (
+        previous.get("mtime_ns") == st.st_mtime_ns
+        and previous.get("size") == st.st_size
+        and previous.get("inode") == st.st_ino
+    )
+
+
+def _reused_entry(abs_path: Path, rel_path_str: str, previous: Dict, **overrides) -> FileRecord:
+    fields = {
+        "size": previous.get("size"),
+        "type": previous.get("type") or classify_type(Path("/") / rel_path_str),
+        "domains": list(previous.get("domains", [])),
+        "mtime_ns": previous.get("mtime_ns"),
+        "inode": previous.get("inode"),
+        "blob": previous.get("blob"),
+    }
+    fields.update(overrides)
+    return FileRecord(rel_path_str, abs_path, hash=previous["hash"], reused=True, **fields)
 
-            if abs_path.is_symlink():
-                continue
 
-            try:
-                size = abs_path.stat().st_size
-            except OSError:
-                continue
+def _classify(rel_path_str: str, content_snippet: str, classifier: DomainClassifier) -> Tuple[str, List[str]]:
+    # Classify by the repository path, not the checkout location; anchored at "/" so that
+    # "/templates/"-style markers still match top-level directories.
+    rel_path = Path("/") / rel_path_str
+    file_type = classify_type(rel_path)
+    domains = classifier.classify(rel_path, content_snippet)
+    if is_infra(domains):
+        file_type = "infra"
+    return file_type, sorted(domains)
 
-            if max_size and size > max_size:
-                continue
 
-            if is_binary_file(abs_path):
-                continue
+def _renamed_entry(abs_path: Path, rel_path_str: str, previous: Dict, classifier: DomainClassifier) -> Optional[FileRecord]:
+    # Type and domains depend on the path: a pure rename keeps its entry only when the new
+    # path classifies the same, otherwise the file is ingested again like a modified one.
+    try:
+        with open_source(abs_path) as data:
+            if data is None:
+                return None
+            content_snippet = decode_text(data)[:_SNIPPET_CHARS]
+    except OSError:
+        return None
+    if _classify(rel_path_str, content_snippet, classifier) != (previous.get("type"), sorted(previous.get("domains", []))):
+        return None
+    return _reused_entry(abs_path, rel_path_str, previous, mtime_ns=None, inode=None)
+
+
+def _ingest_file(
+    abs_path: Path,
+    rel_path_str: str,
+    max_size: int,
+    previous: Optional[Dict] = None,
+    blob: Optional[str] = None,
+    object_format: Optional[str] = None,
+    classifier: DomainClassifier = DEFAULT_CLASSIFIER,
+) -> Optional[FileRecord]:
+    # Clean tracked file whose index blob is already documented: no syscalls at all.
+    if blob and previous and previous.get("blob") == blob and previous.get("hash"):
+        return _reused_entry(abs_path, rel_path_str, previous)
 
-            content = read_text_file(abs_path)
-            content_snippet = content[:4000]
-            file_type = classify_type(abs_path)
-            domains = detect_domains(abs_path, content_snippet)
-            if is_infra(domains):
-                file_type = "infra"
-
-            files.append(
-                {
-                    "path": rel_path_str,
-                    "abs_path": abs_path,
-                    "size": size,
-                    "content": content,
-                    "type": file_type,
-                    "domains": sorted(domains),
-                }
-            )
+    try:
+        st = os.lstat(abs_path)
+    except OSError:
+        return None
+
+    if stat.S_ISLNK(st.st_mode):
+        return None
+
+    size = st.st_size
+    if max_size and size > max_size:
+        return None
 
-    return files
+    # A file touched within the racy window may change again without moving mtime; re-read it next time.
+    mtime_ns: Optional[int] = st.st_mtime_ns
+    if time.time_ns() - st.st_mtime_ns < _RACY_WINDOW_NS:
+        mtime_ns = None
 
+    if object_format is None and _fingerprint_matches(previous, st):
+        return _reused_entry(abs_path, rel_path_str, previous, size=size, mtime_ns=mtime_ns, inode=st.st_ino)
 
-def _clone_repo(repo_url: str) -> Tuple[Path, str]:
-    tmpdir = Path(tempfile.mkdtemp(prefix="ai_docs_"))
     try:
-        subprocess.check_call(["git", "clone", "--depth", "1", repo_url, str(tmpdir)])
-    except Exception as exc:
-        shutil.rmtree(tmpdir, ignore_errors=True)
-        raise RuntimeError(f"Failed to clone repo: {exc}")
-    repo_name = repo_url.rstrip("/").split("/")[-1].replace(".git", "")
-    return tmpdir, repo_name
+        with open_source(abs_path) as data:
+            if data is None:
+                return None
+            if object_format is not None:
+                blob = blob or git_blob_sha(data, object_format)
+            # `hash` is always the content hash, so indexes built with and without
+            # --git-index stay comparable; the blob id is recorded next to it.
+            text = decode_text(data)
+            file_hash = sha256_text(text)
+            content_snippet = text[:_SNIPPET_CHARS]
+    except OSError:
+        return None
+    file_type, domains = _classify(rel_path_str, content_snippet, classifier)
+
+    # The body itself is dropped here; file_content() re-reads it when a summary needs it.
+    return FileRecord(
+        rel_path_str,
+        abs_path,
+        size=size,
+        hash=file_hash,
+        type=file_type,
+        domains=domains,
+        mtime_ns=mtime_ns,
+        inode=st.st_ino,
+        blob=blob,
+    )
+
+
+def _ingest_iter(candidates: Iterable, ingest: Callable[..., Optional[FileRecord]], workers: int) -> Iterator[FileRecord]:
+    if workers <= 1:
+        for item in candidates:
+            result = ingest(item)
+            if result is not None:
+                yield result
+        return
+    # Overlap stat/read syscalls while keeping the deterministic candidate order. A bounded
+    # window of futures (unlike pool.map) lets results flow out while the walk is still running.
+    window: Deque[Future] = deque()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ai-docs-scan") as pool:
+        for item in candidates:
+            window.append(pool.submit(ingest, item))
+            if len(window) >= workers * 4:
+                result = window.popleft().result()
+                if result is not None:
+                    yield result
+        while window:
+            result = window.popleft().result()
+            if result is not None:
+                yield result
+
+
+def _ingest_all(candidates: Iterable, ingest: Callable[..., Optional[FileRecord]], workers: int) -> List[FileRecord]:
+    return list(_ingest_iter(candidates, ingest, workers))
+
+
+def _scan_directory(
+    root: Path,
+    include: Optional[Set[str]],
+    exclude: Optional[Set[str]],
+    max_size: int,
+    workers: int = 1,
+    previous: Optional[Dict[str, Dict]] = None,
+    classifier: DomainClassifier = DEFAULT_CLASSIFIER,
+) -> Iterator[FileRecord]:
+    matcher = PathMatcher(include, exclude, IgnoreTree(root))
+    previous = previous or {}
+
+    def ingest(item: Tuple[Path, str]) -> Optional[FileRecord]:
+        abs_path, rel_path = item
+        return _ingest_file(abs_path, rel_path, max_size, previous.get(rel_path), classifier=classifier)
+
+    return _ingest_iter(_walk_candidates(root, matcher), ingest, workers)
+
+
+def _git(root: Path, *args: str) -> bytes:
+    return subprocess.run(
+        ["git", "-C", str(root), *args],
+        check=True,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    ).stdout
+
+
+def _git_object_format(root: Path) -> str:
+    try:
+        return _git(root, "rev-parse", "--show-object-format").decode().strip() or "sha1"
+    except (OSError, subprocess.CalledProcessError):
+        return "sha1"
+
 
+def _git_head(root: Path) -> Optional[str]:
+    try:
+        return _git(root, "rev-parse", "--verify", "--quiet", "HEAD").decode().strip() or None
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _list_git_files(root: Path) -> Optional[Tuple[Dict[str, Optional[str]], str]]:
+    try:
+        if _git(root, "rev-parse", "--is-inside-work-tree").strip() != b"true":
+            return None
+        prefix = _git(root, "rev-parse", "--show-prefix").decode("utf-8", "surrogateescape").strip()
+        staged = _git(root, "ls-files", "-s", "-z")
+        status = _git(root, "status", "--porcelain", "-z", "--untracked-files=all", "--no-renames", "--", ".")
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    object_format = _git_object_format(root)
+
+    # path -> index blob id for clean tracked files, None for files that must be read from disk
+    entries: Dict[str, Optional[str]] = {}
+    for record in staged.split(b"\0"):
+        if not record:
+            continue
+        info, _, raw_path = record.partition(b"\t")
+        mode, sha, stage = info.split()
+        if mode in (b"120000", b"160000"):
+            continue
+        path = raw_path.decode("utf-8", "surrogateescape")
+        entries[path] = sha.decode() if stage == b"0" and path not in entries else None
 
-def scan_source(source: str, include: Optional[Set[str]] = None, exclude: Optional[Set[str]] = None, max_size: int = 200_000) -> ScanResult:
+    for record in status.split(b"\0"):
+        if len(record) < 4:
+            continue
+        code = record[:2]
+        path = record[3:].decode("utf-8", "surrogateescape")
+        if prefix:
+            if not path.startswith(prefix):
+                continue
+            path = path[len(prefix):]
+        if b"D" in code:
+            entries.pop(path, None)
+        else:
+            entries[path] = None
+    return entries, object_format
+
+
+def _scan_git_index(
+    root: Path,
+    include: Optional[Set[str]],
+    exclude: Optional[Set[str]],
+    max_size: int,
+    workers: int = 1,
+    previous: Optional[Dict[str, Dict]] = None,
+    classifier: DomainClassifier = DEFAULT_CLASSIFIER,
+) -> Optional[Iterator[FileRecord]]:
+    listing = _list_git_files(root)
+    if listing is None:
+        return None
+    entries, object_format = listing
+    matcher = PathMatcher(include, exclude, IgnoreTree(root))
+    previous = previous or {}
+    candidates = [(rel_path, blob) for rel_path, blob in sorted(entries.items()) if matcher.allows(rel_path)]
+
+    def ingest(item: Tuple[str, Optional[str]]) -> Optional[FileRecord]:
+        rel_path, blob = item
+        return _ingest_file(root / rel_path, rel_path, max_size, previous.get(rel_path), blob, object_format, classifier)
+
+    return _ingest_iter(candidates, ingest, workers)
+
+
+def _git_changes(root: Path, rev: str, previous: Dict[str, Dict]) -> Optional[Tuple[Set[str], Set[str], Dict[str, str]]]:
+    try:
+        diff = _git(root, "diff", "--name-status", "-z", "-M", "--relative", rev, "--")
+        tracked = _git(root, "ls-files", "-z")
+        untracked = _git(root, "ls-files", "-o", "--exclude-standard", "-z")
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+    changed: Set[str] = set()
+    removed: Set[str] = set()
+    renames: Dict[str, str] = {}
+    tokens = [token.decode("utf-8", "surrogateescape") for token in diff.split(b"\0")]
+    idx = 0
+    while idx < len(tokens) and tokens[idx]:
+        status = tokens[idx]
+        if status[:1] in ("R", "C"):
+            old_path, new_path = tokens[idx + 1], tokens[idx + 2]
+            idx += 3
+            changed.add(new_path)
+            if status[:1] == "R":
+                removed.add(old_path)
+                if status[1:] == "100" and old_path in previous:
+                    renames[new_path] = old_path
+            continue
+        path = tokens[idx + 1]
+        idx += 2
+        if status[:1] == "D":
+            removed.add(path)
+        else:
+            changed.add(path)
+
+    # git diff knows nothing about untracked files: new ones are read, documented ones are
+    # rescanned when their stat fingerprint moved, and ones that are gone are dropped.
+    untracked_paths = {raw.decode("utf-8", "surrogateescape") for raw in untracked.split(b"\0") if raw}
+    for path in untracked_paths:
+        if path not in previous:
+            changed.add(path)
+            continue
+        try:
+            st = os.lstat(root / path)
+        except OSError:
+            removed.add(path)
+            continue
+        if not _fingerprint_matches(previous[path], st):
+            changed.add(path)
+    tracked_paths = {raw.decode("utf-8", "surrogateescape") for raw in tracked.split(b"\0") if raw}
+    for path in previous:
+        if path not in tracked_paths and path not in untracked_paths and path not in changed:
+            removed.add(path)
+    return changed, removed, renames
+
+
+def _scan_since(
+    root: Path,
+    rev: str,
+    include: Optional[Set[str]],
+    exclude: Optional[Set[str]],
+    max_size: int,
+    workers: int,
+    previous: Dict[str, Dict],
+    git_index: bool,
+    classifier: DomainClassifier = DEFAULT_CLASSIFIER,
+) -> Optional[Tuple[List[FileRecord], Set[str], Dict[str, str]]]:
+    changes = _git_changes(root, rev, previous)
+    if changes is None:
+        return None
+    changed, removed, renames = changes
+    matcher = PathMatcher(include, exclude, IgnoreTree(root))
+    changed = {path for path in changed if matcher.allows(path)}
+    renames = {new: old for new, old in renames.items() if new in changed}
+    object_format = _git_object_format(root) if git_index else None
+
+    # Unchanged entries go through the same filters as a full scan: files newly excluded or
+    # grown past max_size are dropped from the index.
+    files = [
+        _reused_entry(root / path, path, meta)
+        for path, meta in previous.items()
+        if path not in changed
+        and path not in removed
+        and meta.get("hash")
+        and matcher.allows(path)
+        and not (max_size and (meta.get("size") or 0) > max_size)
+    ]
+    for new_path, old_path in list(renames.items()):
+        entry = _renamed_entry(root / new_path, new_path, previous[old_path], classifier)
+        if entry is None:
+            del renames[new_path]
+        else:
+            files.append(entry)
+
+    def ingest(rel_path: str) -> Optional[FileRecord]:
+        return _ingest_file(
+            root / rel_path, rel_path, max_size, previous.get(rel_path), object_format=object_format, classifier=classifier
+        )
+
+    candidates = [path for path in sorted(changed) if path not in renames]
+    files.extend(_ingest_all(candidates, ingest, workers))
+    files.sort(key=lambda item: item.path)
+    return files, changed, renames
+
+
+def _scan_root(
+    root: Path,
+    include: Optional[Set[str]],
+    exclude: Optional[Set[str]],
+    max_size: int,
+    workers: int,
+    previous: Dict[str, Dict],
+    git_index: bool,
+    classifier: DomainClassifier = DEFAULT_CLASSIFIER,
+) -> Iterator[FileRecord]:
+    if git_index:
+        files = _scan_git_index(root, include, exclude, max_size, workers, previous, classifier)
+        if files is not None:
+            return files
+        print(f"[ai-docs] git index scan unavailable for {root}, falling back to directory walk")
+    return _scan_directory(root, include, exclude, max_size, workers, previous, classifier)
+
+
+def repo_name_from_url(repo_url: str) -> str:
+    return repo_url.rstrip("/").split("/")[-1].replace(".git", "")
+
+
+def scan_source(
+    source: str,
+    include: Optional[Set[str]] = None,
+    exclude: Optional[Set[str]] = None,
+    max_size: int = 200_000,
+    workers: int = 1,
+    previous_index: Optional[Dict] = None,
+    git_index: bool = False,
+    since: Optional[str] = None,
+    stream: bool = False,
+    oversized: str = "outline",
+    hard_max_size: int = OUTLINE_HARD_MAX_SIZE,
+) -> ScanResult:
+    if oversized not in OVERSIZED_MODES:
+        raise RuntimeError(f"Unknown oversized mode: {oversized} (expected one of {', '.join(OVERSIZED_MODES)})")
+    # In outline mode files above max_size are kept and the summarizer bounds their cost by tokens;
+    # only files above the hard cap are skipped (max_size=0 still means no limit at all).
+    if oversized == "outline" and max_size:
+        max_size = max(max_size, hard_max_size)
     exclude = exclude or DEFAULT_EXCLUDE_PATTERNS
+    previous_index = previous_index or {}
+    previous = previous_index.get("files", {})
 
+    release = None
     if is_url(source):
-        root, repo_name = _clone_repo(source)
-        extension_config = _load_extension_config(root)
-        include = include or _build_default_include_patterns(extension_config)
-        exclude = set(exclude) | set(extension_config.get("exclude", set()))
-        files = _scan_directory(root, include, exclude, max_size)
-        return ScanResult(root=root, files=files, source=source, repo_name=repo_name)
-
-    root = Path(source).expanduser().resolve()
-    if not root.exists():
-        raise FileNotFoundError(f"Source path not found: {root}")
+        store = MirrorStore()
+        root = store.checkout(source)
+        repo_name = repo_name_from_url(source)
+        source_label = source
+        release = partial(store.release, source, root)
+        # A fresh worktree never matches stat fingerprints; blob ids from the index do.
+        git_index = True
+    else:
+        root = Path(source).expanduser().resolve()
+        if not root.exists():
+            raise FileNotFoundError(f"Source path not found: {root}")
+        repo_name = root.name
+        source_label = str(root)
+
     extension_config = _load_extension_config(root)
     include = include or _build_default_include_patterns(extension_config)
     exclude = set(exclude) | set(extension_config.get("exclude", set()))
-    files = _scan_directory(root, include, exclude, max_size)
-    return ScanResult(root=root, files=files, source=str(root), repo_name=root.name)
+    git_head = _git_head(root)
+    classifier = build_classifier(extension_config["domain_rules"])
+    # Entries reused by fingerprint carry their old domains; a rule change forces a re-read.
+    if previous and previous_index.get("domain_rules", DEFAULT_CLASSIFIER.signature) != classifier.signature:
+        print("[ai-docs] domain rules changed, re-reading all files")
+        previous = {}
+
+    if since is not None:
+        rev = since or previous_index.get("git", {}).get("head")
+        since_scan = _scan_since(root, rev, include, exclude, max_size, workers, previous, git_index, classifier) if rev and previous else None
+        if since_scan is not None:
+            files, changed_paths, renames = since_scan
+            print(f"[ai-docs] scan since {rev[:12]}: {len(changed_paths)} changed paths, {len(renames)} renames")
+            return ScanResult(
+                root=root,
+                files=files,
+                source=source_label,
+                repo_name=repo_name,
+                git_head=git_head,
+                changed_paths=changed_paths,
+                renames=renames,
+                release=release,
+                domain_rules=classifier.signature,
+            )
+        print("[ai-docs] --since: no usable base revision or previous index, running a full scan")
+
+    # stream=True hands out a lazy iterator: files are ingested while the consumer works on earlier ones.
+    files = _scan_root(root, include, exclude, max_size, workers, previous, git_index, classifier)
+    return ScanResult(
+        root=root,
+        files=files if stream else list(files),
+        source=source_label,
+        repo_name=repo_name,
+        git_head=git_head,
+        release=release,
+        domain_rules=classifier.signature,
+    )
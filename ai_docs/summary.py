@@ -1,7 +1,7 @@
 from pathlib import Path
 from typing import Dict, List
 
-from .tokenizer import chunk_text
+from .tokenizer import split_chunks
 from .utils import ensure_dir
 
 
@@ -183,7 +183,7 @@ async def summarize_file(
     model: str,
     detailed: bool = False,
 ) -> str:
-    chunks = chunk_text(content, model=model, max_tokens=1800)
+    chunks = [chunk.text for chunk in split_chunks(content, model, 1800, code=file_type == "code")]
     summaries = []
     for chunk in chunks:
         if detailed and file_type == "config":
@@ -230,9 +230,13 @@ async def summarize_file(
     return result
 
 
+def summary_file_path(summary_dir: Path, rel_path: str) -> Path:
+    safe_name = "".join(c if c.isalnum() else "_" for c in rel_path).strip("_").lower()
+    return summary_dir / f"{safe_name}.md"
+
+
 def write_summary(summary_dir: Path, rel_path: str, summary: str) -> Path:
     ensure_dir(summary_dir)
-    safe_name = "".join(c if c.isalnum() else "_" for c in rel_path).strip("_").lower()
-    out_path = summary_dir / f"{safe_name}.md"
+    out_path = summary_file_path(summary_dir, rel_path)
     out_path.write_text(summary, encoding="utf-8")
     return out_path
@@ -1,8 +1,51 @@
-from typing import List
+import base64
+import hashlib
+import math
+import re
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, Iterator, List, NamedTuple, Sequence, Tuple
 
 import tiktoken
 
 
+# Token counts are memoized by content digest: prompts, summaries and file bodies are counted
+# several times per run (budget checks, timeouts, context packing).
+_COUNT_MEMO_SIZE = 8192
+_BATCH_THREADS = 8
+
+# Estimates are calibrated per model on these samples: tokens per ASCII character (code, English)
+# and per extra non-ASCII character (Cyrillic summaries). Long texts are estimated from a sample.
+_CALIBRATION_LATIN = (
+    "def build_index(files, cache_dir):\n"
+    "    \"\"\"Scan files and return a mapping of relative paths to metadata.\"\"\"\n"
+    "    index = {}\n"
+    "    for path in sorted(files):\n"
+    "        index[path.as_posix()] = {\"size\": path.stat().st_size, \"type\": classify(path)}\n"
+    "    return index\n\n"
+    "The scanner walks the repository, honours ignore files and records a fingerprint for every file. "
+    "Configuration is read from environment variables; unknown options are rejected with a clear error.\n"
+)
+_CALIBRATION_CYRILLIC = (
+    "Модуль отвечает за сканирование репозитория и построение индекса файлов. "
+    "Для каждого файла сохраняются размер, тип и отпечаток содержимого; неизменённые файлы "
+    "повторно не читаются. Конфигурация задаётся переменными окружения, а ошибки чтения "
+    "попадают в итоговый отчёт.\n## Основные функции\n- `scan_source` — обход дерева и фильтрация.\n"
+)
+# Long whitespace-free runs with a varied alphabet (base64, hex digests, embedded keys) split into
+# far more tokens per character than prose or code; they get their own rate.
+_CALIBRATION_DENSE = (
+    base64.b64encode(b"".join(hashlib.sha256(bytes([idx])).digest() for idx in range(16))).decode("ascii")
+    + "".join(hashlib.sha256(bytes([idx])).hexdigest() for idx in range(16, 24))
+)
+_DENSE_RUN = re.compile(r"\S{24,}")
+_DENSE_MIN_SYMBOLS = 8
+_ESTIMATE_SAMPLE = 4096
+_ESTIMATE_MARGIN = 0.3
+
+
 class _ByteEncoding:
     def encode(self, text: str):
         return list(text.encode("utf-8", errors="ignore"))
@@ -11,26 +54,244 @@ class _ByteEncoding:
         return bytes(tokens).decode("utf-8", errors="ignore")
 
 
-def get_encoding(model: str):
+@lru_cache(maxsize=None)
+def _load_encoding(model: str):
+    # Unknown models fall back to cl100k_base; load failures propagate and are not cached.
     try:
         return tiktoken.encoding_for_model(model)
     except KeyError:
-        try:
-            return tiktoken.get_encoding("cl100k_base")
-        except Exception:
-            return _ByteEncoding()
+        return tiktoken.get_encoding("cl100k_base")
+
+
+_BYTE_ENCODING = _ByteEncoding()
+_ENCODING_RETRY_SECONDS = 60.0
+_encoding_retry_at: Dict[str, float] = {}
+
+
+def get_encoding(model: str):
+    # Resolved once per model. An encoding that cannot be loaded (e.g. offline, nothing cached)
+    # is replaced by a byte-level approximation, and loading is retried after a cooldown.
+    if time.monotonic() < _encoding_retry_at.get(model, 0.0):
+        return _BYTE_ENCODING
+    try:
+        encoding = _load_encoding(model)
+    except Exception:
+        _encoding_retry_at[model] = time.monotonic() + _ENCODING_RETRY_SECONDS
+        return _BYTE_ENCODING
+    _encoding_retry_at.pop(model, None)
+    return encoding
+
+
+class _CountMemo:
+    def __init__(self, size: int):
+        self.size = size
+        self.entries: "OrderedDict[Tuple[str, bytes], int]" = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key: Tuple[str, bytes]):
+        with self.lock:
+            count = self.entries.get(key)
+            if count is not None:
+                self.entries.move_to_end(key)
+            return count
+
+    def put(self, key: Tuple[str, bytes], count: int) -> None:
+        with self.lock:
+            self.entries[key] = count
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+
+
+_count_memo = _CountMemo(_COUNT_MEMO_SIZE)
+
+
+@lru_cache(maxsize=None)
+def _calibration(enc) -> Tuple[float, float, float]:
+    # Keyed by encoding, so rates measured on the byte fallback are dropped once the real one loads.
+    latin = len(enc.encode(_CALIBRATION_LATIN)) / len(_CALIBRATION_LATIN)
+    cyrillic_ascii = len(_CALIBRATION_CYRILLIC.encode("ascii", errors="ignore"))
+    cyrillic_extra = len(_CALIBRATION_CYRILLIC.encode("utf-8")) - len(_CALIBRATION_CYRILLIC)
+    extra = (len(enc.encode(_CALIBRATION_CYRILLIC)) - latin * cyrillic_ascii) / cyrillic_extra
+    dense = len(enc.encode(_CALIBRATION_DENSE)) / len(_CALIBRATION_DENSE)
+    return latin, max(extra, latin), max(dense, latin)
+
+
+def _dense_chars(sample: str) -> int:
+    # Runs of a single repeated character (rulers, padding) tokenize cheaply and are not counted.
+    return sum(len(run) for run in _DENSE_RUN.findall(sample) if len(set(run)) >= _DENSE_MIN_SYMBOLS)
+
+
+def estimate_tokens(text: str, model: str) -> int:
+    # Approximate count from length and script mix, without tokenizing. UTF-8 bytes beyond one per
+    # character measure the non-ASCII share, long varied runs without whitespace the dense share;
+    # texts longer than the sample are extrapolated.
+    if not text:
+        return 0
+    latin, extra, dense_rate = _calibration(get_encoding(model))
+    if len(text) > _ESTIMATE_SAMPLE:
+        third = _ESTIMATE_SAMPLE // 3
+        middle = len(text) // 2
+        sample = text[:third] + text[middle:middle + third] + text[-third:]
+    else:
+        sample = text
+    extra_share = (len(sample.encode("utf-8", errors="surrogatepass")) - len(sample)) / len(sample)
+    non_ascii = extra_share * len(text)
+    dense = min(_dense_chars(sample) / len(sample) * len(text), len(text) - non_ascii)
+    return math.ceil(latin * (len(text) - non_ascii - dense) + dense_rate * dense + extra * non_ascii)
+
+
+def fits_within(text: str, model: str, max_tokens: int, margin: float = _ESTIMATE_MARGIN) -> bool:
+    # Budget check answered by the estimate when it is clearly under or over the limit;
+    # only texts within `margin` of the limit are tokenized.
+    estimate = estimate_tokens(text, model)
+    if estimate <= max_tokens * (1 - margin):
+        return True
+    if estimate > max_tokens * (1 + margin):
+        return False
+    return count_tokens(text, model) <= max_tokens
+
+
+def _count_key(text: str, model: str) -> Tuple[str, bytes]:
+    return model, hashlib.blake2b(text.encode("utf-8", errors="surrogatepass"), digest_size=16).digest()
 
 
 def count_tokens(text: str, model: str) -> int:
+    key = _count_key(text, model)
+    count = _count_memo.get(key)
+    if count is None:
+        enc = get_encoding(model)
+        count = len(enc.encode(text))
+        if enc is not _BYTE_ENCODING:
+            _count_memo.put(key, count)
+    return count
+
+
+def count_tokens_batch(texts: Sequence[str], model: str, num_threads: int = _BATCH_THREADS) -> List[int]:
+    # Bulk counting: memo hits are free, the misses are encoded together across threads.
+    keys = [_count_key(text, model) for text in texts]
+    counts = [_count_memo.get(key) for key in keys]
+    missing = [idx for idx, count in enumerate(counts) if count is None]
+    if missing:
+        enc = get_encoding(model)
+        batch = [texts[idx] for idx in missing]
+        if hasattr(enc, "encode_batch"):
+            encoded = enc.encode_batch(batch, num_threads=num_threads)
+        else:
+            encoded = [enc.encode(text) for text in batch]
+        for idx, tokens in zip(missing, encoded):
+            counts[idx] = len(tokens)
+            if enc is not _BYTE_ENCODING:
+                _count_memo.put(keys[idx], counts[idx])
+    return counts
+
+
+class Chunk(NamedTuple):
+    text: str
+    start: int
+    end: int
+    tokens: int
+
+
+# Lines that continue the previous top-level definition rather than starting a new one.
+_CONTINUATION_PREFIXES = (")", "]", "}", "else", "elif", "except", "finally", "catch")
+
+
+def _unit_lengths(units: Sequence[str], model: str) -> List[int]:
+    # Not memoized: per-line entries would only evict whole-text counts from the memo.
     enc = get_encoding(model)
-    return len(enc.encode(text))
+    if hasattr(enc, "encode_batch"):
+        return [len(tokens) for tokens in enc.encode_batch(list(units), num_threads=_BATCH_THREADS)]
+    return [len(enc.encode(unit)) for unit in units]
+
+
+def _line_units(text: str) -> List[Tuple[int, int]]:
+    units = []
+    start = 0
+    for line in text.splitlines(keepends=True):
+        units.append((start, start + len(line)))
+        start += len(line)
+    return units
+
+
+def _definition_units(text: str) -> List[Tuple[int, int]]:
+    # Top-level definitions: a block starts at an unindented line, decorators and comments stick
+    # to the definition below them, closing brackets and else/except stay with the block above.
+    units: List[Tuple[int, int]] = []
+    block_start = 0
+    header_only = True
+    for start, end in _line_units(text):
+        line = text[start:end]
+        stripped = line.strip()
+        starts_block = bool(stripped) and not line[0].isspace() and not stripped.startswith(_CONTINUATION_PREFIXES)
+        if starts_block and start > block_start and not header_only:
+            units.append((block_start, start))
+            block_start = start
+            header_only = True
+        if stripped and not stripped.startswith(("@", "#", "//", "/*", "*")):
+            header_only = False
+    if block_start < len(text):
+        units.append((block_start, len(text)))
+    return units
+
+
+def _split_unit(text: str, start: int, end: int, tokens: int, model: str, max_tokens: int) -> Iterator[Tuple[int, int, int]]:
+    # Oversized units are split into lines first and only a single overlong line by characters,
+    # so a chunk never ends inside a multi-byte character.
+    if tokens <= max_tokens or end - start <= 1:
+        yield start, end, tokens
+        return
+    parts = [(start + a, start + b) for a, b in _line_units(text[start:end])]
+    if len(parts) == 1:
+        middle = start + (end - start) // 2
+        parts = [(start, middle), (middle, end)]
+    lengths = _unit_lengths([text[a:b] for a, b in parts], model)
+    for (a, b), length in zip(parts, lengths):
+        yield from _split_unit(text, a, b, length, model, max_tokens)
+
+
+def split_chunks(text: str, model: str, max_tokens: int, overlap: int = 0, code: bool = False) -> List[Chunk]:
+    # Packs whole lines (or whole top-level definitions when code=True) into chunks of at most
+    # max_tokens; each chunk is text[start:end], optionally repeating `overlap` tokens of the previous one.
+    if not text:
+        return []
+    max_tokens = max(1, max_tokens)
+    bounds = _definition_units(text) if code else _line_units(text)
+    lengths = _unit_lengths([text[a:b] for a, b in bounds], model)
+    units = [piece for (a, b), length in zip(bounds, lengths) for piece in _split_unit(text, a, b, length, model, max_tokens)]
+
+    chunks: List[Chunk] = []
+    current: List[Tuple[int, int, int]] = []
+    current_tokens = 0
+    for unit in units:
+        if current and current_tokens + unit[2] > max_tokens:
+            chunks.append(Chunk(text[current[0][0]:current[-1][1]], current[0][0], current[-1][1], current_tokens))
+            carried: List[Tuple[int, int, int]] = []
+            carried_tokens = 0
+            for previous in reversed(current):
+                if carried_tokens + previous[2] > overlap or carried_tokens + previous[2] + unit[2] > max_tokens:
+                    break
+                carried.insert(0, previous)
+                carried_tokens += previous[2]
+            current, current_tokens = carried, carried_tokens
+        current.append(unit)
+        current_tokens += unit[2]
+    if current:
+        chunks.append(Chunk(text[current[0][0]:current[-1][1]], current[0][0], current[-1][1], current_tokens))
+    return chunks
 
 
 def chunk_text(text: str, model: str, max_tokens: int) -> List[str]:
+    return [chunk.text for chunk in split_chunks(text, model, max_tokens)]
+
+
+def truncate_tokens(text: str, model: str, max_tokens: int) -> str:
     enc = get_encoding(model)
     tokens = enc.encode(text)
-    chunks = []
-    for i in range(0, len(tokens), max_tokens):
-        chunk = tokens[i:i + max_tokens]
-        chunks.append(enc.decode(chunk))
-    return chunks
+    if len(tokens) <= max_tokens:
+        return text
+    return enc.decode(tokens[:max(0, max_tokens)])
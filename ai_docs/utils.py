@@ -1,6 +1,25 @@
+import asyncio
 import hashlib
+import mmap
 import os
+import sys
+import threading
+from contextlib import contextmanager
 from pathlib import Path
+from typing import AsyncIterator, Iterable, Iterator, Optional, TypeVar, Union
+
+
+try:
+    import charset_normalizer
+except ImportError:  # optional: only used for files that are not valid UTF-8
+    charset_normalizer = None
+
+
+T = TypeVar("T")
+Buffer = Union[bytes, mmap.mmap]
+
+MMAP_THRESHOLD = 64 * 1024
+_DETECT_SAMPLE = 64 * 1024
 
 
 def sha256_bytes(data: bytes) -> str:
@@ -11,8 +30,56 @@ def sha256_text(text: str) -> str:
     return sha256_bytes(text.encode("utf-8", errors="ignore"))
 
 
+def git_blob_sha(data: bytes, object_format: str = "sha1") -> str:
+    digest = hashlib.new(object_format)
+    digest.update(b"blob %d\0" % len(data))
+    digest.update(data)
+    return digest.hexdigest()
+
+
+def _decode_fallback(data: Buffer) -> str:
+    text = str(data, "utf-8", "replace")
+    # A handful of stray bytes in a UTF-8 file: drop them, as errors="ignore" would.
+    bad = text.count("\ufffd")
+    if charset_normalizer is None or bad * 100 <= len(text):
+        return text.replace("\ufffd", "")
+    match = charset_normalizer.from_bytes(bytes(data[:_DETECT_SAMPLE])).best()
+    if match is None or match.encoding in ("utf_8", "ascii"):
+        return text.replace("\ufffd", "")
+    return str(data, match.encoding, "replace")
+
+
+def decode_text(data: Buffer) -> str:
+    # Strict UTF-8 first (the common case needs no error handler), universal newlines.
+    try:
+        text = str(data, "utf-8")
+    except UnicodeDecodeError:
+        text = _decode_fallback(data)
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return text
+
+
+@contextmanager
+def open_source(path: Path, sniff_size: int = 2048) -> Iterator[Optional[Buffer]]:
+    # One open per file: large files are mapped, small ones read in one call, and both the NUL
+    # sniff and the decode work on that buffer. Yields None for binary files.
+    with open(path, "rb") as handle:
+        size = os.fstat(handle.fileno()).st_size
+        if size >= MMAP_THRESHOLD:
+            data: Buffer = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            data = handle.read()
+        try:
+            yield None if sniff_size and data.find(b"\x00", 0, sniff_size) != -1 else data
+        finally:
+            if isinstance(data, mmap.mmap):
+                data.close()
+
+
 def read_text_file(path: Path) -> str:
-    return path.read_text(encoding="utf-8", errors="ignore")
+    with open_source(path, sniff_size=0) as data:
+        return decode_text(data)
 
 
 def safe_slug(path: str) -> str:
@@ -23,21 +90,61 @@ def ensure_dir(path: Path) -> None:
     path.mkdir(parents=True, exist_ok=True)
 
 
-def is_binary_file(path: Path, sample_size: int = 2048) -> bool:
+def peak_rss_mb() -> Optional[float]:
     try:
-        with path.open("rb") as f:
-            chunk = f.read(sample_size)
-        if b"\x00" in chunk:
-            return True
-        return False
-    except OSError:
-        return True
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere.
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
 
 
 def is_url(value: str) -> bool:
-    return value.startswith("http://") or value.startswith("https://") or value.startswith("git@")
+    return value.startswith(("http://", "https://", "git@", "ssh://", "git://", "file://"))
 
 
 def to_posix(path: Path) -> str:
     return path.as_posix()
 
+
+async def iterate_in_thread(iterable: Iterable[T]) -> AsyncIterator[T]:
+    # Drives a blocking iterator on a worker thread and hands items to the event loop as they appear.
+    loop = asyncio.get_running_loop()
+    queue: "asyncio.Queue" = asyncio.Queue()
+    stop = threading.Event()
+    done = object()
+
+    def publish(item: object) -> None:
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, item)
+        except RuntimeError:  # loop already closed
+            stop.set()
+
+    def produce() -> None:
+        try:
+            for item in iterable:
+                if stop.is_set():
+                    return
+                publish(item)
+        except BaseException as exc:
+            publish(_IteratorFailure(exc))
+        finally:
+            publish(done)
+
+    threading.Thread(target=produce, name="ai-docs-producer", daemon=True).start()
+    try:
+        while True:
+            item = await queue.get()
+            if item is done:
+                return
+            if isinstance(item, _IteratorFailure):
+                raise item.exc
+            yield item
+    finally:
+        stop.set()
+
+
+class _IteratorFailure:
+    def __init__(self, exc: BaseException):
+        self.exc = exc
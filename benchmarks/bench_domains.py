@@ -0,0 +1,128 @@
+import argparse
+import random
+import time
+from pathlib import Path
+from typing import Callable, List, Set, Tuple
+
+from ai_docs.domain import (
+    CI_FILENAMES,
+    CI_FILENAMES_EXTRA,
+    CI_PATH_MARKERS,
+    DATA_STORAGE_MARKERS,
+    DEFAULT_CLASSIFIER,
+    DOCKER_FILENAMES,
+    HELM_FILENAMES,
+    K8S_FILENAMES,
+    OBSERVABILITY_FILENAMES,
+    OBSERVABILITY_PATH_MARKERS,
+    SERVICE_MESH_MARKERS,
+    TERRAFORM_EXTENSIONS,
+)
+
+
+DIRS = [
+    "src/app/", "lib/core/", "deploy/k8s/overlays/", "charts/web/templates/", "infra/terraform/modules/vpc/",
+    "ansible/roles/web/tasks/", "ops/prometheus/rules/", "mesh/istio/", "services/billing/postgres/",
+    "docker/", ".github/workflows/", "docs/", "tests/unit/", "gateway/envoy/", "storage/s3/",
+]
+NAMES = [
+    "main.py", "utils.go", "index.ts", "values.yaml", "Chart.yaml", "deployment.yaml", "Dockerfile",
+    "docker-compose.yml", "main.tf", "variables.tfvars", "prometheus.yml", "README.md", "config.toml",
+    "ingress.yaml", "pipeline.yml", "site.yml",
+]
+SNIPPETS = [
+    "def handler(event):\n    return {'status': 200}\n" * 40,
+    "apiVersion: apps/v1\nkind: Deployment\nmetadata:\n  name: web\n" * 30,
+    "apiVersion: networking.istio.io/v1beta1\nkind: VirtualService\nspec:\n  hosts: [web]\n" * 25,
+    "apiVersion: networking.k8s.io/v1\nkind: Ingress\nmetadata:\n  name: web\n" * 30,
+    "replicaCount: 2\nimage:\n  repository: nginx\n" * 50,
+    "# Title\n\nSome documentation text about the service.\n" * 40,
+]
+
+
+def _legacy_detect_domains(path: Path, content_snippet: str) -> Set[str]:
+    domains: Set[str] = set()
+    posix_path = path.as_posix()
+    name = path.name
+    suffix = path.suffix.lower()
+    content = content_snippet or ""
+
+    if name in DOCKER_FILENAMES or name.startswith("Dockerfile"):
+        domains.add("docker")
+
+    if "docker" in posix_path and (suffix in {".yml", ".yaml"} or name.startswith("Dockerfile")):
+        domains.add("docker")
+
+    if name in CI_FILENAMES or name in CI_FILENAMES_EXTRA or any(marker in posix_path for marker in CI_PATH_MARKERS):
+        domains.add("ci")
+
+    if name in HELM_FILENAMES or "charts/" in posix_path or "/templates/" in posix_path:
+        domains.add("helm")
+
+    if suffix in TERRAFORM_EXTENSIONS or "terraform" in posix_path:
+        domains.add("terraform")
+
+    if "ansible" in posix_path or "/roles/" in posix_path or "/tasks/" in posix_path:
+        domains.add("ansible")
+
+    if name in K8S_FILENAMES or "k8s" in posix_path or "kubernetes" in posix_path:
+        domains.add("kubernetes")
+
+    if suffix in {".yml", ".yaml"}:
+        if "apiVersion" in content and "kind" in content:
+            domains.add("kubernetes")
+
+    if name in OBSERVABILITY_FILENAMES or any(marker in posix_path for marker in OBSERVABILITY_PATH_MARKERS):
+        domains.add("observability")
+
+    if any(marker in posix_path for marker in SERVICE_MESH_MARKERS):
+        domains.add("service_mesh")
+        if "ingress" in posix_path:
+            domains.add("kubernetes")
+
+    if suffix in {".yml", ".yaml"}:
+        if "kind: Ingress" in content or "kind: Gateway" in content:
+            domains.add("service_mesh")
+            domains.add("kubernetes")
+        if "VirtualService" in content or "DestinationRule" in content or "ServiceEntry" in content:
+            domains.add("service_mesh")
+
+    if any(marker in posix_path for marker in DATA_STORAGE_MARKERS):
+        domains.add("data_storage")
+
+    return domains
+
+
+def _synthetic_files(count: int, seed: int = 7) -> List[Tuple[Path, str]]:
+    rng = random.Random(seed)
+    return [
+        (Path("/work/repo") / f"{rng.choice(DIRS)}m{idx % 13}/{rng.choice(NAMES)}", rng.choice(SNIPPETS)[:4000])
+        for idx in range(count)
+    ]
+
+
+def _files_per_second(files: List[Tuple[Path, str]], fn: Callable[[Path, str], Set[str]]) -> float:
+    start = time.perf_counter()
+    for path, snippet in files:
+        fn(path, snippet)
+    return len(files) / (time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Throughput of domain detection: legacy marker scans vs compiled classifier.")
+    parser.add_argument("--files", type=int, default=50_000, help="Number of synthetic files")
+    args = parser.parse_args()
+
+    files = _synthetic_files(args.files)
+    mismatches = sum(1 for path, snippet in files if _legacy_detect_domains(path, snippet) != DEFAULT_CLASSIFIER.classify(path, snippet))
+    legacy = _files_per_second(files, _legacy_detect_domains)
+    compiled = _files_per_second(files, DEFAULT_CLASSIFIER.classify)
+
+    print(f"files={len(files)} rules={len(DEFAULT_CLASSIFIER.rules)} mismatches={mismatches}")
+    print(f"before (marker scans):       {legacy:,.0f} files/s")
+    print(f"after  (compiled classifier): {compiled:,.0f} files/s")
+    print(f"speedup: x{compiled / legacy:.1f}")
+
+
+if __name__ == "__main__":
+    main()
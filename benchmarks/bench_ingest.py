@@ -0,0 +1,64 @@
+import argparse
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable
+
+from ai_docs import scanner
+
+
+def _make_tree(root: Path, files: int) -> None:
+    for idx in range(files):
+        directory = root / f"pkg{idx % 40}" / f"mod{idx % 7}"
+        directory.mkdir(parents=True, exist_ok=True)
+        body = "\n".join(f"def func_{idx}_{n}(x):\n    return x * {n}\n" for n in range(30))
+        (directory / f"file_{idx}.py").write_text(body, encoding="utf-8")
+
+
+def _with_latency(fn: Callable, latency: float) -> Callable:
+    def wrapper(*args, **kwargs):
+        time.sleep(latency)
+        return fn(*args, **kwargs)
+
+    return wrapper
+
+
+def _time_scan(root: Path, workers: int) -> float:
+    start = time.perf_counter()
+    result = scanner.scan_source(str(root), workers=workers)
+    elapsed = time.perf_counter() - start
+    assert result.files
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare sequential and threaded file ingestion in the scanner.")
+    parser.add_argument("--files", type=int, default=2000, help="Number of synthetic files")
+    parser.add_argument("--workers", type=int, default=16, help="Scan workers for the threaded run")
+    parser.add_argument("--latency-ms", type=float, default=2.0, help="Simulated latency per open() on slow I/O")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        _make_tree(root, args.files)
+        _time_scan(root, 1)  # warm the page cache
+
+        print(f"files={args.files} workers={args.workers}")
+        local_seq = _time_scan(root, 1)
+        local_par = _time_scan(root, args.workers)
+        print(f"local disk: sequential {local_seq:.2f}s, threaded {local_par:.2f}s")
+
+        latency = args.latency_ms / 1000.0
+        # The scanner opens each file exactly once (open_source), so one delay per file.
+        original = scanner.open_source
+        scanner.open_source = _with_latency(original, latency)
+        try:
+            slow_seq = _time_scan(root, 1)
+            slow_par = _time_scan(root, args.workers)
+        finally:
+            scanner.open_source = original
+        print(f"slow I/O ({args.latency_ms}ms/open): sequential {slow_seq:.2f}s, threaded {slow_par:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from ai_docs.backends import FakeBackend
+from ai_docs.generator import generate_docs
+from ai_docs.limiter import AdaptiveLimiter
+from ai_docs.llm import LLMClient
+from ai_docs.scanner import scan_source
+
+
+def _write_repo(root: Path, files: int) -> None:
+    for idx in range(files):
+        package = root / f"pkg{idx % 10}"
+        package.mkdir(exist_ok=True)
+        body = "".join(f"def handler_{idx}_{fn}(event):\n    return event.get('id', {fn})\n\n" for fn in range(20))
+        (package / f"module_{idx}.py").write_text(body, encoding="utf-8")
+        if idx % 10 == 0:
+            (package / f"settings_{idx}.yaml").write_text(f"service: svc{idx}\nreplicas: {idx % 5 + 1}\n", encoding="utf-8")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="End-to-end generate_docs throughput against the in-process fake LLM backend.")
+    parser.add_argument("--files", type=int, default=60, help="Number of synthetic source files")
+    parser.add_argument("--latency", type=float, default=0.05, help="Median fake completion latency, seconds")
+    parser.add_argument("--capacity", type=int, default=32, help="Fake server capacity; extra in-flight requests get 429")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Share of random 429 responses")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of random 500 responses")
+    parser.add_argument("--threads", type=int, default=4, help="Initial concurrency limit")
+    parser.add_argument("--max-concurrency", type=int, default=64, help="Upper bound of the adaptive limit")
+    args = parser.parse_args()
+
+    backend = FakeBackend(
+        latency=args.latency,
+        capacity=args.capacity,
+        throttle_rate=args.throttle_rate,
+        error_rate=args.error_rate,
+        seed=1,
+    )
+    limiter = AdaptiveLimiter(initial=args.threads, max_limit=args.max_concurrency)
+    llm = LLMClient(api_key="fake", base_url="", model="gpt-4o-mini", context_limit=128_000, backend=backend, limiter=limiter)
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        _write_repo(root, args.files)
+        start = time.perf_counter()
+        scan = scan_source(str(root))
+        generate_docs(scan.files, root, root / ".ai_docs_cache", llm, "ru", False, False, threads=args.max_concurrency)
+        elapsed = time.perf_counter() - start
+
+    stats = limiter.stats()
+    print(f"files={args.files} latency={args.latency}s capacity={args.capacity} start limit={args.threads}")
+    print(f"requests={backend.requests} failed={backend.failures} coalesced={llm.coalesced} wall={elapsed:.1f}s")
+    print(f"throughput: {backend.requests / elapsed:.1f} req/s")
+    print(f"final limit={stats['limit']} throttled={stats['throttled']} p50={stats['p50'] or 0:.2f}s p95={stats['p95'] or 0:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
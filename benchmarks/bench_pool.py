@@ -0,0 +1,45 @@
+import argparse
+import asyncio
+import time
+
+from ai_docs.backends import FakeBackend
+from ai_docs.limiter import AdaptiveLimiter
+from ai_docs.llm import LLMClient
+from ai_docs.pool import Endpoint, EndpointPool
+
+
+async def _drive(client: LLMClient, requests: int) -> None:
+    prompts = [[{"role": "user", "content": f"summarize module_{idx}.py"}] for idx in range(requests)]
+    await asyncio.gather(*(client.chat(messages) for messages in prompts))
+
+
+def _run(endpoints: int, args: argparse.Namespace):
+    backends = [FakeBackend(latency=args.latency, sigma=0.2, capacity=args.cap, seed=idx) for idx in range(endpoints)]
+    pool = EndpointPool([Endpoint(f"fake-{idx}", backend, max_in_flight=args.cap) for idx, backend in enumerate(backends)], strategy=args.strategy)
+    limiter = AdaptiveLimiter(initial=pool.capacity, max_limit=pool.capacity)
+    client = LLMClient(api_key="fake", base_url="", model="gpt-4o-mini", backend=pool, limiter=limiter)
+    start = time.perf_counter()
+    asyncio.run(_drive(client, args.requests))
+    elapsed = time.perf_counter() - start
+    return elapsed, [backend.requests for backend in backends]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Aggregate throughput of an EndpointPool over 1..N fake endpoints.")
+    parser.add_argument("--endpoints", type=int, default=4, help="Largest pool size")
+    parser.add_argument("--requests", type=int, default=400, help="Requests per run")
+    parser.add_argument("--latency", type=float, default=0.05, help="Median fake completion latency, seconds")
+    parser.add_argument("--cap", type=int, default=8, help="In-flight cap per endpoint")
+    parser.add_argument("--strategy", choices=("least", "ewma"), default="least")
+    args = parser.parse_args()
+
+    baseline = None
+    for endpoints in range(1, args.endpoints + 1):
+        elapsed, spread = _run(endpoints, args)
+        rate = args.requests / elapsed
+        baseline = baseline or rate
+        print(f"endpoints={endpoints} wall={elapsed:.2f}s throughput={rate:.0f} req/s (x{rate / baseline:.2f}) spread={spread}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import argparse
+import random
+import time
+from typing import Callable, List, Optional, Set
+
+import pathspec
+
+from ai_docs.domain import CODE_EXTENSION_DESCRIPTIONS, CONFIG_EXTENSION_DESCRIPTIONS, DOC_EXTENSION_DESCRIPTIONS
+from ai_docs.scanner import DEFAULT_EXCLUDE_PATTERNS, PathMatcher, _build_default_include_patterns
+
+
+DIRS = [
+    "", "src/", "src/app/", "src/app/api/", "lib/core/", "docs/", "deploy/k8s/", "charts/web/templates/",
+    "node_modules/react/", "node_modules/lodash/fp/", ".venv/lib/python3.11/site-packages/", "build/", "dist/",
+    "tests/unit/", "services/billing/internal/", ".github/workflows/",
+]
+NAMES = [
+    "main.py", "utils.py", "index.ts", "App.tsx", "server.go", "README.md", "values.yaml", "Dockerfile",
+    "docker-compose.yml", "package.json", "image.png", "data.bin", "notes.txt", "Makefile", "app.min.js", "schema.sql",
+]
+
+
+def _legacy_should_include(rel_path: str, include: Optional[Set[str]], exclude: Optional[Set[str]]) -> bool:
+    if exclude:
+        for pattern in exclude:
+            if pathspec.PathSpec.from_lines("gitignore", [pattern]).match_file(rel_path):
+                return False
+    if not include:
+        return True
+    for pattern in include:
+        if pathspec.PathSpec.from_lines("gitignore", [pattern]).match_file(rel_path):
+            return True
+    return False
+
+
+def _synthetic_paths(count: int, seed: int = 42) -> List[str]:
+    rng = random.Random(seed)
+    return [f"{rng.choice(DIRS)}m{idx % 97}/{rng.choice(NAMES)}" for idx in range(count)]
+
+
+def _time_per_10k(paths: List[str], fn: Callable[[str], bool]) -> float:
+    start = time.perf_counter()
+    for path in paths:
+        fn(path)
+    return (time.perf_counter() - start) * 10_000 / len(paths)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Micro-benchmark of scanner include/exclude matching.")
+    parser.add_argument("--paths", type=int, default=10_000, help="Number of synthetic paths")
+    parser.add_argument("--legacy-paths", type=int, default=1_000, help="Paths for the slow per-pattern baseline")
+    args = parser.parse_args()
+
+    config = {
+        "code_extensions": CODE_EXTENSION_DESCRIPTIONS,
+        "doc_extensions": DOC_EXTENSION_DESCRIPTIONS,
+        "config_extensions": CONFIG_EXTENSION_DESCRIPTIONS,
+    }
+    include = _build_default_include_patterns(config)
+    exclude = set(DEFAULT_EXCLUDE_PATTERNS)
+    paths = _synthetic_paths(args.paths)
+
+    legacy = _time_per_10k(paths[: args.legacy_paths], lambda p: _legacy_should_include(p, include, exclude))
+    build_start = time.perf_counter()
+    matcher = PathMatcher(include, exclude)
+    build_time = time.perf_counter() - build_start
+    compiled = _time_per_10k(paths, matcher.should_include)
+
+    print(f"patterns: include={len(include)} exclude={len(exclude)}")
+    print(f"before (per-pattern compile): {legacy:.3f}s per 10k paths")
+    print(f"after  (compiled matcher):    {compiled:.3f}s per 10k paths (build {build_time * 1000:.1f}ms)")
+    print(f"speedup: x{legacy / compiled:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import argparse
+import random
+import time
+from typing import Callable, List
+
+from ai_docs import tokenizer
+from ai_docs.tokenizer import estimate_tokens, fits_within, get_encoding
+
+
+PHRASES = [
+    "Модуль отвечает за загрузку конфигурации и проверку обязательных параметров.",
+    "Функция `build_index` обходит дерево файлов и возвращает словарь метаданных.",
+    "Класс `CacheManager` хранит индекс и LLM-кэш в каталоге `.ai_docs_cache`.",
+    "The handler validates the request payload and returns HTTP 422 on schema errors.",
+    "Зависимости: httpx, openai, tiktoken; переменные окружения `OPENAI_API_KEY`, `AI_DOCS_THREADS`.",
+    "- `scan_source(source, include, exclude)` — сканирование источника с фильтрами.",
+    "def handler(event, context):\n    return {\"status\": 200, \"body\": json.dumps(event)}",
+]
+
+
+def _corpus(count: int, seed: int = 11) -> List[str]:
+    rng = random.Random(seed)
+    return ["\n".join(rng.choice(PHRASES) for _ in range(rng.randint(5, 60))) for _ in range(count)]
+
+
+def _checks_per_second(corpus: List[str], check: Callable[[str], bool], rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for text in corpus:
+            check(text)
+    return len(corpus) * rounds / (time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Budget checks over a summary corpus: exact tokenization vs estimate with exact fallback.")
+    parser.add_argument("--summaries", type=int, default=10_000, help="Number of synthetic summaries")
+    parser.add_argument("--budget", type=int, default=1500, help="Token budget checked for every summary")
+    parser.add_argument("--model", default="gpt-4o-mini", help="Model whose tokenizer is used")
+    parser.add_argument("--rounds", type=int, default=3, help="Passes over the corpus")
+    args = parser.parse_args()
+
+    corpus = _corpus(args.summaries)
+    enc = get_encoding(args.model)
+    exact_counts = [len(enc.encode(text)) for text in corpus]
+    errors = [abs(estimate_tokens(text, args.model) - exact) / exact for text, exact in zip(corpus, exact_counts)]
+    wrong = sum(1 for text, exact in zip(corpus, exact_counts) if fits_within(text, args.model, args.budget) != (exact <= args.budget))
+
+    def exact_check(text: str) -> bool:
+        return len(enc.encode(text)) <= args.budget
+
+    before = _checks_per_second(corpus, exact_check, args.rounds)
+    tokenized = 0
+    original = tokenizer.count_tokens
+
+    def counting(text: str, model: str) -> int:
+        nonlocal tokenized
+        tokenized += 1
+        return original(text, model)
+
+    tokenizer.count_tokens = counting
+    try:
+        start = time.perf_counter()
+        for _ in range(args.rounds):
+            # Memo hits would flatter the fallback; every pass starts cold.
+            tokenizer._count_memo.clear()
+            for text in corpus:
+                fits_within(text, args.model, args.budget)
+        after = len(corpus) * args.rounds / (time.perf_counter() - start)
+    finally:
+        tokenizer.count_tokens = original
+
+    print(f"summaries={len(corpus)} budget={args.budget} encoding={type(enc).__name__}")
+    print(f"estimate error: mean {sum(errors) / len(errors):.1%}, max {max(errors):.1%}; wrong decisions: {wrong}")
+    print(f"tokenized near the limit: {tokenized / args.rounds / len(corpus):.1%} of checks")
+    print(f"before (exact count):         {before:,.0f} checks/s")
+    print(f"after  (estimate + fallback): {after:,.0f} checks/s")
+    print(f"speedup: x{after / before:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+import asyncio
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from ai_docs.backends import BackendError, FakeBackend
+from ai_docs.generator import generate_docs
+from ai_docs.llm import from_env
+from ai_docs.scanner import scan_source
+
+
+PAYLOAD = {"model": "test-model", "max_tokens": 200, "messages": [{"role": "user", "content": "describe app.py " * 40}]}
+
+
+class FakeBackendTests(unittest.TestCase):
+    def test_answers_are_deterministic_and_sized_by_prompt(self):
+        backend = FakeBackend(latency=0)
+        first = asyncio.run(backend.complete(PAYLOAD, None))
+        again = asyncio.run(FakeBackend(latency=0, seed=5).complete(PAYLOAD, None))
+        short = asyncio.run(backend.complete({**PAYLOAD, "messages": [{"role": "user", "content": "hi"}]}, None))
+        self.assertEqual(first.content, again.content)
+        self.assertGreater(len(first.content), len(short.content))
+        self.assertGreater(first.total_tokens, 0)
+
+    def test_injected_failures(self):
+        with self.assertRaises(BackendError) as ctx:
+            asyncio.run(FakeBackend(latency=0, error_rate=1.0).complete(PAYLOAD, None))
+        self.assertEqual(ctx.exception.status_code, 500)
+
+        backend = FakeBackend(latency=0.01, sigma=0, capacity=1)
+
+        async def run():
+            return await asyncio.gather(*(backend.complete(PAYLOAD, None) for _ in range(2)), return_exceptions=True)
+
+        results = asyncio.run(run())
+        self.assertEqual(sorted(type(result).__name__ for result in results), ["BackendError", "Completion"])
+
+    def test_generate_docs_end_to_end_without_network(self):
+        env = {"AI_DOCS_LLM_BACKEND": "fake", "AI_DOCS_FAKE_LATENCY": "0", "OPENAI_MODEL": "test-model", "OPENAI_API_KEY": ""}
+        with tempfile.TemporaryDirectory() as tmp, mock.patch.dict(os.environ, env):
+            root = Path(tmp)
+            (root / "app.py").write_text("def main():\n    return 1\n", encoding="utf-8")
+            (root / "settings.yaml").write_text("debug: true\n", encoding="utf-8")
+            llm = from_env()
+            scan = scan_source(str(root))
+            generate_docs(scan.files, root, root / ".ai_docs_cache", llm, "ru", False, False, threads=4)
+            self.assertTrue((root / ".ai-docs" / "modules" / "app__py.md").exists())
+            self.assertGreater(llm.backend.requests, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
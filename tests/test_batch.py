@@ -0,0 +1,139 @@
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from ai_docs.backends import FakeBackend
+from ai_docs.batch import LocalBatchService, parse_batch_output, prefill_summary_cache
+from ai_docs.generator import generate_docs
+from ai_docs.generator_summarize import SUMMARY_KINDS, SummaryStream
+from ai_docs.llm import LLMClient, from_env
+from ai_docs.scanner import scan_source
+
+
+class CountingResponder:
+    def __init__(self):
+        self.calls = 0
+
+    async def __call__(self, body):
+        self.calls += 1
+        return (await FakeBackend(latency=0).complete(body, None)).content
+
+
+class FailingResponder(CountingResponder):
+    # Fails every request whose body matches the first one it saw.
+    def __init__(self):
+        super().__init__()
+        self.broken = None
+        self.failures = 0
+
+    async def __call__(self, body):
+        text = json.dumps(body["messages"], sort_keys=True)
+        self.broken = self.broken or text
+        if text == self.broken:
+            self.failures += 1
+            raise RuntimeError("upstream error")
+        return await super().__call__(body)
+
+
+def _code(functions):
+    return "".join(f"def handler_{idx}(event):\n    return event.get('value_{idx}', {idx}) * {idx}\n\n" for idx in range(functions))
+
+
+class BatchServiceTests(unittest.TestCase):
+    def test_local_service_completes_after_polls(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            job = root / "job.jsonl"
+            body = {"model": "test-model", "messages": [{"role": "user", "content": "hi"}]}
+            job.write_text(json.dumps({"custom_id": "k1", "method": "POST", "url": "/v1/chat/completions", "body": body}) + "\n")
+            service = LocalBatchService(root / "jobs", polls_until_done=2)
+
+            async def run():
+                job_id = await service.submit(job)
+                return [await service.status(job_id), await service.status(job_id)], await service.results(job_id)
+
+            statuses, results = asyncio.run(run())
+            self.assertEqual(statuses, ["in_progress", "completed"])
+            self.assertEqual(list(results), ["k1"])
+
+    def test_failed_lines_are_skipped(self):
+        lines = [
+            json.dumps({"custom_id": "ok", "response": {"status_code": 200, "body": {"choices": [{"message": {"content": "a"}}]}}}),
+            json.dumps({"custom_id": "bad", "response": {"status_code": 500, "body": {}}}),
+            "",
+        ]
+        self.assertEqual(parse_batch_output(lines), {"ok": "a"})
+
+
+class PrefillTests(unittest.TestCase):
+    def test_multi_chunk_file_is_served_from_cache_after_prefill(self):
+        responder = CountingResponder()
+        backend = FakeBackend(latency=0)
+        llm = LLMClient(api_key="test", base_url="", model="test-model", backend=backend)
+        meta = {"type": "code", "domains": [], "content": _code(120), "hash": "h1"}
+        llm_cache = {}
+
+        async def run(root):
+            service = LocalBatchService(root / "jobs", responder=responder)
+            filled = await prefill_summary_cache(service, llm, llm_cache, [("app.py", meta, None)], root / "work", threads=4)
+            stream = SummaryStream(tuple(root / kind for kind in SUMMARY_KINDS), llm, llm_cache, 4, lambda: None, [])
+            stream.submit("app.py", dict(meta))
+            await stream.drain()
+            return filled
+
+        with tempfile.TemporaryDirectory() as tmp:
+            filled = asyncio.run(run(Path(tmp)))
+        # Chunks, their merge and the final answers take several rounds; the live pass makes no requests.
+        self.assertEqual(filled, responder.calls)
+        self.assertGreater(filled, 2)
+        self.assertEqual(backend.requests, 0)
+
+    def test_failed_lines_are_not_resubmitted(self):
+        responder = FailingResponder()
+        backend = FakeBackend(latency=0)
+        llm = LLMClient(api_key="test", base_url="", model="test-model", backend=backend)
+        meta = {"type": "code", "domains": [], "content": _code(120), "hash": "h1"}
+        llm_cache = {}
+
+        async def run(root):
+            service = LocalBatchService(root / "jobs", responder=responder)
+            filled = await prefill_summary_cache(service, llm, llm_cache, [("app.py", meta, None)], root / "work", threads=4)
+            stream = SummaryStream(tuple(root / kind for kind in SUMMARY_KINDS), llm, llm_cache, 4, lambda: None, [])
+            stream.submit("app.py", dict(meta))
+            await stream.drain()
+            return filled
+
+        with tempfile.TemporaryDirectory() as tmp:
+            filled = asyncio.run(run(Path(tmp)))
+        # The failed line goes to one batch only; the live pass answers it and what depends on it.
+        self.assertEqual(responder.failures, 1)
+        self.assertEqual(filled, responder.calls)
+        self.assertGreater(backend.requests, 0)
+
+    def test_generate_docs_batch_matches_live_run(self):
+        env = {"AI_DOCS_LLM_BACKEND": "fake", "AI_DOCS_FAKE_LATENCY": "0", "OPENAI_MODEL": "test-model", "OPENAI_API_KEY": ""}
+        requests = []
+        with mock.patch.dict(os.environ, env):
+            for batch in (False, True):
+                with tempfile.TemporaryDirectory() as tmp:
+                    root = Path(tmp)
+                    (root / "app.py").write_text(_code(5), encoding="utf-8")
+                    (root / "settings.yaml").write_text("debug: true\n", encoding="utf-8")
+                    llm = from_env()
+                    responder = CountingResponder()
+                    service = LocalBatchService(root / "jobs", responder=responder) if batch else None
+                    scan = scan_source(str(root))
+                    generate_docs(scan.files, root, root / ".ai_docs_cache", llm, "ru", False, False, threads=4, batch=service)
+                    self.assertTrue((root / ".ai-docs" / "modules" / "app__py.md").exists())
+                    requests.append((llm.backend.requests, responder.calls))
+        (live, _), (remaining, batched) = requests
+        self.assertGreater(batched, 0)
+        self.assertEqual(remaining + batched, live)
+
+
+if __name__ == "__main__":
+    unittest.main()
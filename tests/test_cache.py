@@ -1,9 +1,13 @@
+import asyncio
 import json
 import tempfile
+import threading
 from pathlib import Path
 import unittest
 
 from ai_docs.cache import CacheManager
+from ai_docs.generator_cache import stream_diff
+from ai_docs.records import FileRecord
 
 
 class CacheManagerTests(unittest.TestCase):
@@ -40,6 +44,72 @@ class CacheManagerTests(unittest.TestCase):
             self.assertIn("b.txt", deleted)
             self.assertIn("c.txt", deleted)
 
+    def test_diff_files_prefers_blob_ids(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = CacheManager(Path(tmp))
+            prev = {
+                "a.py": {"hash": "h1", "blob": "b1"},
+                "b.py": {"hash": "h2", "blob": "b2"},
+                "c.py": {"hash": "h3"},
+                "d.py": {"hash": "h4", "blob": "b4"},
+            }
+            cache.save_index({"files": prev, "sections": {}})
+            added, modified, deleted, unchanged = cache.diff_files(
+                {
+                    "a.py": {"hash": "other", "blob": "b1"},
+                    "b.py": {"hash": "h2", "blob": "b9"},
+                    # --git-index toggled between runs: only one side has a blob id.
+                    "c.py": {"hash": "h3", "blob": "b3"},
+                    "d.py": {"hash": "h5"},
+                }
+            )
+            self.assertEqual(set(unchanged), {"a.py", "c.py"})
+            self.assertEqual(set(modified), {"b.py", "d.py"})
+
+    def test_diff_paths_only_compares_changed(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = CacheManager(Path(tmp))
+            cache.save_index({"files": {"a.py": {"hash": "1"}, "b.py": {"hash": "2"}, "c.py": {"hash": "3"}}, "sections": {}})
+            added, modified, deleted, unchanged = cache.diff_paths(
+                {"a.py": {"hash": "1"}, "b.py": {"hash": "9"}, "d.py": {"hash": "4"}},
+                {"b.py", "d.py"},
+            )
+            self.assertEqual(set(added), {"d.py"})
+            self.assertEqual(set(modified), {"b.py"})
+            self.assertEqual(set(deleted), {"c.py"})
+            self.assertEqual(set(unchanged), {"a.py"})
+
+    def test_stream_diff_hands_out_changes_before_scan_ends(self):
+        prev = {"a.py": {"hash": "1"}, "b.py": {"hash": "2"}, "gone.py": {"hash": "3"}}
+        seen = []
+        b_seen = threading.Event()
+
+        def files():
+            yield FileRecord("a.py", Path("a.py"), size=1, hash="1", type="code", domains=[])
+            yield FileRecord("b.py", Path("b.py"), size=1, hash="9", type="code", domains=[])
+            # The scan stalls here until the consumer has been handed b.py.
+            self.assertTrue(b_seen.wait(5))
+            yield FileRecord("c.py", Path("c.py"), size=1, hash="4", type="code", domains=[])
+
+        async def run():
+            file_map = {}
+
+            def on_changed(path, meta):
+                seen.append(path)
+                if path == "b.py":
+                    b_seen.set()
+
+            result = await stream_diff(files(), prev, file_map, on_changed)
+            return file_map, result
+
+        file_map, (added, modified, deleted, unchanged) = asyncio.run(run())
+        self.assertEqual(seen, ["b.py", "c.py"])
+        self.assertEqual(set(file_map), {"a.py", "b.py", "c.py"})
+        self.assertEqual(set(added), {"c.py"})
+        self.assertEqual(set(modified), {"b.py"})
+        self.assertEqual(set(deleted), {"gone.py"})
+        self.assertEqual(set(unchanged), {"a.py"})
+
 
 if __name__ == "__main__":
     unittest.main()
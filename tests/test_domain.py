@@ -0,0 +1,50 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from ai_docs.domain import DOMAIN_RULES, DomainClassifier, detect_domains, rules_from_config
+from ai_docs.scanner import scan_source
+
+
+class DomainClassifierTests(unittest.TestCase):
+    def test_builtin_rules(self):
+        manifest = "apiVersion: networking.k8s.io/v1\nkind: Ingress\n"
+        self.assertEqual(detect_domains(Path("deploy/web.yaml"), manifest), {"kubernetes", "service_mesh"})
+        self.assertEqual(detect_domains(Path("deploy/web.json"), manifest), set())
+        self.assertEqual(detect_domains(Path("ops/nginx-ingress/conf.py"), ""), {"service_mesh", "kubernetes"})
+        self.assertEqual(detect_domains(Path("svc/Dockerfile.prod"), ""), {"docker"})
+        self.assertEqual(detect_domains(Path("docker/app.yml"), ""), {"docker"})
+        self.assertEqual(detect_domains(Path("docker/app.py"), ""), set())
+        self.assertEqual(detect_domains(Path(".github/workflows/ci.yml"), ""), {"ci"})
+        self.assertEqual(detect_domains(Path("src/app/main.py"), "print('kind')"), set())
+
+    def test_config_rules_extend_classifier(self):
+        rules = rules_from_config({"payments": [{"path": "billing/"}, {"suffixes": "proto", "content": ["package payments"]}]})
+        classifier = DomainClassifier(DOMAIN_RULES + rules)
+        self.assertEqual(classifier.classify(Path("svc/billing/api.py"), ""), {"payments"})
+        self.assertEqual(classifier.classify(Path("api/pay.PROTO"), "package payments;"), {"payments"})
+        self.assertEqual(classifier.classify(Path("api/pay.proto"), "package orders;"), set())
+        self.assertNotEqual(classifier.signature, DomainClassifier(DOMAIN_RULES).signature)
+
+    def test_scan_applies_ai_docs_yaml_domains(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            (root / "billing").mkdir()
+            (root / "billing" / "api.py").write_text("x = 1\n", encoding="utf-8")
+            first = scan_source(str(root))
+            self.assertEqual(first.files[0].domains, [])
+            previous = {
+                "files": {f.path: {k: v for k, v in f.meta().items() if k != "abs_path"} for f in first.files},
+                "domain_rules": first.domain_rules,
+            }
+
+            config = root / ".ai-docs.yaml"
+            config.write_text(config.read_text(encoding="utf-8") + "domains:\n  payments:\n    path: billing/\n", encoding="utf-8")
+            second = scan_source(str(root), previous_index=previous)
+            self.assertNotEqual(second.domain_rules, first.domain_rules)
+            self.assertFalse(second.files[0].reused)
+            self.assertEqual(second.files[0].domains, ["payments"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,125 @@
+import asyncio
+import unittest
+
+from ai_docs import limiter as limits
+from ai_docs.limiter import AdaptiveLimiter, RateLimiter
+
+
+class AdaptiveLimiterTests(unittest.TestCase):
+    def test_limit_grows_while_saturated_and_healthy(self):
+        async def run():
+            limiter = AdaptiveLimiter(initial=2, max_limit=3)
+            for _ in range(20):
+                tickets = [await limiter.acquire() for _ in range(limiter.current)]
+                for ticket in tickets:
+                    limiter.release(ticket, 0.1)
+            return limiter
+
+        limiter = asyncio.run(run())
+        self.assertEqual(limiter.current, 3)
+        self.assertAlmostEqual(limiter.stats()["p50"], 0.1)
+
+    def test_overload_halves_once_per_round(self):
+        async def run():
+            limiter = AdaptiveLimiter(initial=8, min_limit=2)
+            tickets = [await limiter.acquire() for _ in range(8)]
+            for ticket in tickets:
+                limiter.release(ticket, 1.0, limits.OVERLOAD)
+            after_round = limiter.current
+            for _ in range(3):
+                limiter.release(await limiter.acquire(), 1.0, limits.OVERLOAD)
+            return after_round, limiter
+
+        after_round, limiter = asyncio.run(run())
+        self.assertEqual(after_round, 4)
+        self.assertEqual(limiter.current, 2)
+        self.assertEqual(limiter.stats()["throttled"], 11)
+
+    def test_rejected_requests_do_not_change_the_limit(self):
+        async def run():
+            limiter = AdaptiveLimiter(initial=4)
+            for _ in range(10):
+                limiter.release(await limiter.acquire(), 0.1, limits.REJECTED)
+            return limiter
+
+        self.assertEqual(asyncio.run(run()).current, 4)
+
+    def test_acquire_waits_for_a_free_slot(self):
+        async def run():
+            limiter = AdaptiveLimiter(initial=1, max_limit=1)
+            order = []
+            first = await limiter.acquire()
+
+            async def second():
+                ticket = await limiter.acquire()
+                order.append("second")
+                limiter.release(ticket, 0.0)
+
+            task = asyncio.ensure_future(second())
+            await asyncio.sleep(0.01)
+            order.append("release")
+            limiter.release(first, 0.0)
+            await task
+            return order, limiter.in_flight
+
+        self.assertEqual(asyncio.run(run()), (["release", "second"], 0))
+
+    def test_cancelled_waiter_passes_its_wakeup_on(self):
+        async def run():
+            limiter = AdaptiveLimiter(initial=1, max_limit=1)
+            first = await limiter.acquire()
+            woken = asyncio.ensure_future(limiter.acquire())
+            waiting = asyncio.ensure_future(limiter.acquire())
+            await asyncio.sleep(0)
+            limiter.release(first, 0.0)
+            # Cancelled after the release resolved its waiter, before it got to run.
+            woken.cancel()
+            await asyncio.wait_for(waiting, 1.0)
+            return woken.cancelled(), limiter.in_flight
+
+        self.assertEqual(asyncio.run(run()), (True, 1))
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    async def sleep(self, delay):
+        self.now += delay
+
+
+class RateLimiterTests(unittest.TestCase):
+    def test_requests_per_minute_are_spaced(self):
+        clock = FakeClock()
+        rate = RateLimiter(rpm=60, clock=clock, sleep=clock.sleep)
+
+        async def run():
+            for _ in range(65):
+                await rate.reserve(0)
+
+        asyncio.run(run())
+        self.assertAlmostEqual(clock.now, 5.0)
+        self.assertAlmostEqual(rate.waited, 5.0)
+
+    def test_tokens_are_reserved_and_reconciled(self):
+        clock = FakeClock()
+        rate = RateLimiter(tpm=6000, clock=clock, sleep=clock.sleep)
+
+        async def run():
+            first = await rate.reserve(5000)
+            rate.reconcile(first, 1000)
+            await rate.reserve(5000)
+            waited_after_refund = clock.now
+            await rate.reserve(100_000)
+            return waited_after_refund
+
+        self.assertEqual(asyncio.run(run()), 0.0)
+        # The oversized request was clamped to the bucket size and waited for it to refill.
+        self.assertAlmostEqual(clock.now, 60.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
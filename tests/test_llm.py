@@ -0,0 +1,115 @@
+import asyncio
+import unittest
+
+import httpx
+
+from ai_docs.backends import Completion, FakeBackend
+from ai_docs.limiter import RateLimiter
+from ai_docs.llm import LLMClient, StreamStalled
+
+
+class CountingBackend:
+    def __init__(self, error=None):
+        self.calls = 0
+        self.error = error
+
+    async def complete(self, payload, timeout):
+        self.calls += 1
+        await asyncio.sleep(0.02)
+        if self.error is not None:
+            raise self.error
+        return Completion(f"answer {self.calls}")
+
+
+def _client(backend):
+    client = LLMClient(api_key="test", base_url="", model="test-model", backend=backend)
+    client.limiter.configure(initial=8, max_limit=8)
+    return client
+
+
+class SingleFlightTests(unittest.TestCase):
+    def test_identical_requests_share_one_completion(self):
+        backend = CountingBackend()
+        client = _client(backend)
+        messages = [{"role": "user", "content": "same prompt"}]
+        cache = {}
+
+        async def run():
+            return await asyncio.gather(*(client.chat(messages, cache=cache) for _ in range(5)))
+
+        self.assertEqual(asyncio.run(run()), ["answer 1"] * 5)
+        self.assertEqual((backend.calls, client.coalesced), (1, 4))
+        self.assertEqual(list(cache.values()), ["answer 1"])
+        self.assertEqual(client._inflight, {})
+
+    def test_followers_receive_the_leader_failure(self):
+        backend = CountingBackend(error=ValueError("bad request"))
+        client = _client(backend)
+        messages = [{"role": "user", "content": "broken"}]
+
+        async def run():
+            return await asyncio.gather(*(client.chat(messages) for _ in range(3)), return_exceptions=True)
+
+        results = asyncio.run(run())
+        self.assertEqual(backend.calls, 1)
+        self.assertTrue(all(isinstance(result, RuntimeError) for result in results))
+
+    def test_cancelled_leader_does_not_cancel_followers(self):
+        backend = CountingBackend()
+        client = _client(backend)
+        messages = [{"role": "user", "content": "same prompt"}]
+
+        async def run():
+            leader = asyncio.ensure_future(client.chat(messages))
+            await asyncio.sleep(0)
+            follower = asyncio.ensure_future(client.chat(messages))
+            await asyncio.sleep(0.005)
+            leader.cancel()
+            # The follower takes over the request instead of inheriting the cancellation.
+            return await follower, leader.cancelled()
+
+        self.assertEqual(asyncio.run(run()), ("answer 2", True))
+        self.assertEqual((backend.calls, client.coalesced), (2, 0))
+        self.assertEqual(client._inflight, {})
+
+
+class StreamingTests(unittest.TestCase):
+    def _streaming_client(self, backend, **options):
+        return LLMClient(api_key="test", base_url="", model="test-model", backend=backend, stream=True, **options)
+
+    def test_streamed_answer_matches_completion_and_records_ttft(self):
+        messages = [{"role": "user", "content": "describe the scanner " * 20}]
+        expected = asyncio.run(FakeBackend(latency=0).complete({"model": "test-model", "messages": messages, "max_tokens": 1200}, None))
+        client = self._streaming_client(FakeBackend(latency=0.01, sigma=0, tokens_per_second=5000))
+        self.assertEqual(asyncio.run(client.chat(messages)), expected.content)
+        stats = client.stream_stats()
+        self.assertGreaterEqual(stats["ttft_p50"], 0.01)
+        self.assertGreater(stats["tokens_per_second"], 0)
+
+    def test_streamed_usage_reconciles_the_token_quota(self):
+        limiter = RateLimiter(tpm=100_000, clock=lambda: 0.0)
+        client = self._streaming_client(FakeBackend(latency=0), rate_limiter=limiter)
+        payload = {"model": "test-model", "messages": [{"role": "user", "content": "describe the cache " * 10}], "max_tokens": 1200}
+        expected = asyncio.run(FakeBackend(latency=0).complete(payload, None))
+        completion = asyncio.run(client._request(payload, httpx.Timeout(5.0), 50))
+        self.assertEqual(completion.total_tokens, expected.total_tokens)
+        # The bucket is charged the reported usage, not the input estimate plus max_tokens.
+        self.assertEqual(limiter.tokens, 100_000 - expected.total_tokens)
+
+    def test_stall_is_detected_from_the_token_gap(self):
+        client = self._streaming_client(FakeBackend(latency=0, stall_rate=1.0), stall_timeout=0.05)
+        payload = {"model": "test-model", "messages": [{"role": "user", "content": "x " * 200}], "max_tokens": 100}
+        with self.assertRaises(StreamStalled):
+            asyncio.run(client._request(payload, httpx.Timeout(5.0), 10))
+        self.assertEqual(client.stalls, 1)
+        self.assertEqual(client.backend.in_flight, 0)
+
+    def test_early_stop_returns_the_prefix(self):
+        client = self._streaming_client(FakeBackend(latency=0), stop_after_chars=20)
+        answer = asyncio.run(client.chat([{"role": "user", "content": "long answer please " * 30}]))
+        self.assertLess(len(answer), 40)
+        self.assertEqual(client.early_stops, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+import os
+import subprocess
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from ai_docs.mirror import MirrorStore
+from ai_docs.scanner import scan_source
+
+
+def _git(root, *args):
+    env = {
+        **os.environ,
+        "GIT_AUTHOR_NAME": "test",
+        "GIT_AUTHOR_EMAIL": "test@example.com",
+        "GIT_COMMITTER_NAME": "test",
+        "GIT_COMMITTER_EMAIL": "test@example.com",
+    }
+    return subprocess.check_output(["git", "-C", str(root), *args], env=env, text=True).strip()
+
+
+class MirrorStoreTests(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.tmp = Path(self._tmp.name)
+        self.origin = self.tmp / "origin"
+        self.origin.mkdir()
+        _git(self.origin, "init", "-q")
+        _git(self.origin, "config", "commit.gpgsign", "false")
+        (self.origin / "app.py").write_text("print('hi')\n", encoding="utf-8")
+        _git(self.origin, "add", ".")
+        _git(self.origin, "commit", "-q", "-m", "init")
+        self.url = self.origin.resolve().as_uri()
+        self.store = MirrorStore(self.tmp / "mirrors")
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_fetches_incrementally_into_persistent_mirror(self):
+        worktree = self.store.checkout(self.url)
+        self.assertTrue((worktree / "app.py").exists())
+        self.store.release(self.url, worktree)
+        self.assertFalse(worktree.exists())
+        self.assertTrue((self.store.mirror_path(self.url) / "HEAD").exists())
+
+        (self.origin / "new.py").write_text("x = 1\n", encoding="utf-8")
+        _git(self.origin, "add", ".")
+        _git(self.origin, "commit", "-q", "-m", "more")
+        worktree = self.store.checkout(self.url)
+        self.assertTrue((worktree / "new.py").exists())
+        self.store.release(self.url, worktree)
+
+    def test_concurrent_checkouts_share_mirror(self):
+        worktrees = []
+        errors = []
+
+        def run():
+            try:
+                worktrees.append(self.store.checkout(self.url))
+            except Exception as exc:
+                errors.append(exc)
+
+        threads = [threading.Thread(target=run) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(len({str(w) for w in worktrees}), 3)
+        for worktree in worktrees:
+            self.assertTrue((worktree / "app.py").exists())
+            self.store.release(self.url, worktree)
+
+    def test_scan_source_uses_mirror_for_urls(self):
+        with mock.patch.dict(os.environ, {"AI_DOCS_MIRROR_DIR": str(self.tmp / "mirrors")}):
+            result = scan_source(self.url)
+            try:
+                self.assertIn("app.py", {f.path for f in result.files})
+                self.assertEqual(result.repo_name, "origin")
+                self.assertIsNotNone(result.git_head)
+            finally:
+                result.release()
+            self.assertFalse(result.root.exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,31 @@
+import json
+import unittest
+
+from ai_docs.noise import detect_noise, noise_summary
+
+
+class NoiseDetectionTests(unittest.TestCase):
+    def test_detects_lockfiles_generated_and_minified(self):
+        self.assertEqual(detect_noise("web/package-lock.json", "{}"), ("lockfile", "npm"))
+        self.assertEqual(detect_noise("api/user_pb2.py", "x = 1\n")[0], "generated")
+        go_stub = "// Code generated by protoc-gen-go. DO NOT EDIT.\npackage api\n"
+        self.assertEqual(detect_noise("api/user.go", go_stub)[0], "generated")
+        bundle = "var a=1;" * 2000
+        self.assertEqual(detect_noise("static/app.js", bundle)[0], "minified")
+        self.assertEqual(detect_noise("static/vendor.min.css", "a{}")[0], "minified")
+
+    def test_regular_sources_pass_through(self):
+        module = "".join(f"def handler_{idx}(event):\n    return event['id'] + {idx}\n\n" for idx in range(200))
+        self.assertIsNone(detect_noise("src/app.py", module))
+        self.assertIsNone(detect_noise("src/app.js", module))
+        self.assertIsNone(detect_noise("docs/guide.md", "This guide covers autogenerated IDs.\n"))
+
+    def test_lockfile_summary_counts_packages(self):
+        lock = json.dumps({"packages": {"": {}, "node_modules/a": {}, "node_modules/b": {}}})
+        self.assertIn("зафиксировано пакетов: 2", noise_summary("package-lock.json", lock, "lockfile", "npm"))
+        poetry = '[[package]]\nname = "a"\n\n[[package]]\nname = "b"\n\n[[package]]\nname = "c"\n'
+        self.assertIn("зафиксировано пакетов: 3", noise_summary("poetry.lock", poetry, "lockfile", "poetry"))
+
+
+if __name__ == "__main__":
+    unittest.main()
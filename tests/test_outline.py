@@ -0,0 +1,49 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from ai_docs.outline import build_outline, condense
+from ai_docs.scanner import scan_source
+from ai_docs.tokenizer import count_tokens
+
+
+MODEL = "test-model"
+
+
+class OutlineTests(unittest.TestCase):
+    def test_outline_keeps_structure(self):
+        code = "import os\n\nclass Store:\n    def get(self, key):\n        if key:\n            return 1\n\nasync def main():\n    pass\n"
+        self.assertEqual(build_outline("app.py", code), ["3: class Store:", "4: def get(self, key):", "8: async def main():"])
+        config = json.dumps({"server": {"port": 80}, "items": [1, 2]})
+        self.assertEqual(build_outline("conf.json", config), ["server: {1 ключей}", "  server.port: 80", "items: [2 элементов]"])
+        self.assertEqual(build_outline("guide.md", "# Title\ntext\n## Usage\n"), ["1: # Title", "3: ## Usage"])
+        self.assertEqual(build_outline("values.yaml", "image:\n  tag: v1\n    deep: x\n- item\n"), ["1: image:", "2: tag: v1"])
+
+    def test_condense_bounds_tokens(self):
+        small = "def f():\n    return 1\n"
+        self.assertEqual(condense("a.py", small, MODEL, 1000), (small, False))
+        budget = 2000
+        for functions in (500, 5000):
+            big = "".join(f"def handler_{idx}(event):\n    return event['id'] + {idx}\n\n" for idx in range(functions))
+            text, outlined = condense("a.py", big, MODEL, budget)
+            self.assertTrue(outlined)
+            self.assertLessEqual(count_tokens(text, MODEL), budget)
+            self.assertIn("def handler_0(event):", text)
+            self.assertIn("## Фрагменты", text)
+
+    def test_oversized_files_are_kept_in_outline_mode(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            (root / "big.py").write_text("x = 1\n" * 1000, encoding="utf-8")
+            (root / "small.py").write_text("y = 2\n", encoding="utf-8")
+            skipped = scan_source(str(root), max_size=100, oversized="skip")
+            self.assertEqual([f.path for f in skipped.files], ["small.py"])
+            kept = scan_source(str(root), max_size=100)
+            self.assertEqual(sorted(f.path for f in kept.files), ["big.py", "small.py"])
+            capped = scan_source(str(root), max_size=100, hard_max_size=1000)
+            self.assertEqual([f.path for f in capped.files], ["small.py"])
+
+
+if __name__ == "__main__":
+    unittest.main()
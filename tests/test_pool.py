@@ -0,0 +1,151 @@
+import asyncio
+import os
+import unittest
+from unittest import mock
+
+import httpx
+
+from ai_docs.backends import BackendError, Completion, FakeBackend
+from ai_docs.llm import LLMClient, StreamStalled, from_env
+from ai_docs.pool import Endpoint, EndpointPool, parse_endpoints
+
+
+PAYLOAD = {"model": "test-model", "max_tokens": 50, "messages": [{"role": "user", "content": "describe app.py"}]}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TrackingBackend:
+    def __init__(self, delay=0.01, status=None):
+        self.delay = delay
+        self.status = status
+        self.calls = 0
+        self.in_flight = 0
+        self.peak = 0
+
+    async def complete(self, payload, timeout):
+        self.calls += 1
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+            if self.status is not None:
+                raise BackendError("endpoint failure", self.status)
+            return Completion("ok")
+        finally:
+            self.in_flight -= 1
+
+
+def _run_many(pool, count):
+    async def run():
+        return await asyncio.gather(*(pool.complete(PAYLOAD, None) for _ in range(count)))
+
+    return asyncio.run(run())
+
+
+class ParseEndpointsTests(unittest.TestCase):
+    def test_weights_and_caps(self):
+        spec = "http://gpu1:8000/v1/|2|16, http://gpu2:8000/v1,http://gpu3/v1||4"
+        self.assertEqual(
+            parse_endpoints(spec),
+            [("http://gpu1:8000/v1", 2.0, 16), ("http://gpu2:8000/v1", 1.0, 0), ("http://gpu3/v1", 1.0, 4)],
+        )
+        with self.assertRaises(RuntimeError):
+            parse_endpoints("http://gpu1|heavy")
+
+
+class RoutingTests(unittest.TestCase):
+    def test_least_outstanding_follows_weights(self):
+        heavy, light = TrackingBackend(), TrackingBackend()
+        pool = EndpointPool([Endpoint("heavy", heavy, weight=2), Endpoint("light", light)])
+        _run_many(pool, 30)
+        self.assertEqual((heavy.calls, light.calls), (20, 10))
+
+    def test_caps_bound_in_flight_requests(self):
+        first, second = TrackingBackend(), TrackingBackend()
+        pool = EndpointPool([Endpoint("a", first, max_in_flight=2), Endpoint("b", second, max_in_flight=3)])
+        self.assertEqual(pool.capacity, 5)
+        self.assertEqual([completion.content for completion in _run_many(pool, 20)], ["ok"] * 20)
+        self.assertEqual((first.peak, second.peak), (2, 3))
+
+    def test_ewma_prefers_the_faster_endpoint(self):
+        slow, fast = TrackingBackend(delay=0.03), TrackingBackend(delay=0.002)
+        pool = EndpointPool([Endpoint("slow", slow), Endpoint("fast", fast)], strategy="ewma")
+
+        async def run():
+            for _ in range(10):
+                await pool.complete(PAYLOAD, None)
+
+        asyncio.run(run())
+        self.assertEqual(slow.calls, 1)
+        self.assertEqual(fast.calls, 9)
+
+
+class FailoverTests(unittest.TestCase):
+    def test_failed_attempt_moves_to_another_endpoint_and_ejects(self):
+        clock = FakeClock()
+        broken, healthy = TrackingBackend(status=502), TrackingBackend()
+        pool = EndpointPool([Endpoint("broken", broken), Endpoint("healthy", healthy)], eject_after=3, eject_seconds=30, clock=clock)
+
+        async def run(count):
+            for _ in range(count):
+                self.assertEqual((await pool.complete(PAYLOAD, None)).content, "ok")
+
+        asyncio.run(run(8))
+        # Three failures eject the broken endpoint; later requests skip it.
+        self.assertEqual(broken.calls, 3)
+        self.assertEqual(pool.failovers, 3)
+        self.assertEqual(pool.endpoints[0].ejections, 1)
+
+        # Back after the timeout on probation: one more failure ejects it again.
+        clock.now = 31
+        asyncio.run(run(2))
+        self.assertEqual(broken.calls, 4)
+        self.assertEqual(pool.endpoints[0].ejections, 2)
+
+    def test_request_errors_are_not_retried_elsewhere(self):
+        first, second = TrackingBackend(status=400), TrackingBackend(status=400)
+        pool = EndpointPool([Endpoint("a", first), Endpoint("b", second)])
+        with self.assertRaises(BackendError):
+            asyncio.run(pool.complete(PAYLOAD, None))
+        self.assertEqual(first.calls + second.calls, 1)
+        self.assertEqual(pool.endpoints[0].failures, 0)
+
+    def test_streaming_fails_over_before_the_first_token(self):
+        pool = EndpointPool([Endpoint("down", FakeBackend(latency=0, error_rate=1.0)), Endpoint("up", FakeBackend(latency=0))])
+        client = LLMClient(api_key="test", base_url="", model="test-model", backend=pool, stream=True)
+        expected = asyncio.run(FakeBackend(latency=0).complete({"model": "test-model", "messages": PAYLOAD["messages"], "max_tokens": 1200}, None))
+        self.assertEqual(asyncio.run(client.chat(PAYLOAD["messages"])), expected.content)
+        self.assertEqual(pool.failovers, 1)
+        self.assertEqual([endpoint.in_flight for endpoint in pool.endpoints], [0, 0])
+
+    def test_stalled_stream_counts_against_the_endpoint(self):
+        pool = EndpointPool([Endpoint("stuck", FakeBackend(latency=0, stall_rate=1.0))])
+        client = LLMClient(api_key="test", base_url="", model="test-model", backend=pool, stream=True, stall_timeout=0.05)
+        payload = {"model": "test-model", "messages": [{"role": "user", "content": "x " * 200}], "max_tokens": 100}
+        with self.assertRaises(StreamStalled):
+            asyncio.run(client._request(payload, httpx.Timeout(5.0), 10))
+        self.assertEqual((pool.endpoints[0].failures, pool.endpoints[0].in_flight), (1, 0))
+
+    def test_from_env_builds_a_pool(self):
+        env = {
+            "AI_DOCS_LLM_BACKEND": "fake",
+            "OPENAI_API_KEY": "",
+            "OPENAI_BASE_URLS": "http://a/v1|1|12,http://b/v1|1|12",
+            "AI_DOCS_MAX_CONCURRENCY": "16",
+        }
+        with mock.patch.dict(os.environ, env):
+            client = from_env()
+        self.assertIsInstance(client.backend, EndpointPool)
+        self.assertEqual([endpoint.name for endpoint in client.backend.endpoints], ["http://a/v1", "http://b/v1"])
+        self.assertEqual(client.limiter.max_limit, 24)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,8 +1,29 @@
+import os
+import subprocess
 import tempfile
 import unittest
 from pathlib import Path
 
-from ai_docs.scanner import scan_source
+import pathspec
+
+from ai_docs.generator_shared import file_content, release_content
+from ai_docs.scanner import DEFAULT_EXCLUDE_PATTERNS, FIXED_INCLUDE_PATTERNS, PathMatcher, scan_source
+
+
+def _git(root, *args):
+    env = {
+        **os.environ,
+        "GIT_AUTHOR_NAME": "test",
+        "GIT_AUTHOR_EMAIL": "test@example.com",
+        "GIT_COMMITTER_NAME": "test",
+        "GIT_COMMITTER_EMAIL": "test@example.com",
+    }
+    return subprocess.check_output(["git", "-C", str(root), *args], env=env, text=True).strip()
+
+
+def _git_init(root):
+    _git(root, "init", "-q")
+    _git(root, "config", "commit.gpgsign", "false")
 
 
 class ScannerTests(unittest.TestCase):
@@ -18,12 +39,288 @@ class ScannerTests(unittest.TestCase):
             (venv_dir / "inside.py").write_text("print('no')", encoding="utf-8")
 
             result = scan_source(str(root))
-            paths = {f["path"] for f in result.files}
+            paths = {f.path for f in result.files}
             self.assertIn("app.py", paths)
             self.assertIn("Dockerfile", paths)
             self.assertNotIn("ignored.txt", paths)
             self.assertNotIn(".venv/lib/python3.10/site-packages/inside.py", paths)
 
+    def test_nested_ignore_files_and_pruned_directories(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            (root / ".gitignore").write_text("*.txt\ngenerated/\n", encoding="utf-8")
+            sub = root / "pkg"
+            sub.mkdir()
+            (sub / ".gitignore").write_text("!keep.txt\nlocal.py\n", encoding="utf-8")
+            (sub / "keep.txt").write_text("keep", encoding="utf-8")
+            (sub / "drop.txt").write_text("drop", encoding="utf-8")
+            (sub / "local.py").write_text("x = 1", encoding="utf-8")
+            (sub / "mod.py").write_text("x = 2", encoding="utf-8")
+            (sub / "generated").mkdir()
+            (sub / "generated" / "out.py").write_text("x = 3", encoding="utf-8")
+            deep = root / "node_modules" / "pkg" / "lib"
+            deep.mkdir(parents=True)
+            (deep / "index.js").write_text("module.exports = 1", encoding="utf-8")
+
+            paths = {f.path for f in scan_source(str(root)).files}
+            self.assertIn("pkg/keep.txt", paths)
+            self.assertIn("pkg/mod.py", paths)
+            self.assertNotIn("pkg/drop.txt", paths)
+            self.assertNotIn("pkg/local.py", paths)
+            self.assertNotIn("pkg/generated/out.py", paths)
+            self.assertNotIn("node_modules/pkg/lib/index.js", paths)
+
+    def test_threaded_scan_keeps_order(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            for idx in range(30):
+                directory = root / f"pkg{idx % 4}"
+                directory.mkdir(exist_ok=True)
+                (directory / f"m{idx}.py").write_text(f"x = {idx}", encoding="utf-8")
+
+            sequential = [f.path for f in scan_source(str(root)).files]
+            threaded = [f.path for f in scan_source(str(root), workers=4).files]
+            self.assertEqual(len(sequential), 30)
+            self.assertEqual(sequential, threaded)
+
+    def test_stream_scan_yields_lazily(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            for idx in range(20):
+                (root / f"m{idx:02d}.py").write_text(f"x = {idx}\n", encoding="utf-8")
+
+            listed = scan_source(str(root), workers=4)
+            streamed = scan_source(str(root), workers=4, stream=True)
+            self.assertNotIsInstance(streamed.files, list)
+            first = next(iter(streamed.files))
+            self.assertEqual(first.path, "m00.py")
+            rest = [item.path for item in streamed.files]
+            self.assertEqual([first.path] + rest, [item.path for item in listed.files])
+
+    def test_single_pass_reader_handles_large_binary_and_legacy_files(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            big = "".join(f"def f{idx}():\r\n    return {idx}\r\n" for idx in range(5000))
+            (root / "big.py").write_bytes(big.encode("utf-8"))
+            (root / "blob.py").write_bytes(b"x = 1\n\x00\x01\x02")
+            legacy = "# Комментарий в старой кодировке\nvalue = 'привет, мир'\n" * 20
+            (root / "legacy.py").write_bytes(legacy.encode("cp1251"))
+
+            files = {f.path: f for f in scan_source(str(root)).files}
+            self.assertNotIn("blob.py", files)
+            self.assertGreater(files["big.py"].size, 64 * 1024)
+            self.assertEqual(file_content(files["big.py"].meta()), big.replace("\r\n", "\n"))
+            self.assertIn("привет, мир", file_content(files["legacy.py"].meta()))
+
+    def test_records_read_content_on_demand(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            (root / "app.py").write_text("x = 1\n", encoding="utf-8")
+            record = scan_source(str(root)).files[0]
+            # The scan keeps no body around: the pipeline reads whatever is on disk now.
+            (root / "app.py").write_text("x = 2\n", encoding="utf-8")
+            meta = record.meta()
+            self.assertEqual(file_content(meta), "x = 2\n")
+            release_content(meta)
+            (root / "app.py").write_text("x = 3\n", encoding="utf-8")
+            self.assertEqual(file_content(meta), "x = 3\n")
+
+    def test_fingerprint_reuses_hash_without_reading(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            old_ns = 1_600_000_000 * 10**9
+            for name in ("same.py", "changed.py"):
+                (root / name).write_text(f"# {name}", encoding="utf-8")
+                os.utime(root / name, ns=(old_ns, old_ns))
+
+            first = {f.path: f for f in scan_source(str(root)).files}
+            self.assertFalse(first["same.py"].reused)
+            previous = {
+                "files": {
+                    path: {k: v for k, v in meta.meta().items() if k != "abs_path"}
+                    for path, meta in first.items()
+                }
+            }
+
+            (root / "changed.py").write_text("# changed!", encoding="utf-8")
+            os.utime(root / "changed.py", ns=(old_ns + 10**9, old_ns + 10**9))
+            second = {f.path: f for f in scan_source(str(root), previous_index=previous).files}
+            self.assertTrue(second["same.py"].reused)
+            self.assertEqual(second["same.py"].hash, first["same.py"].hash)
+            self.assertEqual(file_content(second["changed.py"].meta()), "# changed!")
+            self.assertNotEqual(second["changed.py"].hash, first["changed.py"].hash)
+
+    def test_git_index_scan_uses_blob_ids(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            _git_init(root)
+            (root / "clean.py").write_text("x = 1\n", encoding="utf-8")
+            (root / "dirty.py").write_text("y = 1\n", encoding="utf-8")
+            _git(root, "add", ".")
+            _git(root, "commit", "-q", "-m", "init")
+
+            first = {f.path: f for f in scan_source(str(root), git_index=True).files}
+            self.assertEqual(first["clean.py"].blob, _git(root, "hash-object", "clean.py"))
+            plain = {f.path: f for f in scan_source(str(root)).files}
+            self.assertEqual(first["clean.py"].hash, plain["clean.py"].hash)
+            previous = {
+                "files": {
+                    path: {k: v for k, v in meta.meta().items() if k != "abs_path"}
+                    for path, meta in first.items()
+                }
+            }
+
+            (root / "dirty.py").write_text("y = 2\n", encoding="utf-8")
+            (root / "new.py").write_text("z = 1\n", encoding="utf-8")
+            second = {f.path: f for f in scan_source(str(root), previous_index=previous, git_index=True).files}
+            self.assertTrue(second["clean.py"].reused)
+            self.assertEqual(second["clean.py"].blob, first["clean.py"].blob)
+            self.assertEqual(file_content(second["dirty.py"].meta()), "y = 2\n")
+            self.assertEqual(second["dirty.py"].blob, _git(root, "hash-object", "dirty.py"))
+            self.assertEqual(second["new.py"].blob, _git(root, "hash-object", "new.py"))
+
+    def test_since_scan_uses_git_diff(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            _git_init(root)
+            for name in ("a.py", "b.py", "c.py", "d.py"):
+                (root / name).write_text(f"# {name}\n", encoding="utf-8")
+            _git(root, "add", ".")
+            _git(root, "commit", "-q", "-m", "init")
+
+            first = scan_source(str(root))
+            self.assertEqual(first.git_head, _git(root, "rev-parse", "HEAD"))
+            previous = {
+                "files": {
+                    f.path: {k: v for k, v in f.meta().items() if k != "abs_path"}
+                    for f in first.files
+                },
+                "git": {"head": first.git_head},
+            }
+
+            _git(root, "mv", "b.py", "moved.py")
+            _git(root, "rm", "-q", "c.py")
+            (root / "a.py").write_text("# changed\n", encoding="utf-8")
+            _git(root, "commit", "-q", "-am", "change")
+
+            result = scan_source(str(root), previous_index=previous, since="")
+            files = {f.path: f for f in result.files}
+            self.assertEqual(set(files), {"a.py", "d.py", "moved.py"})
+            self.assertEqual(result.changed_paths, {"a.py", "moved.py"})
+            self.assertEqual(result.renames, {"moved.py": "b.py"})
+            self.assertTrue(files["moved.py"].reused)
+            self.assertTrue(files["d.py"].reused)
+            self.assertEqual(file_content(files["a.py"].meta()), "# changed\n")
+
+    def test_since_scan_reclassifies_renamed_files(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            _git_init(root)
+            (root / "app").mkdir()
+            (root / "app" / "settings.yaml").write_text("replicas: 2\n", encoding="utf-8")
+            (root / "app" / "notes.md").write_text("# notes\n", encoding="utf-8")
+            _git(root, "add", ".")
+            _git(root, "commit", "-q", "-m", "init")
+
+            first = scan_source(str(root))
+            previous = {
+                "files": {
+                    f.path: {k: v for k, v in f.meta().items() if k != "abs_path"}
+                    for f in first.files
+                },
+                "git": {"head": first.git_head},
+            }
+
+            (root / "k8s").mkdir()
+            (root / "docs").mkdir()
+            _git(root, "mv", "app/settings.yaml", "k8s/settings.yaml")
+            _git(root, "mv", "app/notes.md", "docs/notes.md")
+            _git(root, "commit", "-q", "-m", "move")
+
+            result = scan_source(str(root), previous_index=previous, since="")
+            files = {f.path: f for f in result.files}
+            full = {f.path: f for f in scan_source(str(root)).files}
+            # The manifest now classifies as infra: ingested again instead of carried over.
+            self.assertEqual(result.renames, {"docs/notes.md": "app/notes.md"})
+            self.assertEqual((files["k8s/settings.yaml"].type, files["k8s/settings.yaml"].domains), ("infra", ["kubernetes"]))
+            self.assertFalse(files["k8s/settings.yaml"].reused)
+            for path in files:
+                self.assertEqual((files[path].type, files[path].domains), (full[path].type, full[path].domains))
+
+    def test_since_scan_rechecks_untracked_files(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            _git_init(root)
+            (root / "tracked.py").write_text("# tracked\n", encoding="utf-8")
+            _git(root, "add", ".")
+            _git(root, "commit", "-q", "-m", "init")
+            for name in ("edited.py", "deleted.py", "kept.py"):
+                (root / name).write_text(f"# {name}\n", encoding="utf-8")
+                # Outside the racy window, so the stat fingerprint is recorded.
+                os.utime(root / name, ns=(1_000_000_000, 1_000_000_000))
+
+            first = scan_source(str(root))
+            previous = {
+                "files": {
+                    f.path: {k: v for k, v in f.meta().items() if k != "abs_path"}
+                    for f in first.files
+                },
+                "git": {"head": first.git_head},
+            }
+
+            (root / "edited.py").write_text("# edited later\n", encoding="utf-8")
+            os.utime(root / "edited.py", ns=(2_000_000_000, 2_000_000_000))
+            (root / "deleted.py").unlink()
+
+            result = scan_source(str(root), previous_index=previous, since="")
+            files = {f.path: f for f in result.files}
+            self.assertEqual(set(files), {"tracked.py", "edited.py", "kept.py"})
+            self.assertEqual(result.changed_paths, {"edited.py"})
+            self.assertNotEqual(files["edited.py"].hash, previous["files"]["edited.py"]["hash"])
+            self.assertTrue(files["kept.py"].reused)
+
+    def test_since_scan_drops_newly_excluded_files(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            _git_init(root)
+            for name in ("keep.py", "other.py"):
+                (root / name).write_text(f"# {name}\n", encoding="utf-8")
+            (root / "big.py").write_text("x = 1\n" * 100, encoding="utf-8")
+            _git(root, "add", ".")
+            _git(root, "commit", "-q", "-m", "init")
+
+            first = scan_source(str(root))
+            previous = {
+                "files": {
+                    f.path: {k: v for k, v in f.meta().items() if k != "abs_path"}
+                    for f in first.files
+                },
+                "git": {"head": first.git_head},
+            }
+
+            exclude = set(DEFAULT_EXCLUDE_PATTERNS) | {"keep.py"}
+            result = scan_source(str(root), exclude=exclude, max_size=100, oversized="skip", previous_index=previous, since="")
+            self.assertEqual([f.path for f in result.files], ["other.py"])
+
+    def test_path_matcher_matches_per_pattern_specs(self):
+        include = {"*.py", "*.md", "*.tar.gz"} | FIXED_INCLUDE_PATTERNS
+        exclude = set(DEFAULT_EXCLUDE_PATTERNS) | {"temp/*", "*.log", "!keep.py"}
+
+        def reference(rel_path):
+            for pattern in exclude:
+                if pathspec.PathSpec.from_lines("gitignore", [pattern]).match_file(rel_path):
+                    return False
+            return any(pathspec.PathSpec.from_lines("gitignore", [p]).match_file(rel_path) for p in include)
+
+        matcher = PathMatcher(include, exclude)
+        dirs = ["", "src/", "node_modules/x/", "a/build/b/", ".venv/lib/", "temp/", "x.py/", ".github/workflows/"]
+        names = ["a.py", "README.md", "Dockerfile.prod", "docker-compose.dev.yml", "x.log", "mkdocs.yml",
+                 "keep.py", "package-lock.json", "a.tar.gz", "c.unknown", "Jenkinsfile", "main.tf"]
+        for directory in dirs:
+            for name in names:
+                rel_path = directory + name
+                self.assertEqual(matcher.should_include(rel_path), reference(rel_path), rel_path)
+
 
 if __name__ == "__main__":
     unittest.main()
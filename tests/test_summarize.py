@@ -0,0 +1,179 @@
+import asyncio
+import tempfile
+import unittest
+from pathlib import Path, PurePosixPath
+
+from ai_docs.generator_sections import build_hierarchical_context
+from ai_docs.generator_summarize import SummaryStream
+from ai_docs.tokenizer import count_tokens
+
+
+class CountingLLM:
+    model = "test-model"
+
+    def __init__(self):
+        self.calls = 0
+
+    async def chat(self, messages, cache=None):
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        return f"summary #{self.calls}"
+
+
+class SummaryStreamTests(unittest.TestCase):
+    def test_identical_files_are_summarized_once(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            dirs = (root / "files", root / "modules", root / "configs")
+            metas = {
+                path: {"hash": digest, "type": "docs", "domains": [], "content": f"body {digest}"}
+                for path, digest in (("a/values.md", "h1"), ("b/values.md", "h1"), ("c/other.md", "h2"))
+            }
+            late = {"hash": "h1", "type": "docs", "domains": [], "content": "body h1"}
+            errors = []
+            llm = CountingLLM()
+
+            async def run():
+                stream = SummaryStream(dirs, llm, None, 4, lambda: None, errors)
+                for path, meta in metas.items():
+                    stream.submit(path, meta)
+                await stream.drain()
+                # Finished summaries are not kept as futures; a later copy is served from the written file.
+                self.assertEqual(stream.shared, {})
+                stream.submit("d/values.md", late)
+                await stream.drain()
+                return stream
+
+            stream = asyncio.run(run())
+            self.assertEqual(errors, [])
+            self.assertEqual(llm.calls, 2)
+            self.assertEqual((stream.duplicates, stream.calls_saved), (2, 2))
+            first = Path(metas["a/values.md"]["summary_path"])
+            second = Path(metas["b/values.md"]["summary_path"])
+            self.assertNotEqual(first, second)
+            self.assertEqual(first.read_text(encoding="utf-8"), second.read_text(encoding="utf-8"))
+            self.assertNotIn("content", metas["b/values.md"])
+            self.assertEqual(Path(late["summary_path"]).read_text(encoding="utf-8"), first.read_text(encoding="utf-8"))
+
+    def test_identical_bodies_with_different_names_are_not_shared(self):
+        body = '{"packages": {"node_modules/a": {}}}'
+        for order in (("package-lock.json", "x.json"), ("x.json", "package-lock.json")):
+            with tempfile.TemporaryDirectory() as tmp:
+                root = Path(tmp)
+                dirs = (root / "files", root / "modules", root / "configs")
+                metas = {path: {"hash": "h", "type": "config", "domains": [], "content": body} for path in order}
+                llm = CountingLLM()
+
+                async def run():
+                    stream = SummaryStream(dirs, llm, None, 2, lambda: None, [])
+                    for path in order:
+                        stream.submit(path, metas[path], ("file",))
+                    await stream.drain()
+                    return stream
+
+                stream = asyncio.run(run())
+                self.assertEqual((stream.noise["lockfile"], stream.duplicates), (1, 0))
+                lockfile = Path(metas["package-lock.json"]["summary_path"]).read_text(encoding="utf-8")
+                plain = Path(metas["x.json"]["summary_path"]).read_text(encoding="utf-8")
+                self.assertIn("package-lock.json", lockfile)
+                self.assertTrue(plain.startswith("summary #"), plain)
+
+    def test_identical_noise_files_get_their_own_summary(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            dirs = (root / "files", root / "modules", root / "configs")
+            metas = {path: {"hash": "h", "type": "code", "domains": [], "content": "# @generated\nx = 1\n"} for path in ("a/users_pb2.py", "b/orders_pb2.py")}
+            llm = CountingLLM()
+
+            async def run():
+                stream = SummaryStream(dirs, llm, None, 2, lambda: None, [])
+                for path, meta in metas.items():
+                    stream.submit(path, meta, ("file",))
+                await stream.drain()
+                return stream
+
+            stream = asyncio.run(run())
+            self.assertEqual((llm.calls, stream.noise["generated"], stream.duplicates), (0, 2, 0))
+            for path, meta in metas.items():
+                self.assertIn(PurePosixPath(path).name, Path(meta["summary_path"]).read_text(encoding="utf-8"))
+
+    def test_bodies_are_read_only_inside_a_slot(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            dirs = (root / "files", root / "modules", root / "configs")
+            metas = {}
+            for idx in range(200):
+                source = root / "src" / f"doc_{idx}.md"
+                source.parent.mkdir(exist_ok=True)
+                source.write_text(f"body {idx}\n", encoding="utf-8")
+                metas[f"src/doc_{idx}.md"] = {"hash": f"h{idx}", "type": "docs", "domains": [], "abs_path": str(source)}
+            loaded = []
+
+            class PeakLLM(CountingLLM):
+                async def chat(self, messages, cache=None):
+                    loaded.append(sum("content" in meta for meta in metas.values()))
+                    return await super().chat(messages, cache)
+
+            async def run():
+                stream = SummaryStream(dirs, PeakLLM(), None, 2, lambda: None, [])
+                for path, meta in metas.items():
+                    stream.submit(path, meta, ("file",))
+                await stream.drain()
+
+            asyncio.run(run())
+            self.assertEqual(len(loaded), 200)
+            self.assertLessEqual(max(loaded), 2)
+            self.assertFalse(any("content" in meta for meta in metas.values()))
+
+    def test_noise_files_skip_the_llm(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            dirs = (root / "files", root / "modules", root / "configs")
+            meta = {"hash": "h", "type": "config", "domains": [], "content": '{"packages": {"node_modules/a": {}}}'}
+            llm = CountingLLM()
+
+            async def run():
+                stream = SummaryStream(dirs, llm, None, 2, lambda: None, [])
+                stream.submit("package-lock.json", meta)
+                await stream.drain()
+                return stream
+
+            stream = asyncio.run(run())
+            self.assertEqual(llm.calls, 0)
+            self.assertEqual(stream.noise["lockfile"], 2)
+            self.assertGreater(stream.tokens_avoided, 0)
+            self.assertIn("package-lock.json", Path(meta["config_summary_path"]).read_text(encoding="utf-8"))
+
+
+class ChunkRecordingLLM:
+    model = "test-model"
+
+    def __init__(self):
+        self.chunks = []
+
+    async def chat(self, messages, cache=None):
+        self.chunks.append(messages[-1]["content"])
+        return f"digest {len(self.chunks)}"
+
+
+class HierarchicalContextTests(unittest.TestCase):
+    def test_small_context_is_joined_without_llm(self):
+        llm = ChunkRecordingLLM()
+        context = asyncio.run(build_hierarchical_context(llm, {}, ["a", " ", "b"], 100, "ru", "test"))
+        self.assertEqual(context, "a\n\nb")
+        self.assertEqual(llm.chunks, [])
+
+    def test_chunks_are_packed_on_item_boundaries(self):
+        items = [f"module {idx}: " + "x" * 40 for idx in range(30)]
+        llm = ChunkRecordingLLM()
+        context = asyncio.run(build_hierarchical_context(llm, {}, items, 200, "ru", "test"))
+        self.assertGreater(len(llm.chunks), 1)
+        for chunk in llm.chunks:
+            self.assertLessEqual(count_tokens(chunk, llm.model), 200)
+            self.assertTrue(all(part in items for part in chunk.split("\n\n")))
+        self.assertEqual("\n\n".join(llm.chunks), "\n\n".join(items))
+        self.assertLessEqual(count_tokens(context, llm.model), 200)
+
+
+if __name__ == "__main__":
+    unittest.main()
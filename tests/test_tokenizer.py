@@ -0,0 +1,124 @@
+import base64
+import re
+import unittest
+from unittest import mock
+
+from ai_docs import tokenizer
+from ai_docs.tokenizer import count_tokens, count_tokens_batch, estimate_tokens, fits_within, get_encoding, split_chunks
+
+
+class CountingEncoding:
+    def __init__(self):
+        self.encoded = 0
+        self.batches = 0
+
+    def encode(self, text):
+        self.encoded += 1
+        return text.split()
+
+    def encode_batch(self, texts, num_threads=1):
+        self.batches += 1
+        return [text.split() for text in texts]
+
+
+class WordPieceEncoding:
+    # Rough BPE stand-in: lowercase words are cheap, mixed-case and digit runs break into many pieces.
+    pattern = re.compile(r" ?[A-Z]?[a-z]{1,6}|\d{1,3}|\s+|\S")
+
+    def encode(self, text):
+        return self.pattern.findall(text)
+
+
+class TokenizerTests(unittest.TestCase):
+    def test_encoding_is_resolved_once(self):
+        self.assertIs(get_encoding("test-model"), get_encoding("test-model"))
+
+    def test_load_failure_is_retried(self):
+        enc = CountingEncoding()
+        load = mock.patch.object(tokenizer.tiktoken, "encoding_for_model", side_effect=[OSError("offline"), enc])
+        with load as loader, mock.patch.object(tokenizer.time, "monotonic", return_value=100.0) as clock:
+            self.assertIsInstance(get_encoding("flaky-model"), tokenizer._ByteEncoding)
+            # Within the cooldown the fallback is served without another load attempt.
+            self.assertEqual(count_tokens("a b c", "flaky-model"), 5)
+            self.assertEqual(loader.call_count, 1)
+            clock.return_value = 100.0 + tokenizer._ENCODING_RETRY_SECONDS
+            # Neither the encoding nor the counts made with the fallback outlive the recovery.
+            self.assertEqual(count_tokens("a b c", "flaky-model"), 3)
+            self.assertIs(get_encoding("flaky-model"), enc)
+            self.assertEqual(loader.call_count, 2)
+
+    def test_counts_are_memoized_by_content(self):
+        enc = CountingEncoding()
+        with mock.patch.object(tokenizer, "get_encoding", return_value=enc):
+            self.assertEqual(count_tokens("a b c", "memo-model"), 3)
+            self.assertEqual(count_tokens("a b c", "memo-model"), 3)
+            self.assertEqual(enc.encoded, 1)
+            self.assertEqual(count_tokens("a b c d", "memo-model"), 4)
+            self.assertEqual(enc.encoded, 2)
+
+    def test_batch_encodes_only_misses(self):
+        enc = CountingEncoding()
+        with mock.patch.object(tokenizer, "get_encoding", return_value=enc):
+            count_tokens("one", "batch-model")
+            self.assertEqual(count_tokens_batch(["one", "two three", "", "two three"], "batch-model"), [1, 2, 0, 2])
+            self.assertEqual((enc.encoded, enc.batches), (1, 1))
+            self.assertEqual(count_tokens_batch(["two three"], "batch-model"), [2])
+            self.assertEqual(enc.batches, 1)
+
+    def test_estimate_tracks_exact_counts(self):
+        for text in ("def run(items):\n    return len(items)\n" * 50, "Модуль читает конфигурацию и пишет отчёт.\n" * 50, "x" * 20000):
+            exact = count_tokens(text, "test-model")
+            self.assertLess(abs(estimate_tokens(text, "test-model") - exact) / exact, 0.1)
+        self.assertEqual(estimate_tokens("", "test-model"), 0)
+
+    def test_dense_text_is_not_underestimated(self):
+        blob = base64.b64encode(bytes(range(256)) * 24).decode("ascii")
+        text = "".join(blob[idx:idx + 76] + "\n" for idx in range(0, len(blob), 76))
+        with mock.patch.object(tokenizer, "get_encoding", return_value=WordPieceEncoding()):
+            exact = count_tokens(text, "dense-model")
+            self.assertLess(abs(estimate_tokens(text, "dense-model") - exact) / exact, 0.25)
+            self.assertFalse(fits_within(text, "dense-model", int(exact * 0.8)))
+            ruler = "-" * 76 + "\n"
+            self.assertLess(estimate_tokens(ruler * 100, "dense-model"), estimate_tokens(text[:7700], "dense-model"))
+
+    def test_fits_within_tokenizes_only_near_the_limit(self):
+        text = "word " * 200
+        with mock.patch.object(tokenizer, "count_tokens", wraps=count_tokens) as exact:
+            self.assertTrue(fits_within(text, "test-model", 10_000))
+            self.assertFalse(fits_within(text, "test-model", 100))
+            self.assertEqual(exact.call_count, 0)
+            self.assertTrue(fits_within(text, "test-model", 1000))
+            self.assertFalse(fits_within(text, "test-model", 999))
+            self.assertEqual(exact.call_count, 2)
+
+
+class ChunkerTests(unittest.TestCase):
+    def test_code_chunks_keep_definitions_whole(self):
+        code = "".join(f"@route('/{idx}')\ndef handler_{idx}(event):\n    value = event['id']\n    return value + {idx}\n\n" for idx in range(40))
+        chunks = split_chunks(code, "test-model", 300, code=True)
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual("".join(chunk.text for chunk in chunks), code)
+        for chunk in chunks:
+            self.assertEqual(code[chunk.start:chunk.end], chunk.text)
+            self.assertLessEqual(count_tokens(chunk.text, "test-model"), 300)
+            self.assertTrue(chunk.text.startswith("@route("))
+
+    def test_lines_are_never_cut_and_overlap_repeats_tail(self):
+        text = "".join(f"строка номер {idx}\n" for idx in range(100))
+        chunks = split_chunks(text, "test-model", 120, overlap=40)
+        for chunk in chunks:
+            self.assertTrue(chunk.text.endswith("\n"))
+            self.assertLessEqual(chunk.tokens, 120)
+        for previous, chunk in zip(chunks, chunks[1:]):
+            self.assertLess(chunk.start, previous.end)
+        self.assertEqual((chunks[0].start, chunks[-1].end), (0, len(text)))
+
+    def test_overlong_line_is_split_by_characters(self):
+        text = "ж" * 500
+        chunks = split_chunks(text, "test-model", 100)
+        self.assertEqual("".join(chunk.text for chunk in chunks), text)
+        self.assertTrue(all(chunk.tokens <= 100 for chunk in chunks))
+
+
+if __name__ == "__main__":
+    unittest.main()